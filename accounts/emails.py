@@ -0,0 +1,102 @@
+# outgoing emails: requests only insert an EmailOutbox row, the
+# process_email_outbox command sends them through EMAIL_BACKEND
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+# a batch whose worker did not report back for this long is sent again
+STALE_SENDING_SECONDS = 300
+
+
+def queue_email(to_email, subject, body, from_email=None):
+    """Queue an email for the outbox worker, returns the EmailOutbox row"""
+    return EmailOutbox.objects.create(
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+    )
+
+
+def claim_emails(batch_size):
+    """Lock and mark as sending the next queued emails"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_SENDING_SECONDS)
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status="queued", available_at__lte=now)
+                | Q(status="sending", updated_at__lt=stale)
+            )
+            .order_by("available_at")[:batch_size]
+        )
+        EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status="sending", updated_at=now
+        )
+    return emails
+
+
+def send_batch(emails):
+    """
+    Send the claimed emails over a single backend connection, returns the
+    number sent. Failed emails are rescheduled or dead-lettered.
+    """
+    if not emails:
+        return 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            retry_or_dead(email, e)
+        return 0
+
+    sent = []
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=[email.to_email],
+                connection=connection,
+            )
+            try:
+                # one message per call so a rejected recipient only fails its own row
+                connection.send_messages([message])
+            except Exception as e:
+                retry_or_dead(email, e)
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    EmailOutbox.objects.filter(pk__in=sent).update(
+        status="sent", sent_at=timezone.now(), last_error="", updated_at=timezone.now()
+    )
+    return len(sent)
+
+
+def retry_or_dead(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        # exponential backoff: 10, 20, 40, ... seconds (OTP codes live 10 minutes)
+        email.status = "queued"
+        email.available_at = timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+        )
+    else:
+        print(f"[ERROR] Giving up on email to {email.to_email}: {error}")
+        email.status = "dead"
+    email.save(
+        update_fields=["attempts", "last_error", "status", "available_at", "updated_at"]
+    )
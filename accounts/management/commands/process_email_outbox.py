@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.emails import claim_emails, send_batch
+
+
+class Command(BaseCommand):
+    help = "Send the queued emails of the outbox through EMAIL_BACKEND"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Number of emails sent over one backend connection",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the queued emails and exit",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            emails = claim_emails(options["batch_size"])
+            sent = send_batch(emails)
+            if emails:
+                self.stdout.write(f"Sent {sent}/{len(emails)} emails")
+
+            if options["once"] and not emails:
+                break
+            if not emails:
+                time.sleep(options["sleep"])
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverificationotp',
+            index=models.Index(fields=['user', 'is_used', 'expires_at'], name='email_otp_user_used_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['user', 'is_used', 'expires_at'], name='reset_otp_user_used_idx'),
+        ),
+    ]
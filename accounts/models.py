@@ -62,6 +62,14 @@ class EmailVerificationOTP(models.Model):
     is_used = models.BooleanField(default=False)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # issue_code / consume_code: the unused codes of a user, by expiry
+            models.Index(
+                fields=["user", "is_used", "expires_at"], name="email_otp_user_used_idx"
+            ),
+        ]
+
     def is_expired(self):
         return timezone.now() > self.created_at + timedelta(minutes=10)
 
@@ -76,6 +84,14 @@ class PasswordResetOTP(models.Model):
     is_used = models.BooleanField(default=False)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # issue_code / consume_code: the unused codes of a user, by expiry
+            models.Index(
+                fields=["user", "is_used", "expires_at"], name="reset_otp_user_used_idx"
+            ),
+        ]
+
     def is_expired(self):
         return timezone.now() > self.created_at + timedelta(minutes=10)
 
@@ -99,3 +115,42 @@ class AdminUser(models.Model):
 
     def __str__(self):
         return f"Admin: {self.username}"
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent by `manage.py process_email_outbox`, so the
+    requests never wait on the email provider (see accounts/emails.py).
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("dead", "Dead"),  # gave up after EMAIL_OUTBOX_MAX_ATTEMPTS
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "email_outbox"
+        verbose_name = "Outbox Email"
+        verbose_name_plural = "Outbox Emails"
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
@@ -0,0 +1,117 @@
+# one-time codes of the email verification and password reset flows. A new
+# code invalidates the unused ones of the user in one UPDATE, a code is
+# consumed by a conditional UPDATE filtered on expiry in SQL (of concurrent
+# requests with the same code only one wins) and the OTP endpoints are rate
+# limited per email and per client IP with sliding windows kept in the cache.
+import secrets
+import time
+from collections.abc import Mapping
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+OTP_LIFETIME = timedelta(minutes=10)
+
+
+def issue_code(model, user):
+    """Creates a new code for the user, the previous unused ones stop working"""
+    with transaction.atomic():
+        model.objects.filter(user=user, is_used=False).update(is_used=True)
+        return model.objects.create(
+            user=user,
+            code=100000 + secrets.randbelow(900000),
+            expires_at=timezone.now() + OTP_LIFETIME,
+        )
+
+
+def _as_code(code):
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def consume_code(model, user, code):
+    """Marks the code used, returns False when it is wrong, expired or already used"""
+    code = _as_code(code)
+    if code is None:
+        return False
+    return bool(
+        model.objects.filter(
+            user=user, code=code, is_used=False, expires_at__gt=timezone.now()
+        ).update(is_used=True)
+    )
+
+
+def is_expired_code(model, user, code):
+    """After a failed consume_code: whether the code was right but expired"""
+    code = _as_code(code)
+    if code is None:
+        return False
+    return model.objects.filter(
+        user=user, code=code, is_used=False, expires_at__lte=timezone.now()
+    ).exists()
+
+
+def rate_limit_key(action, kind, value, window_index):
+    return f"otp:rate:{action}:{kind}:{value}:{window_index}"
+
+
+def _count_attempt(action, kind, value, limit, window):
+    """
+    Sliding window counter: the attempts of the current fixed window plus
+    those of the previous one weighted by how much of it still overlaps the
+    sliding window. Returns the seconds to wait when over the limit, else None.
+    """
+    now = time.time()
+    window_index = int(now // window)
+    key = rate_limit_key(action, kind, value, window_index)
+    previous = cache.get(rate_limit_key(action, kind, value, window_index - 1), 0)
+
+    cache.add(key, 0, window * 2)
+    try:
+        current = cache.incr(key)
+    except ValueError:
+        # expired between add and incr
+        cache.set(key, 1, window * 2)
+        current = 1
+
+    elapsed = now - window_index * window
+    if previous * (window - elapsed) / window + current <= limit:
+        return None
+    return int(window - elapsed) + 1
+
+
+def check_rate_limit(request, action):
+    """
+    Counts an OTP `action` ("send" or "verify") for the email of the request
+    and for the client IP, raises Throttled (429) past either limit. Rejected
+    attempts count too, a client retrying in a loop stays blocked.
+    """
+    window = settings.OTP_RATE_LIMIT_WINDOW
+    if action == "send":
+        limits = (settings.OTP_SEND_LIMIT_PER_EMAIL, settings.OTP_SEND_LIMIT_PER_IP)
+    else:
+        limits = (settings.OTP_VERIFY_LIMIT_PER_EMAIL, settings.OTP_VERIFY_LIMIT_PER_IP)
+
+    # a body that is not an object (e.g. a JSON list) is limited by IP only,
+    # the serializer rejects it
+    email = ""
+    if isinstance(request.data, Mapping):
+        email = str(request.data.get("email") or "").strip().lower()
+    # the IP as DRF throttles see it (X-Forwarded-For with NUM_PROXIES)
+    ip = BaseThrottle().get_ident(request)
+
+    waits = [
+        _count_attempt(action, kind, value, limit, window)
+        for kind, value, limit in (("email", email, limits[0]), ("ip", ip, limits[1]))
+        if value
+    ]
+    waits = [wait for wait in waits if wait is not None]
+    if waits:
+        raise Throttled(wait=max(waits))
@@ -1,14 +1,13 @@
+from django.db import transaction
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from dj_rest_auth.serializers import UserDetailsSerializer, LoginSerializer
-import random
+from .emails import queue_email
 from .models import EmailVerificationOTP, PasswordResetOTP
+from .otp import consume_code, is_expired_code, issue_code
 from django.conf import settings
 
-from django.utils import timezone
-from datetime import timedelta
-
 User = get_user_model()
 
 
@@ -142,6 +141,18 @@ class CustomUserDetailsSerializer(UserDetailsSerializer):
         )
 
 
+def consume_or_reject(model, user, code):
+    """
+    Consumes the OTP in the caller's transaction: a replay of the same code
+    fails even when concurrent, a rollback leaves the code usable. The errors
+    have the shape validate() used to give them.
+    """
+    if not consume_code(model, user, code):
+        if is_expired_code(model, user, code):
+            raise serializers.ValidationError({"otp_code": ["OTP expired."]})
+        raise serializers.ValidationError({"otp_code": ["Invalid OTP."]})
+
+
 # for Generates & sends OTP
 class SendEmailOTPSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -159,12 +170,8 @@ class SendEmailOTPSerializer(serializers.Serializer):
     def save(self):
         email = self.validated_data["email"]
         user = User.objects.get(email=email)
-        print("[DEBUG] About to create EmailVerificationOTP in serializer")
-        code = str(random.randint(100000, 999999))
-        EmailVerificationOTP.objects.create(
-            user=user, code=code, expires_at=timezone.now() + timedelta(minutes=10)
-        )
-        print(f" OTP for {email} : {code}")
+        # the code is emailed by the post_save signal of EmailVerificationOTP
+        issue_code(EmailVerificationOTP, user)
         return user
 
 
@@ -182,32 +189,22 @@ class VerifyEmailOTPSerializer(serializers.Serializer):
         except User.DoesNotExist:
             raise serializers.ValidationError({"email": "User not found."})
 
-        try:
-            otp = EmailVerificationOTP.objects.get(
-                user=user, code=otp_code, is_used=False
-            )
-        except EmailVerificationOTP.DoesNotExist:
-            raise serializers.ValidationError({"otp_code": "Invalid OTP."})
-
-        if otp.is_expired():
-            raise serializers.ValidationError({"otp_code": "OTP expired."})
-
         attrs["user"] = user
-        attrs["otp"] = otp
 
         return attrs
 
     def save(self):
         user = self.validated_data["user"]
-        otp = self.validated_data["otp"]
 
-        user.is_active = True
-        user.account_status = "active"
-        user.is_email_verified = True
-        user.save()
-
-        otp.is_used = True
-        otp.save()
+        # the code is only used up if the account is activated
+        with transaction.atomic():
+            consume_or_reject(
+                EmailVerificationOTP, user, self.validated_data["otp_code"]
+            )
+            user.is_active = True
+            user.account_status = "active"
+            user.is_email_verified = True
+            user.save()
 
         return user
 
@@ -225,14 +222,13 @@ class PasswordResetRequestSerializer(serializers.Serializer):
     def save(self):
         email = self.validated_data["email"]
         user = User.objects.get(email=email)
-        code = str(random.randint(100000, 999999))
-        expires_at = timezone.now() + timedelta(minutes=10)
-        PasswordResetOTP.objects.create(user=user, code=code, expires_at=expires_at)
-
-        # existing method to send email
-        user.email_user(
-            subject="Your Password Reset Code",
-            message=f"Your OTP code for password reset is {code}. It expires in 10 minutes.",
+        otp = issue_code(PasswordResetOTP, user)
+
+        queue_email(
+            user.email,
+            "Your Password Reset Code",
+            f"Your OTP code for password reset is {otp.code}. "
+            "It expires in 10 minutes.",
         )
 
         return user
@@ -245,33 +241,22 @@ class VerifyPasswordResetSerializer(serializers.Serializer):
 
     def validate(self, attrs):
         email = attrs.get("email")
-        code = attrs.get("otp_code")
 
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             raise serializers.ValidationError("Invalid email.")
 
-        try:
-            otp = PasswordResetOTP.objects.get(user=user, code=code, is_used=False)
-        except PasswordResetOTP.DoesNotExist:
-            raise serializers.ValidationError({"otp_code": "Invalid OTP."})
-
-        if otp.is_expired():
-            raise serializers.ValidationError({"otp_code": "OTP expired."})
-
         attrs["user"] = user
-        attrs["otp"] = otp
         return attrs
 
     def save(self):
         user = self.validated_data["user"]
-        otp = self.validated_data["otp"]
         new_password = self.validated_data["new_password"]
 
-        # method to set the new password as hash
-        user.set_password(new_password)
-        user.save()
-
-        otp.is_used = True
-        otp.save()
+        # the code is only used up if the password is changed
+        with transaction.atomic():
+            consume_or_reject(PasswordResetOTP, user, self.validated_data["otp_code"])
+            # method to set the new password as hash
+            user.set_password(new_password)
+            user.save()
@@ -1,8 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
+from .emails import queue_email
 from .models import EmailVerificationOTP, User
-from django.conf import settings
 
 
 @receiver(post_save, sender=User)
@@ -56,16 +55,86 @@ def create_user_profile(sender, instance, created, **kwargs):
             traceback.print_exc()
 
 
+# user fields cached by the websocket JWT middleware
+WEBSOCKET_AUTH_CACHE_FIELDS = ("account_status", "is_active", "full_name", "user_type")
+
+
+def websocket_auth_fields_changed(instance, *fields):
+    """Whether the save changed one of these fields (all the cached ones by default)"""
+    saved = getattr(instance, "_saved_websocket_auth_fields", None)
+    if saved is None:
+        return False
+    return any(saved[field] != getattr(instance, field) for field in fields or saved)
+
+
+@receiver(pre_save, sender=User)
+def remember_websocket_auth_fields(sender, instance, update_fields=None, **kwargs):
+    # compared once saved: logins and most saves change none of them
+    instance._saved_websocket_auth_fields = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(WEBSOCKET_AUTH_CACHE_FIELDS).intersection(
+        update_fields
+    ):
+        return
+    instance._saved_websocket_auth_fields = (
+        User.objects.filter(pk=instance.pk).values(*WEBSOCKET_AUTH_CACHE_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_websocket_auth_cache(sender, instance, created, update_fields=None, **kwargs):
+    """Drop the cached websocket user when the account changes (suspension, status...)"""
+    if created or not websocket_auth_fields_changed(instance):
+        return
+
+    try:
+        from realtime.cache import invalidate_auth_user_cache
+
+        invalidate_auth_user_cache(instance.id)
+    except Exception as e:
+        print(f"[ERROR] Failed to invalidate websocket auth cache for {instance.email}: {str(e)}")
+
+
+@receiver(post_delete, sender=User)
+def drop_deleted_websocket_user(sender, instance, **kwargs):
+    """A deleted account must stop authenticating websocket connections at once"""
+    try:
+        from realtime.cache import invalidate_auth_user_cache
+
+        invalidate_auth_user_cache(instance.id)
+    except Exception as e:
+        print(f"[ERROR] Failed to invalidate websocket auth cache for {instance.email}: {str(e)}")
+
+
+@receiver(post_save, sender=User)
+def update_presence_display_name(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the display name shown in the websocket room user lists up to date"""
+    if created or not websocket_auth_fields_changed(instance, "full_name"):
+        return
+
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from realtime.presence import set_display_name
+
+        async_to_sync(set_display_name)(
+            get_channel_layer(), instance.id, instance.full_name
+        )
+    except Exception as e:
+        print(f"[ERROR] Failed to update presence name of {instance.email}: {str(e)}")
+
+
 @receiver(post_save, sender=EmailVerificationOTP)
 def send_otp_email(sender, instance, created, **kwargs):
-    print("[DEBUG] EmailVerificationOTP signal triggered")
     """
-    Sends an OTP email every time a new EmailVerificationOTP is created.
+    Queues an OTP email every time a new EmailVerificationOTP is created,
+    it is sent by the process_email_outbox worker.
     """
     if created:
-        subject = "Please VERIFY your email"
-        message = f"your OTP code is {instance.code}. It expires in 10 minutes."
-        from_email=settings.DEFAULT_FROM_EMAIL,  
-        recipient_list = [instance.user.email]
-        send_mail(subject, message, from_email, recipient_list)
-        print(f"Sent otp email to {instance.user.email} - Code: {instance.code}")
+        queue_email(
+            instance.user.email,
+            "Please VERIFY your email",
+            f"your OTP code is {instance.code}. It expires in 10 minutes.",
+        )
+        print(f"Queued otp email to {instance.user.email}")
@@ -0,0 +1,206 @@
+import io
+from contextlib import redirect_stdout
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .emails import STALE_SENDING_SECONDS, claim_emails, queue_email, send_batch
+from .models import EmailOutbox, EmailVerificationOTP, PasswordResetOTP, User
+from .otp import issue_code
+from .serializers import VerifyEmailOTPSerializer
+
+
+class OTPTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email="client@example.com",
+            full_name="Client",
+            user_type="client",
+            is_active=False,
+        )
+        self.api = APIClient()
+
+    def verify_email(self, code):
+        return self.api.post(
+            "/auth/verify-email-otp/",
+            {"email": self.user.email, "otp_code": str(code)},
+            format="json",
+        )
+
+    def reset_password(self, code, password="n3w-Passw0rd!"):
+        return self.api.post(
+            "/auth/password-reset/verify/",
+            {"email": self.user.email, "otp_code": str(code), "new_password": password},
+            format="json",
+        )
+
+
+class OTPConsumeTests(OTPTestCase):
+    def test_a_code_is_used_once(self):
+        otp = issue_code(EmailVerificationOTP, self.user)
+        self.assertEqual(self.verify_email(otp.code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+        response = self.verify_email(otp.code)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"otp_code": ["Invalid OTP."]})
+
+    def test_an_expired_code_is_rejected(self):
+        otp = issue_code(PasswordResetOTP, self.user)
+        PasswordResetOTP.objects.filter(pk=otp.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.reset_password(otp.code)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"otp_code": ["OTP expired."]})
+
+    def test_a_new_code_invalidates_the_previous_one(self):
+        old = issue_code(PasswordResetOTP, self.user)
+        new = issue_code(PasswordResetOTP, self.user)
+        self.assertEqual(self.reset_password(old.code).status_code, 400)
+
+        self.assertEqual(self.reset_password(new.code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("n3w-Passw0rd!"))
+
+    def test_a_failed_update_keeps_the_code(self):
+        otp = issue_code(EmailVerificationOTP, self.user)
+        serializer = VerifyEmailOTPSerializer(
+            data={"email": self.user.email, "otp_code": str(otp.code)}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with mock.patch.object(User, "save", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                serializer.save()
+
+        otp.refresh_from_db()
+        self.assertFalse(otp.is_used)
+        self.assertEqual(self.verify_email(otp.code).status_code, 200)
+
+    def test_the_code_is_not_printed(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            response = self.api.post(
+                "/auth/send-email-otp/", {"email": self.user.email}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        otp = EmailVerificationOTP.objects.get(user=self.user)
+        self.assertNotIn(str(otp.code), out.getvalue())
+
+
+@override_settings(OTP_VERIFY_LIMIT_PER_EMAIL=2, OTP_VERIFY_LIMIT_PER_IP=10)
+class OTPRateLimitTests(OTPTestCase):
+    def test_verify_attempts_are_limited_per_email(self):
+        for _ in range(2):
+            self.assertEqual(self.verify_email("000000").status_code, 400)
+
+        otp = issue_code(EmailVerificationOTP, self.user)
+        response = self.verify_email(otp.code)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        # the throttled attempt did not use the code
+        otp.refresh_from_db()
+        self.assertFalse(otp.is_used)
+
+    def test_a_body_that_is_not_an_object_is_a_bad_request(self):
+        response = self.api.post("/auth/verify-email-otp/", [1, 2], format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+def reject(address):
+    """locmem send_messages failing for one recipient"""
+    send_messages = EmailBackend.send_messages
+
+    def send(backend, messages):
+        if any(address in message.to for message in messages):
+            raise OSError(f"{address} rejected")
+        return send_messages(backend, messages)
+
+    return mock.patch.object(EmailBackend, "send_messages", send)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_DELAY=10,
+)
+class EmailOutboxTests(TestCase):
+    def test_queued_emails_are_sent(self):
+        email = queue_email("client@example.com", "Hello", "Body")
+        call_command("process_email_outbox", "--once", stdout=io.StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["client@example.com"])
+        email.refresh_from_db()
+        self.assertEqual(email.status, "sent")
+        self.assertIsNotNone(email.sent_at)
+
+    def test_a_failed_send_is_retried_with_backoff(self):
+        failing = queue_email("bounce@example.com", "Hello", "Body")
+        queue_email("client@example.com", "Hello", "Body")
+
+        with reject("bounce@example.com"):
+            self.assertEqual(send_batch(claim_emails(10)), 1)
+
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ("queued", 1))
+        self.assertIn("rejected", failing.last_error)
+        self.assertAlmostEqual(
+            failing.available_at,
+            timezone.now() + timedelta(seconds=10),
+            delta=timedelta(seconds=2),
+        )
+        # not due yet
+        self.assertEqual(claim_emails(10), [])
+
+        EmailOutbox.objects.filter(pk=failing.pk).update(available_at=timezone.now())
+        with reject("bounce@example.com"):
+            send_batch(claim_emails(10))
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 2)
+        self.assertAlmostEqual(
+            failing.available_at,
+            timezone.now() + timedelta(seconds=20),
+            delta=timedelta(seconds=2),
+        )
+
+    def test_an_email_is_dead_after_the_last_attempt(self):
+        email = queue_email("bounce@example.com", "Hello", "Body")
+        EmailOutbox.objects.filter(pk=email.pk).update(attempts=2)
+
+        with reject("bounce@example.com"):
+            self.assertEqual(send_batch(claim_emails(10)), 0)
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("dead", 3))
+        self.assertEqual(claim_emails(10), [])
+
+    def test_claimed_emails_are_not_claimed_again(self):
+        emails = [queue_email(f"c{i}@example.com", "Hello", "Body") for i in range(3)]
+
+        first = claim_emails(2)
+        second = claim_emails(10)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({e.pk for e in first} & {e.pk for e in second})
+        self.assertEqual(
+            {e.pk for e in first + second}, {email.pk for email in emails}
+        )
+
+        # a batch whose worker died is claimed again once stale
+        EmailOutbox.objects.filter(pk=first[0].pk).update(
+            updated_at=timezone.now() - timedelta(seconds=STALE_SENDING_SECONDS + 1)
+        )
+        self.assertEqual([e.pk for e in claim_emails(10)], [first[0].pk])
@@ -16,6 +16,7 @@ from django.db.models import Q
 from rest_framework.filters import SearchFilter, OrderingFilter
 import django_filters
 from .filters import UserFilter
+from .otp import check_rate_limit
 
 
 User = get_user_model()
@@ -24,6 +25,7 @@ class SendEmailOTPView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        check_rate_limit(request, "send")
         serializer = SendEmailOTPSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -38,6 +40,7 @@ class VerifyEmailOTPView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        check_rate_limit(request, "verify")
         serializer = VerifyEmailOTPSerializer(data=request.data)
 
         if serializer.is_valid():
@@ -55,6 +58,7 @@ class PasswordRestRequestAPIView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
+        check_rate_limit(request, "send")
         serializer = PasswordResetRequestSerializer(data=request.data)
 
         serializer.is_valid(raise_exception=True)
@@ -68,6 +72,7 @@ class VerifyPasswordResetAPIView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
+        check_rate_limit(request, "verify")
         serializer = VerifyPasswordResetSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
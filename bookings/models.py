@@ -2,6 +2,7 @@ import uuid
 from django.db import models
 from accounts.models import User
 from services.models import Service
+from uploads.models import STORAGE_STATUS_CHOICES
 
 
 class Booking(models.Model):
@@ -22,6 +23,9 @@ class Booking(models.Model):
     full_name = models.CharField(max_length=255)
     linkedin_url = models.URLField(blank=True, null=True)
     cv_file = models.FileField(upload_to="booking_cvs/", blank=True, null=True)
+    cv_storage_status = models.CharField(
+        max_length=20, choices=STORAGE_STATUS_CHOICES, default="stored"
+    )
     additional_notes = models.TextField(blank=True, null=True)
 
     status = models.CharField(
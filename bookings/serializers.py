@@ -3,6 +3,9 @@ from .models import Booking
 from django.utils import timezone
 from services.serializers import ServiceDetailSerializer
 from accounts.serializers import CustomUserDetailsSerializer
+from uploads.serializers import CompletedUploadField
+from uploads.offload import atomic_with_files, store_file
+from uploads.spool import UploadUsedError
 from django.db.models import Q
 from services.serializers import ServiceDetailSerializer
 
@@ -26,6 +29,8 @@ class BookingDetailSerializer(serializers.ModelSerializer):
 
 
 class BookingCreateSerializer(serializers.ModelSerializer):
+    # id of a completed chunked upload, instead of sending cv_file inline
+    cv_upload_id = CompletedUploadField(write_only=True, required=False)
 
     class Meta:
         model = Booking
@@ -35,6 +40,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             "full_name",
             "linkedin_url",
             "cv_file",
+            "cv_upload_id",
             "additional_notes",
         ]
         read_only_fields = ["booking_id", "created_at", "updated_at"]
@@ -87,12 +93,22 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             service_requester = service.user
             accountant = request.user
 
-        booking = Booking.objects.create(
+        cv_file = validated_data.pop("cv_file", None)
+        cv = validated_data.pop("cv_upload_id", None) or cv_file
+        booking = Booking(
             client=service_requester,
             accountant=accountant,
             status="pending",
             **validated_data,
         )
+        with atomic_with_files():
+            if cv is not None:
+                # written to the spool only with STORAGE_OFFLOAD_ENABLED
+                try:
+                    store_file(booking, "cv_file", cv, status_field="cv_storage_status")
+                except UploadUsedError as e:
+                    raise serializers.ValidationError({"cv_upload_id": str(e)})
+            booking.save()
 
         return booking
 
@@ -2,7 +2,7 @@ from rest_framework import views
 from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from .serializers import (
     BookingListSerializer,
     BookingReceivedListSerializer,
@@ -25,7 +25,7 @@ from notifications.utils import send_notification_to_user
 class CreateBookingAPIView(generics.CreateAPIView):
     serializer_class = BookingCreateSerializer
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -77,9 +77,12 @@ class BookingReceivedListAPIView(generics.ListAPIView):
         if user_type.lower() == "academic":
             return Booking.objects.none()
         
-        return Booking.objects.filter(
-            service__user=user
-        ).select_related("service", "client", "accountant").order_by("-created_at")
+        return (
+            Booking.objects.filter(service__user=user)
+            .select_related("service", "client", "accountant")
+            .defer("service__search_vector")
+            .order_by("-created_at")
+        )
 
 class BookingListAPIView(generics.ListAPIView):
     serializer_class = BookingListSerializer
@@ -90,6 +93,7 @@ class BookingListAPIView(generics.ListAPIView):
         qs = (
             Booking.objects.all()
             .select_related("service", "client", "accountant")
+            .defer("service__search_vector")
             .order_by("-created_at")
         )
 
@@ -113,9 +117,11 @@ class BookingDetailAPIView(generics.RetrieveAPIView):
         user = self.request.user
 
         # Only allow retrieval when the user is a participant
-        return Booking.objects.filter(
-            Q(client=user) | Q(accountant=user)
-        ).select_related("service", "client", "accountant")
+        return (
+            Booking.objects.filter(Q(client=user) | Q(accountant=user))
+            .select_related("service", "client", "accountant")
+            .defer("service__search_vector")
+        )
 
 
 class AcceptBookingAPIView(views.APIView):
@@ -3,6 +3,16 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth.models import AnonymousUser
 from datetime import datetime
 from .models import ChatMessages, ChatRooms
+from .last_seen import record_last_seen
+from .unread import increment_unread_counts, reset_unread_count
+from realtime.cache import (
+    get_cached_room,
+    is_cached_member,
+    start_invalidation_listener,
+)
+from realtime.metrics import start_stats_publisher
+from realtime.presence import get_room_users, join_room, leave_room, start_heartbeat
+from realtime.typing import TypingTracker
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 
@@ -18,6 +28,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
         self.room_group_name = f"chat_{self.room_id}"
 
+        start_invalidation_listener(self.channel_layer)
+        start_stats_publisher(self.channel_layer)
+
         # get the room instance
         self.room_obj = await self.get_room(self.room_id)
 
@@ -33,28 +46,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Join room group
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
+        self.typing = TypingTracker(self.channel_layer, self.scope["user"].id)
+        self.typing_users_sent = []
+
         await self.accept()
         print(
             f"WebSocket CONNECT /ws/chat/{self.room_id}/ [User: {self.scope['user'].id}]"
         )
 
-        # store the user id in a redis set
-        await self.add_user_to_redis_presence(
-            str(self.room_obj.room_id), str(self.scope["user"].id)
+        # register this connection in the room presence (one Redis round trip
+        # also returning the users connected to the room)
+        first_connection, room_users = await join_room(
+            self.channel_layer,
+            self.room_obj.room_id,
+            self.scope["user"].id,
+            self.scope["user"].full_name,
+            self.channel_name,
+        )
+        self.presence_heartbeat = start_heartbeat(
+            self.channel_layer,
+            self.scope["user"].id,
+            self.channel_name,
+            room_id=self.room_obj.room_id,
         )
 
         # send the initial full user list to the joining client
-        await self.send_current_room_users()
-
-        # Broadcast User join to Others in the room
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "user.join",
-                "user_id": str(self.scope["user"].id),
-                "full_name": self.scope["user"].full_name,
-            },
-        )
+        await self.send_current_room_users(room_users)
+
+        # Broadcast User join to Others in the room (not for a second tab)
+        if first_connection:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    "type": "user.join",
+                    "user_id": str(self.scope["user"].id),
+                    "full_name": self.scope["user"].full_name,
+                },
+            )
 
         # Optionally send only recent messages for context (last 10 messages)
         await self.send_recent_messages(limit=10)
@@ -71,21 +99,28 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             await self.update_user_last_seen()
 
-            # remove User from Redis presence
-            await self.remove_user_from_redis_presence(
-                str(self.room_obj.room_id), str(self.scope["user"].id)
-            )
-
-            # Broadcast User leave event to other in the room
-            # notify all other clients that this user has left
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "user.leave",
-                    "user_id": str(self.scope["user"].id),
-                    "full_name": self.scope["user"].full_name,
-                },
-            )
+            if hasattr(self, "typing"):
+                await self.typing.stop_all()
+
+            if hasattr(self, "presence_heartbeat"):
+                self.presence_heartbeat.cancel()
+
+                # remove this connection from the room presence, the others are
+                # notified that this user has left with its last connection
+                if await leave_room(
+                    self.channel_layer,
+                    self.room_obj.room_id,
+                    self.scope["user"].id,
+                    self.channel_name,
+                ):
+                    await self.channel_layer.group_send(
+                        self.room_group_name,
+                        {
+                            "type": "user.leave",
+                            "user_id": str(self.scope["user"].id),
+                            "full_name": self.scope["user"].full_name,
+                        },
+                    )
 
             print(
                 f"WebSocket DISCONNECT /ws/chat/{self.room_id}/ [User: {self.scope['user'].id}] Code: {close_code}"
@@ -175,17 +210,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def handle_typing_indicator(self, data):
         is_typing = data.get("is_typing", False)
 
-        # Send typing indicator to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "typing.indicator",
-                "user": self.scope["user"].full_name,
-                "user_id": str(self.scope["user"].id),
-                "is_typing": is_typing,
-                "room": self.room_obj.room_name,
-            },
-        )
+        # only the start / stop edges are broadcast, as aggregated typing_users events
+        await self.typing.update(self.room_id, is_typing)
 
     # Receive message from room group (event Handler for message)
     async def chat_message(self, event):
@@ -194,42 +220,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
             text_data=json.dumps({"type": "chat_message", "message": event["message"]})
         )
 
-    # event Handler for typing indicator event (resived from the room group)
-
-    async def typing_indicator(self, event):
-        user = event["user"]
-        room = event["room"]
-        user_id = event["user_id"]
-        is_typing = event["is_typing"]
+    # event Handler for the users typing in the room (resived from the room group)
 
-        if user_id == str(self.scope["user"].id):
+    async def typing_users(self, event):
+        user_ids = [u for u in event["user_ids"] if u != str(self.scope["user"].id)]
+        # skip the events that only changed this user's own state
+        if user_ids == self.typing_users_sent:
             return
+        self.typing_users_sent = user_ids
 
         await self.send(
             text_data=json.dumps(
                 {
-                    "type": "typing_indicator",
-                    "user": user,
-                    "user_id": user_id,
-                    "room": room,
-                    "is_typing": is_typing,
+                    "type": "typing_users",
+                    "room_id": event["room_id"],
+                    "user_ids": user_ids,
                 }
             )
         )
 
     # -- HELPER METHODS FOR DB OPERATIONS --
 
-    @database_sync_to_async
-    def get_room(self, room_id):
-        try:
-            return ChatRooms.objects.get(room_id=room_id)
-        except ChatRooms.DoesNotExist:
-            return None
+    async def get_room(self, room_id):
+        return await get_cached_room(room_id)
 
-    @database_sync_to_async
-    def is_user_member_of_room(self, room, user):
+    async def is_user_member_of_room(self, room, user):
         # Always check membership regardless of room type
-        return room.members.filter(user_id=user).exists()
+        return await is_cached_member(room.room_id, user.id)
 
     @database_sync_to_async
     def save_chat_message(self, room, sender, content):
@@ -237,6 +254,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             created_msg = ChatMessages.objects.create(
                 room=room, sender=sender, content=content, edited_at=datetime.now()
             )
+            increment_unread_counts(created_msg)
             print(f"Saved message from {sender.id} to room {room.room_name}")
             return created_msg
         except Exception as e:
@@ -264,17 +282,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def update_user_last_seen(self):
         """Update the user's last seen timestamp for this room"""
-        from django.utils import timezone
-
         try:
-
-            last_seen, created = self.room_obj.user_last_seen.get_or_create(
-                user=self.scope["user"], defaults={"last_seen_at": timezone.now()}
-            )
-
-            if not created:
-                last_seen.last_seen_at = timezone.now()
-                last_seen.save()
+            # buffered, written by `manage.py flush_last_seen`
+            record_last_seen(self.scope["user"].id, self.room_obj.room_id)
+            reset_unread_count(self.scope["user"], self.room_obj)
 
         except Exception as e:
             print(f"Error updating last seen: {e}")
@@ -405,50 +416,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
         )
 
-    # --- HELPER METHODS FOR REDIS PRESENCE TRACKING  ---
-
-    def get_presence_key(self, room_id):
-        """Generates the Redis key for a room's presence set."""
-        return f"room:{room_id}:presence"
-
-    async def add_user_to_redis_presence(self, room_id, user_id):
-        """Adds a user's ID to the Redis Set for room presence."""
-        await self.channel_layer.connection(0).sadd(
-            self.get_presence_key(room_id), user_id
-        )
-
-    async def remove_user_from_redis_presence(self, room_id, user_id):
-        """Removes a user's ID from the Redis Set for room presence."""
-        await self.channel_layer.connection(0).srem(
-            self.get_presence_key(room_id), user_id
-        )
-
-    async def get_users_from_redis_presence(self, room_id):
-        """Retrieves all user IDs from the Redis Set for room presence."""
-        user_ids_bytes = await self.channel_layer.connection(0).smembers(
-            self.get_presence_key(room_id)
-        )
-        return [uid.decode("utf-8") for uid in user_ids_bytes]
-
-    @database_sync_to_async
-    def get_user_data_for_presence_list(self, user_ids):
-        """Fetches full name and ID for a list of user IDs from the database."""
-        if not user_ids:
-            return []
-
-        users = user.objects.filter(id__in=user_ids).values("id", "full_name")
-        return [
-            {"id": str(user["id"]), "full_name": user["full_name"]} for user in users
-        ]
-
-    async def send_current_room_users(self):
+    async def send_current_room_users(self, users_data=None):
         """
         Sends the current list of users in the room to the connecting client.
         """
-        user_ids_in_room = await self.get_users_from_redis_presence(
-            str(self.room_obj.room_id)
-        )
-        users_data = await self.get_user_data_for_presence_list(user_ids_in_room)
+        if users_data is None:
+            users_data = await get_room_users(self.channel_layer, self.room_obj.room_id)
         await self.send(
             text_data=json.dumps({"type": "room_users_list", "users": users_data})
         )
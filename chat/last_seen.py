@@ -0,0 +1,159 @@
+# write-behind buffer of UserRoomLastSeen: read events only keep the latest
+# timestamp per (user, room) in the Redis cache, `manage.py flush_last_seen`
+# writes them with one upsert per batch. Without a Redis cache they are
+# written directly.
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChatMembers, UserRoomLastSeen
+
+# users with pending timestamps
+DIRTY_KEY = "chat:last_seen:dirty"
+
+# keeps the max timestamp per room
+# KEYS: pending hash of the user, dirty set   ARGV: room_id, timestamp, user_id
+RECORD_SCRIPT = """
+local current = redis.call("HGET", KEYS[1], ARGV[1])
+if not current or tonumber(current) < tonumber(ARGV[2]) then
+    redis.call("HSET", KEYS[1], ARGV[1], ARGV[2])
+end
+redis.call("SADD", KEYS[2], ARGV[3])
+"""
+
+
+def pending_key(user_id):
+    return f"chat:last_seen:{user_id}"
+
+
+_client = None
+
+
+def _redis():
+    """Client of the Redis behind the cache (CACHE_URL), None without one"""
+    global _client
+    if not settings.CACHE_URL:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CACHE_URL)
+    return _client
+
+
+def record_last_seen(user_id, room_id, seen_at=None):
+    """The user read the room up to `seen_at` (now by default)"""
+    seen_at = seen_at or timezone.now()
+    client = _redis()
+    if client is None:
+        write_last_seen({(str(user_id), str(room_id)): seen_at})
+        return
+
+    client.register_script(RECORD_SCRIPT)(
+        keys=[pending_key(user_id), DIRTY_KEY],
+        args=[str(room_id), seen_at.timestamp(), str(user_id)],
+    )
+
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+
+
+def get_pending_last_seen(user_id):
+    """{room_id: last_seen_at} recorded for the user and not flushed yet"""
+    client = _redis()
+    if client is None:
+        return {}
+    return {
+        room_id.decode(): _from_timestamp(seen_at)
+        for room_id, seen_at in client.hgetall(pending_key(user_id)).items()
+    }
+
+
+def get_room_pending_last_seen(room_id, user_ids):
+    """{user_id: last_seen_at} recorded in the room by these users and not flushed yet"""
+    client = _redis()
+    if client is None or not user_ids:
+        return {}
+    # one round trip: the room field of every user's pending hash
+    pipe = client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.hmget(pending_key(user_id), [str(room_id)])
+    return {
+        user_id: _from_timestamp(values[0])
+        for user_id, values in zip(user_ids, pipe.execute())
+        if values[0] is not None
+    }
+
+
+def get_request_pending_last_seen(context, user):
+    """get_pending_last_seen once per serializer context (shared by a whole list)"""
+    if "pending_last_seen" not in context:
+        context["pending_last_seen"] = get_pending_last_seen(user.id)
+    return context["pending_last_seen"]
+
+
+def merge_last_seen(last_seen_at, pending_seen_at):
+    if pending_seen_at is None:
+        return last_seen_at
+    if last_seen_at is None:
+        return pending_seen_at
+    return max(last_seen_at, pending_seen_at)
+
+
+def write_last_seen(pending):
+    """Upsert {(user_id, room_id): last_seen_at} in one statement, returns the rows"""
+    # users who left the room since are skipped
+    memberships = {
+        (str(user_id), str(room_id))
+        for user_id, room_id in ChatMembers.objects.filter(
+            user_id__in={user_id for user_id, _room_id in pending},
+            room_id__in={room_id for _user_id, room_id in pending},
+        ).values_list("user_id", "room_id")
+    }
+    rows = [
+        UserRoomLastSeen(user_id=user_id, room_id=room_id, last_seen_at=seen_at)
+        for (user_id, room_id), seen_at in pending.items()
+        if (str(user_id), str(room_id)) in memberships
+    ]
+    UserRoomLastSeen.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "room"],
+        update_fields=["last_seen_at"],
+    )
+    return len(rows)
+
+
+def flush_last_seen(batch_size=500):
+    """Write the buffered timestamps to the database, returns the rows written"""
+    client = _redis()
+    if client is None:
+        return 0
+
+    written = 0
+    while True:
+        popped = client.spop(DIRTY_KEY, batch_size) or []
+        user_ids = [user_id.decode() for user_id in popped]
+        if not user_ids:
+            return written
+
+        # take and clear the pending hashes atomically
+        pipe = client.pipeline(transaction=True)
+        for user_id in user_ids:
+            pipe.hgetall(pending_key(user_id))
+            pipe.delete(pending_key(user_id))
+        results = pipe.execute()[::2]
+
+        pending = {
+            (user_id, room_id.decode()): _from_timestamp(seen_at)
+            for user_id, values in zip(user_ids, results)
+            for room_id, seen_at in values.items()
+        }
+        try:
+            written += write_last_seen(pending)
+        except Exception:
+            # back to the buffer for the next flush
+            for (user_id, room_id), seen_at in pending.items():
+                record_last_seen(user_id, room_id, seen_at)
+            raise
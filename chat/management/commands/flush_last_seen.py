@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.last_seen import flush_last_seen
+
+
+class Command(BaseCommand):
+    help = "Write the buffered room last-seen timestamps to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users flushed per bulk upsert",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.LAST_SEEN_FLUSH_INTERVAL,
+            help="Seconds between two flushes",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Flush once and exit",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            written = flush_last_seen(batch_size=options["batch_size"])
+            if written:
+                self.stdout.write(f"Flushed {written} last seen timestamps")
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
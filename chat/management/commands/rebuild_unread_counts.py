@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from chat.last_seen import flush_last_seen
+from chat.unread import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per (user, room) unread message counters from the message history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of counters written per bulk upsert",
+        )
+
+    def handle(self, *args, **options):
+        # the buffered read events count too
+        flush_last_seen()
+        written = rebuild_unread_counts(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} unread counters"))
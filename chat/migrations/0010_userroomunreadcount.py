@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_chatmessages_file_userroomlastseen'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRoomUnreadCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_unread_counts', to='chat.chatrooms')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_unread_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Room Unread Count',
+                'verbose_name_plural': 'User Room Unread Counts',
+                'db_table': 'user_room_unread_count',
+                'unique_together': {('user', 'room')},
+            },
+        ),
+    ]
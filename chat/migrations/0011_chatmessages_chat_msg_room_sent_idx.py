@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_userroomunreadcount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessages',
+            index=models.Index(fields=['room', 'sent_at', 'message_id'], name='chat_msg_room_sent_idx'),
+        ),
+    ]
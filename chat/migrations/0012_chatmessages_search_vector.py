@@ -0,0 +1,56 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:06
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The GIN index and the trigger keeping the vector current only exist on
+# PostgreSQL, other databases (SQLite for local tests) use the icontains fallback.
+CREATE_SEARCH_SQL = """
+CREATE INDEX chat_msg_search_idx ON chat_message USING gin (search_vector);
+
+CREATE FUNCTION chat_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('simple', coalesce(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chat_message_search_vector_trigger
+BEFORE INSERT OR UPDATE OF content ON chat_message
+FOR EACH ROW EXECUTE FUNCTION chat_message_search_vector_update();
+
+UPDATE chat_message SET search_vector = to_tsvector('simple', coalesce(content, ''));
+"""
+
+DROP_SEARCH_SQL = """
+DROP TRIGGER IF EXISTS chat_message_search_vector_trigger ON chat_message;
+DROP FUNCTION IF EXISTS chat_message_search_vector_update();
+DROP INDEX IF EXISTS chat_msg_search_idx;
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_chatmessages_chat_msg_room_sent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessages',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_chatmessages_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessages',
+            name='storage_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed')], default='stored', max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_chatmessages_storage_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userroomlastseen',
+            name='last_seen_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+
+# counters of the memberships that existed before UserRoomUnreadCount (0010),
+# same computation as chat.unread.rebuild_unread_counts
+def backfill_unread_counts(apps, schema_editor):
+    ChatMembers = apps.get_model("chat", "ChatMembers")
+    UserRoomLastSeen = apps.get_model("chat", "UserRoomLastSeen")
+    UserRoomUnreadCount = apps.get_model("chat", "UserRoomUnreadCount")
+
+    last_seen = UserRoomLastSeen.objects.filter(
+        user=OuterRef("user_id"), room=OuterRef("room_id")
+    ).values("last_seen_at")[:1]
+    memberships = (
+        ChatMembers.objects.annotate(last_seen_at=Subquery(last_seen))
+        .annotate(
+            unread=Count(
+                "room_id__messages",
+                filter=Q(room_id__messages__is_deleted=False)
+                & ~Q(room_id__messages__sender=F("user_id"))
+                & (
+                    Q(last_seen_at__isnull=True)
+                    | Q(room_id__messages__sent_at__gt=F("last_seen_at"))
+                ),
+            )
+        )
+        .values_list("user_id", "room_id", "unread")
+        .order_by()
+    )
+
+    batch = []
+    for user_id, room_id, unread in memberships.iterator(chunk_size=1000):
+        batch.append(
+            UserRoomUnreadCount(user_id=user_id, room_id=room_id, unread_count=unread)
+        )
+        if len(batch) >= 1000:
+            UserRoomUnreadCount.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    UserRoomUnreadCount.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0014_alter_userroomlastseen_last_seen_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
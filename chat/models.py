@@ -1,6 +1,9 @@
 import uuid
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from accounts.models import User
+from uploads.models import STORAGE_STATUS_CHOICES
 
 
 # add description field
@@ -60,7 +63,8 @@ class UserRoomLastSeen(models.Model):
     room = models.ForeignKey(
         ChatRooms, on_delete=models.CASCADE, related_name="user_last_seen"
     )
-    last_seen_at = models.DateTimeField(auto_now=True)
+    # set by chat/last_seen.py (buffered writes keep the time of the read event)
+    last_seen_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = "user_room_last_seen"
@@ -71,6 +75,28 @@ class UserRoomLastSeen(models.Model):
     def __str__(self):
         return f"{self.user.full_name} last seen {self.room.room_name} at {self.last_seen_at}"
 
+
+class UserRoomUnreadCount(models.Model):
+    """Denormalized unread messages counter, maintained on send / read / delete"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="room_unread_counts"
+    )
+    room = models.ForeignKey(
+        ChatRooms, on_delete=models.CASCADE, related_name="user_unread_counts"
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "user_room_unread_count"
+        unique_together = ("user", "room")
+        verbose_name = "User Room Unread Count"
+        verbose_name_plural = "User Room Unread Counts"
+
+    def __str__(self):
+        return f"{self.user.full_name} has {self.unread_count} unread in {self.room.room_name}"
+
+
 class ChatMessages(models.Model):
 
     message_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -91,6 +117,9 @@ class ChatMessages(models.Model):
     )
 
     file = models.FileField(upload_to="chat_files/", blank=True, null=True)
+    storage_status = models.CharField(
+        max_length=20, choices=STORAGE_STATUS_CHOICES, default="stored"
+    )
 
     sent_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
@@ -98,10 +127,19 @@ class ChatMessages(models.Model):
 
     edited_at = models.DateTimeField(null=True, blank=True)
 
+    # full-text index of `content`, maintained by a PostgreSQL trigger (see chat/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         db_table = "chat_message"
         verbose_name = "Chat Message"
         verbose_name_plural = "Chat Messages"
+        indexes = [
+            # keyset pagination of a room history
+            models.Index(
+                fields=["room", "sent_at", "message_id"], name="chat_msg_room_sent_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.id} in {self.room_id.room_name}"
@@ -0,0 +1,108 @@
+import base64
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_cursor(message):
+    """Opaque cursor for a message position: (sent_at, message_id)"""
+    # messages are model instances or values() rows
+    if isinstance(message, dict):
+        sent_at, message_id = message["sent_at"], message["message_id"]
+    else:
+        sent_at, message_id = message.sent_at, message.message_id
+    position = f"{sent_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sent_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        sent_at = datetime.fromisoformat(sent_at)
+        message_id = uuid.UUID(message_id)
+        # sent_at is stored aware, a naive cursor was not issued by encode_cursor
+        if sent_at.tzinfo is None:
+            raise ValueError("naive cursor timestamp")
+        return sent_at, message_id
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise NotFound("Invalid cursor.")
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over (sent_at, message_id), newest messages first.
+
+    - no cursor: the latest messages
+    - ?before=<cursor>: older messages (scrolling back)
+    - ?after=<cursor>: newer messages (filling the gap after a reconnect)
+
+    No OFFSET and no COUNT(*): every page is an index range scan on (room, sent_at).
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+
+        if after:
+            sent_at, message_id = decode_cursor(after)
+            queryset = queryset.filter(
+                Q(sent_at__gt=sent_at) | Q(sent_at=sent_at, message_id__gt=message_id)
+            ).order_by("sent_at", "message_id")
+        else:
+            if before:
+                sent_at, message_id = decode_cursor(before)
+                queryset = queryset.filter(
+                    Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, message_id__lt=message_id)
+                )
+            queryset = queryset.order_by("-sent_at", "-message_id")
+
+        # fetch one extra row to know if there is more in that direction
+        messages = list(queryset[: page_size + 1])
+        self.has_more = len(messages) > page_size
+        messages = messages[:page_size]
+
+        if after:
+            # always return newest first
+            messages.reverse()
+
+        self.messages = messages
+        return messages
+
+    def get_paginated_response(self, data, **extra):
+        """`extra` keys (e.g. the room / senders side tables) are added before the results"""
+        return Response(
+            {
+                "has_more": self.has_more,
+                "before": encode_cursor(self.messages[-1]) if self.messages else None,
+                "after": encode_cursor(self.messages[0]) if self.messages else None,
+                **extra,
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "has_more": {"type": "boolean"},
+                "before": {"type": "string", "nullable": True},
+                "after": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,83 @@
+# full-text search over chat messages
+import re
+
+from django.db import connection
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, FloatField, TextField, Value
+from django.utils.html import escape
+
+from .models import ChatMessages
+
+# must match the configuration used by the trigger (chat/migrations/0012)
+SEARCH_CONFIG = "simple"
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+# the headline is the raw content: PostgreSQL marks the matches with these
+# private use characters, the content is escaped before they become <mark>
+HEADLINE_START = "\ue000"
+HEADLINE_STOP = "\ue001"
+
+
+def search_messages(user, query, room=None):
+    """
+    Ranked search of the messages the user can see (rooms they belong to).
+    Results are annotated with `rank` and `headline` (highlighted content).
+    """
+    messages = ChatMessages.objects.filter(
+        room__members__user_id=user, is_deleted=False
+    ).select_related("sender", "room")
+    if room is not None:
+        messages = messages.filter(room=room)
+
+    if connection.vendor != "postgresql":
+        # local fallback (SQLite): no ranking, highlighting done in python
+        return (
+            messages.filter(content__icontains=query)
+            .annotate(
+                rank=Value(0.0, output_field=FloatField()),
+                headline=Value(None, output_field=TextField()),
+            )
+            .order_by("-sent_at")
+        )
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        messages.filter(search_vector=search_query)
+        .annotate(
+            rank=SearchRank(F("search_vector"), search_query),
+            headline=SearchHeadline(
+                "content",
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=HEADLINE_START,
+                stop_sel=HEADLINE_STOP,
+            ),
+        )
+        .order_by("-rank", "-sent_at")
+    )
+
+
+def render_headline(headline):
+    """The PostgreSQL headline as HTML: escaped content, matches in <mark>"""
+    return (
+        escape(headline)
+        .replace(HEADLINE_START, HIGHLIGHT_START)
+        .replace(HEADLINE_STOP, HIGHLIGHT_STOP)
+    )
+
+
+def highlight(content, query):
+    """Python equivalent of the PostgreSQL headline for the fallback backend"""
+    words = [re.escape(word) for word in query.split() if word]
+    if not words:
+        return escape(content)
+    pattern = re.compile("(" + "|".join(words) + ")", re.IGNORECASE)
+    # split on the raw content (a word must not match inside an entity), the
+    # captured matches are at the odd indexes
+    parts = [escape(part) for part in pattern.split(content)]
+    return "".join(
+        f"{HIGHLIGHT_START}{part}{HIGHLIGHT_STOP}" if index % 2 else part
+        for index, part in enumerate(parts)
+    )
@@ -1,8 +1,13 @@
 from .models import ChatMessages, ChatRooms
+from .last_seen import get_request_pending_last_seen, merge_last_seen
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from datetime import datetime
 from accounts.serializers import CustomUserDetailsSerializer
+from .search import highlight, render_headline
+from uploads.serializers import CompletedUploadField
+from uploads.offload import atomic_with_files, store_file
+from uploads.spool import UploadUsedError
 
 User = get_user_model()
 
@@ -76,20 +81,29 @@ class DirectMessageRoomSerializer(serializers.ModelSerializer):
 
         user = request.user
         user_last_seen_records = getattr(obj, "prefetched_user_last_seen", None)
+        # read events not flushed to the database yet (see chat/last_seen.py)
+        pending_seen_at = get_request_pending_last_seen(self.context, user).get(
+            str(obj.room_id)
+        )
 
         if user_last_seen_records is not None:
             if user_last_seen_records:
                 last_seen_time = user_last_seen_records[0].last_seen_at
-            else:
+            elif pending_seen_at is None:
                 # Never seen this room = has unread messages if any messages exist
                 return obj.messages.filter(is_deleted=False).exists()
+            else:
+                last_seen_time = None
         else:
             # Fallback to database query
             try:
                 last_seen = obj.user_last_seen.get(user=user)
                 last_seen_time = last_seen.last_seen_at
             except obj.user_last_seen.model.DoesNotExist:
-                return obj.messages.filter(is_deleted=False).exists()
+                if pending_seen_at is None:
+                    return obj.messages.filter(is_deleted=False).exists()
+                last_seen_time = None
+        last_seen_time = merge_last_seen(last_seen_time, pending_seen_at)
 
         # Check if there are messages after last seen time (excluding user's own messages)
         return (
@@ -175,21 +189,30 @@ class ChatRoomListSerializer(serializers.ModelSerializer):
 
         user = request.user
         user_last_seen_records = getattr(obj, "prefetched_user_last_seen", None)
+        # read events not flushed to the database yet (see chat/last_seen.py)
+        pending_seen_at = get_request_pending_last_seen(self.context, user).get(
+            str(obj.room_id)
+        )
 
         if user_last_seen_records is not None:
             # We have prefetched data
             if user_last_seen_records:
                 last_seen_time = user_last_seen_records[0].last_seen_at
-            else:
+            elif pending_seen_at is None:
                 # Never seen this room = has unread messages if any messages exist
                 return obj.messages.exists()
+            else:
+                last_seen_time = None
         else:
             # Fallback to database query
             try:
                 last_seen = obj.user_last_seen.get(user=user)  # Use your related_name
                 last_seen_time = last_seen.last_seen_at
             except obj.user_last_seen.model.DoesNotExist:
-                return obj.messages.exists()
+                if pending_seen_at is None:
+                    return obj.messages.exists()
+                last_seen_time = None
+        last_seen_time = merge_last_seen(last_seen_time, pending_seen_at)
 
         # Check if there are messages after last seen time (excluding user's own messages)
         return (
@@ -276,10 +299,123 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         ]
 
 
+# columns of a lean history row (one query, sender joined once)
+MESSAGE_HISTORY_FIELDS = [
+    "message_id",
+    "sender",
+    "sender__full_name",
+    "sender__user_type",
+    "content",
+    "message_type",
+    "file",
+    "sent_at",
+    "edited_at",
+    "is_deleted",
+    "is_edited",
+]
+
+
+class CompactChatMessageSerializer(serializers.Serializer):
+    """Message history row built from values(), the sender is referenced by id"""
+
+    message_id = serializers.UUIDField(read_only=True)
+    sender_id = serializers.UUIDField(source="sender", read_only=True)
+    content = serializers.CharField(read_only=True)
+    message_type = serializers.CharField(read_only=True)
+    file = serializers.SerializerMethodField()
+    timestamp = serializers.DateTimeField(source="sent_at", read_only=True)
+    edited_at = serializers.DateTimeField(read_only=True)
+    is_deleted = serializers.BooleanField(read_only=True)
+    is_edited = serializers.BooleanField(read_only=True)
+
+    def get_file(self, row):
+        if not row["file"]:
+            return None
+        return ChatMessages._meta.get_field("file").storage.url(row["file"])
+
+
+def build_message_history_tables(room, rows):
+    """The room (once per page) and the de-duplicated senders keyed by id"""
+    senders = {}
+    for row in rows:
+        sender_id = str(row["sender"])
+        if sender_id not in senders:
+            senders[sender_id] = {
+                "id": sender_id,
+                "full_name": row["sender__full_name"],
+                "user_type": row["sender__user_type"],
+            }
+
+    return {
+        "room": {
+            "room_id": str(room.room_id),
+            "room_name": room.room_name,
+            "is_private": room.is_private,
+            "is_dm": room.is_dm,
+        },
+        "senders": senders,
+    }
+
+
+class ChatMessageSearchResultSerializer(serializers.ModelSerializer):
+    """Search hit with its room, rank and highlighted content"""
+
+    room_id = serializers.UUIDField(source="room.room_id", read_only=True)
+    room_name = serializers.CharField(source="room.room_name", read_only=True)
+    sender = serializers.SerializerMethodField()
+    timestamp = serializers.DateTimeField(source="sent_at", read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatMessages
+        fields = [
+            "message_id",
+            "room_id",
+            "room_name",
+            "sender",
+            "content",
+            "headline",
+            "rank",
+            "timestamp",
+            "edited_at",
+        ]
+        read_only_fields = fields
+
+    def get_sender(self, obj):
+        return {"id": str(obj.sender.id), "full_name": obj.sender.full_name}
+
+    def get_headline(self, obj):
+        if obj.headline is not None:
+            return render_headline(obj.headline)
+        return highlight(obj.content, self.context.get("query", ""))
+
+
 class ChatFileUploadSerializer(serializers.ModelSerializer):
+    # id of a completed chunked upload, instead of sending the file inline
+    upload_id = CompletedUploadField(write_only=True, required=False)
+
     class Meta:
         model = ChatMessages
-        fields = ("file",)
+        fields = ("file", "upload_id")
+
+    def validate(self, data):
+        if not data.get("file") and not data.get("upload_id"):
+            raise serializers.ValidationError("Send either a file or an upload_id.")
+        return data
+
+    def create(self, validated_data):
+        file = validated_data.pop("file", None)
+        file = validated_data.pop("upload_id", None) or file
+        message = ChatMessages(**validated_data)
+        with atomic_with_files():
+            # written to the spool only with STORAGE_OFFLOAD_ENABLED
+            try:
+                store_file(message, "file", file)
+            except UploadUsedError as e:
+                raise serializers.ValidationError({"upload_id": str(e)})
+            message.save()
+        return message
 
 
 class ChatMessageUpdateSerializer(serializers.ModelSerializer):
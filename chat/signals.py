@@ -0,0 +1,31 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.dispatch import receiver
+
+from uploads.offload import file_stored
+from .models import ChatMessages
+
+
+def send_file_message(message):
+    """Broadcast a file message to the room group"""
+    layer = get_channel_layer()
+    async_to_sync(layer.group_send)(
+        f"chat_{message.room_id}",
+        {
+            "type": "chat_message",
+            "message_id": str(message.message_id),
+            "message": message.file.url,
+            "sender_id": str(message.sender_id),
+            "sender_full_name": message.sender.full_name,
+            "timestamp": message.sent_at.isoformat(),
+            "message_type": "file",
+        },
+    )
+
+
+@receiver(file_stored, sender=ChatMessages)
+def send_offloaded_file_message(sender, instance, **kwargs):
+    try:
+        send_file_message(instance)
+    except Exception as e:
+        print(f"[ERROR] Failed to broadcast file message {instance.message_id}: {e}")
@@ -1,3 +1,201 @@
+import base64
+import uuid
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import (
+    ChatMembers,
+    ChatMessages,
+    ChatRooms,
+    UserRoomLastSeen,
+    UserRoomUnreadCount,
+)
+from .search import HEADLINE_START, HEADLINE_STOP, highlight, render_headline
+from .unread import (
+    decrement_unread_counts,
+    get_total_unread_count,
+    increment_unread_counts,
+    rebuild_unread_counts,
+)
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="client@example.com", full_name="Client", user_type="client"
+        )
+        self.other = User.objects.create(
+            email="accountant@example.com",
+            full_name="Accountant",
+            user_type="accountant",
+        )
+        self.room = ChatRooms.objects.create(room_name="Room", creator=self.user)
+        for user in (self.user, self.other):
+            ChatMembers.objects.create(room_id=self.room, user_id=user)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def send(self, content, sender=None):
+        return ChatMessages.objects.create(
+            room=self.room, sender=sender or self.other, content=content
+        )
+
+
+class MessageSearchHeadlineTests(ChatTestCase):
+    """Headlines are rendered as HTML by the clients: only <mark> is markup"""
+
+    def test_markup_in_the_message_is_escaped(self):
+        self.send("hi <img src=x onerror=alert(1)> hello")
+
+        response = self.api.get("/chat/chatrooms/messages/search/", {"q": "hello"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"][0]["headline"],
+            "hi &lt;img src=x onerror=alert(1)&gt; <mark>hello</mark>",
+        )
+
+    def test_highlight(self):
+        self.assertEqual(
+            highlight("<b>Tax</b> & amp", "tax amp"),
+            "&lt;b&gt;<mark>Tax</mark>&lt;/b&gt; &amp; <mark>amp</mark>",
+        )
+        self.assertEqual(highlight("<b>", ""), "&lt;b&gt;")
+
+    def test_postgresql_headline(self):
+        headline = f"<script>x</script> {HEADLINE_START}tax{HEADLINE_STOP}"
+        self.assertEqual(
+            render_headline(headline),
+            "&lt;script&gt;x&lt;/script&gt; <mark>tax</mark>",
+        )
+
+
+class MessageSearchRoomTests(ChatTestCase):
+    def search(self, room_id):
+        return self.api.get(
+            "/chat/chatrooms/messages/search/", {"q": "hello", "room_id": room_id}
+        )
+
+    def test_search_in_a_room(self):
+        self.send("hello")
+        response = self.search(str(self.room.room_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_malformed_room_id(self):
+        response = self.search("not-a-uuid")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("room_id", response.json())
+
+    def test_unknown_room(self):
+        self.assertEqual(self.search(str(uuid.uuid4())).status_code, 404)
+
+    def test_room_of_other_users(self):
+        room = ChatRooms.objects.create(room_name="Other", creator=self.other)
+        ChatMembers.objects.create(room_id=room, user_id=self.other)
+        self.assertEqual(self.search(str(room.room_id)).status_code, 404)
+
+
+class MessageCursorTests(ChatTestCase):
+    def history(self, **params):
+        return self.api.get(f"/chat/chatrooms/{self.room.room_id}/messages/", params)
+
+    def test_cursors_page_through_the_history(self):
+        for i in range(3):
+            self.send(f"message {i}")
+
+        first = self.history(page_size=2).json()
+        self.assertTrue(first["has_more"])
+        second = self.history(page_size=2, before=first["before"]).json()
+
+        self.assertFalse(second["has_more"])
+        self.assertEqual(len(first["results"]) + len(second["results"]), 3)
+
+    def test_invalid_cursors_are_404(self):
+        def cursor(position):
+            return base64.urlsafe_b64encode(position.encode()).decode()
+
+        for value in (
+            "not base64 !",
+            cursor("garbage"),
+            # well formed but not a message id
+            cursor("2025-01-01T12:00:00+00:00|not-a-uuid"),
+            # naive timestamp
+            cursor(f"2025-01-01T12:00:00|{uuid.uuid4()}"),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(self.history(before=value).status_code, 404)
+                self.assertEqual(self.history(after=value).status_code, 404)
+
+
+class UnreadCountTests(ChatTestCase):
+    def unread(self, user):
+        counter = UserRoomUnreadCount.objects.filter(user=user, room=self.room).first()
+        return counter.unread_count if counter else 0
+
+    def send_unread(self, content):
+        message = self.send(content)
+        increment_unread_counts(message)
+        return message
+
+    def delete(self, message):
+        message.is_deleted = True
+        message.save()
+        decrement_unread_counts(message)
+
+    def test_deleting_an_unread_message(self):
+        messages = [self.send_unread(f"message {i}") for i in range(3)]
+        self.assertEqual(self.unread(self.user), 3)
+        self.assertEqual(self.unread(self.other), 0)
+
+        self.delete(messages[1])
+
+        self.assertEqual(self.unread(self.user), 2)
+        self.assertEqual(get_total_unread_count(self.user), 2)
+
+    def test_deleting_a_message_already_read(self):
+        message = self.send_unread("read")
+        UserRoomLastSeen.objects.create(
+            user=self.user, room=self.room, last_seen_at=timezone.now()
+        )
+        self.send_unread("unread")
+
+        self.delete(message)
+
+        self.assertEqual(self.unread(self.user), 2)
+
+    def test_buffered_read_of_the_room_counts(self):
+        message = self.send_unread("read")
+        buffered = {str(self.user.id): timezone.now()}
+
+        with mock.patch(
+            "chat.unread.get_room_pending_last_seen", return_value=buffered
+        ) as pending:
+            self.delete(message)
+
+        pending.assert_called_once_with(self.room.room_id, [str(self.user.id)])
+        self.assertEqual(self.unread(self.user), 1)
+
+    def test_missing_counter_is_counted_from_the_history(self):
+        # sent before the member had a counter row
+        for i in range(2):
+            self.send(f"message {i}")
+        message = self.send("latest")
+
+        increment_unread_counts(message)
+
+        self.assertEqual(self.unread(self.user), 3)
+
+    def test_rebuild(self):
+        for i in range(2):
+            self.send(f"message {i}")
+        self.send("own", sender=self.user)
+
+        rebuild_unread_counts()
 
-# Create your tests here.
+        self.assertEqual(self.unread(self.user), 2)
+        self.assertEqual(self.unread(self.other), 1)
@@ -0,0 +1,141 @@
+# helpers to maintain the denormalized per (user, room) unread counters
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+
+from .last_seen import get_room_pending_last_seen
+from .models import ChatMembers, UserRoomLastSeen, UserRoomUnreadCount
+
+
+def increment_unread_counts(message):
+    """Add one unread message for every room member except the sender"""
+    member_ids = list(
+        ChatMembers.objects.filter(room_id=message.room_id)
+        .exclude(user_id=message.sender_id)
+        .values_list("user_id_id", flat=True)
+    )
+    if not member_ids:
+        return
+
+    updated = UserRoomUnreadCount.objects.filter(
+        room_id=message.room_id, user_id__in=member_ids
+    ).update(unread_count=F("unread_count") + 1)
+
+    # members without a counter row yet: counted from the history (the
+    # message is already saved), not assumed to be their first unread one
+    if updated < len(member_ids):
+        existing_ids = set(
+            UserRoomUnreadCount.objects.filter(
+                room_id=message.room_id, user_id__in=member_ids
+            ).values_list("user_id", flat=True)
+        )
+        missing_ids = [user_id for user_id in member_ids if user_id not in existing_ids]
+        missing = ChatMembers.objects.filter(
+            room_id=message.room_id, user_id__in=missing_ids
+        )
+        UserRoomUnreadCount.objects.bulk_create(
+            [
+                UserRoomUnreadCount(user_id=user_id, room_id=room_id, unread_count=unread)
+                for user_id, room_id, unread in count_unread(missing)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def decrement_unread_counts(message):
+    """Remove a deleted message from the counters of members who did not read it yet"""
+    counters = UserRoomUnreadCount.objects.filter(
+        room_id=message.room_id, unread_count__gt=0
+    ).exclude(user_id=message.sender_id)
+
+    # the read events still buffered count too, only those of this room
+    user_ids = [str(user_id) for user_id in counters.values_list("user_id", flat=True)]
+    pending = get_room_pending_last_seen(message.room_id, user_ids)
+    seen_in_buffer = [
+        user_id for user_id, seen_at in pending.items() if seen_at >= message.sent_at
+    ]
+
+    already_seen = UserRoomLastSeen.objects.filter(
+        user=OuterRef("user"),
+        room=OuterRef("room"),
+        last_seen_at__gte=message.sent_at,
+    )
+    counters.exclude(user_id__in=seen_in_buffer).filter(~Exists(already_seen)).update(
+        unread_count=F("unread_count") - 1
+    )
+
+
+def reset_unread_count(user, room):
+    """Mark every message of the room as read for this user"""
+    UserRoomUnreadCount.objects.filter(user=user, room=room).update(unread_count=0)
+
+
+def get_total_unread_count(user):
+    """Total unread messages across all the rooms of the user (one indexed SUM)"""
+    total = UserRoomUnreadCount.objects.filter(user=user).aggregate(
+        total=Sum("unread_count")
+    )["total"]
+    return total or 0
+
+
+def count_unread(memberships):
+    """(user_id, room_id, unread messages) of ChatMembers rows, from the history"""
+    last_seen = UserRoomLastSeen.objects.filter(
+        user=OuterRef("user_id"), room=OuterRef("room_id")
+    ).values("last_seen_at")[:1]
+
+    return (
+        memberships.annotate(last_seen_at=Subquery(last_seen))
+        .annotate(
+            unread=Count(
+                "room_id__messages",
+                filter=Q(room_id__messages__is_deleted=False)
+                & ~Q(room_id__messages__sender=F("user_id"))
+                & (
+                    Q(last_seen_at__isnull=True)
+                    | Q(room_id__messages__sent_at__gt=F("last_seen_at"))
+                ),
+            )
+        )
+        .values_list("user_id", "room_id", "unread")
+        .order_by()
+    )
+
+
+def rebuild_unread_counts(batch_size=1000):
+    """
+    Recompute every counter from ChatMessages / UserRoomLastSeen (flush the
+    buffered read events first). Returns the number of counters written.
+    """
+    memberships = count_unread(ChatMembers.objects.all())
+
+    written = 0
+    batch = []
+    for user_id, room_id, unread in memberships.iterator(chunk_size=batch_size):
+        batch.append(
+            UserRoomUnreadCount(user_id=user_id, room_id=room_id, unread_count=unread)
+        )
+        if len(batch) >= batch_size:
+            written += _write_counters(batch)
+            batch = []
+    if batch:
+        written += _write_counters(batch)
+
+    # counters of users who left their rooms
+    UserRoomUnreadCount.objects.exclude(
+        Exists(
+            ChatMembers.objects.filter(
+                user_id=OuterRef("user"), room_id=OuterRef("room")
+            )
+        )
+    ).delete()
+
+    return written
+
+
+def _write_counters(batch):
+    UserRoomUnreadCount.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["user", "room"],
+        update_fields=["unread_count"],
+    )
+    return len(batch)
@@ -16,6 +16,7 @@ from .views import (
     UnreadMessageCountAPIView,
     RoomMembersCountAPIView,
     MarkRoomAsReadAPIView,
+    ChatMessageSearchAPIView,
 )
 
 urlpatterns = [
@@ -68,6 +69,11 @@ urlpatterns = [
         DirectMessageRoomAPIView.as_view(),
         name="create_direct_message_room",
     ),
+    path(
+        "chatrooms/messages/search/",
+        ChatMessageSearchAPIView.as_view(),
+        name="search_messages",
+    ),
     path(
         "chatrooms/messages/<uuid:message_id>/delete/",
         ChatMessageDeleteAPIView.as_view(),
@@ -1,4 +1,6 @@
 # chat/views.py
+import uuid
+
 from rest_framework import views, status
 from rest_framework.response import Response
 from rest_framework import generics
@@ -13,14 +15,30 @@ from .serializers import (
     ChatFileUploadSerializer,
     DirectMessageRoomSerializer,
     ChatRoomListSerializer,
+    CompactChatMessageSerializer,
+    ChatMessageSearchResultSerializer,
+    MESSAGE_HISTORY_FIELDS,
+    build_message_history_tables,
 )
 from .models import ChatRooms, ChatMessages, ChatMembers, UserRoomLastSeen
+from realtime.cache import invalidate_room_cache
+from realtime.protocol import pre_encode
+from .unread import (
+    increment_unread_counts,
+    decrement_unread_counts,
+    reset_unread_count,
+    get_total_unread_count,
+)
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from .pagination import MessageCursorPagination
+from .last_seen import record_last_seen
+from .search import search_messages
+from .signals import send_file_message
 from rest_framework.filters import SearchFilter
-from rest_framework.parsers import MultiPartParser
+from rest_framework.parsers import MultiPartParser, JSONParser
 from django.http import FileResponse
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -212,12 +230,15 @@ class GroupChatRoomRetrieveUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPI
         return obj
 
     def perform_update(self, serializer):
-        serializer.save(creator=self.request.user)
+        room = serializer.save(creator=self.request.user)
+        invalidate_room_cache(room.room_id)
 
     def perform_destroy(self, instance):
         # Ensure the user is the creator before deleting
         if instance.creator == self.request.user:
+            room_id = instance.room_id
             instance.delete()
+            invalidate_room_cache(room_id)
         else:
             raise PermissionError("You do not have permission to delete this room.")
 
@@ -256,6 +277,7 @@ class ChatRoomAddMemberAPIView(views.APIView):
             )
 
         ChatMembers.objects.create(room_id=room, user_id=target_user)
+        invalidate_room_cache(room.room_id, target_user.id)
 
         # Broadcast member added event to all room users
         channel_layer = get_channel_layer()
@@ -263,14 +285,16 @@ class ChatRoomAddMemberAPIView(views.APIView):
 
         async_to_sync(channel_layer.group_send)(
             room_group_name,
-            {
-                "type": "member.added",
-                "user_id": str(target_user.id),
-                "full_name": target_user.full_name,
-                "room_id": str(room.room_id),
-                "added_by": str(request.user.id),
-                "added_by_name": request.user.full_name,
-            },
+            pre_encode(
+                {
+                    "type": "member.added",
+                    "user_id": str(target_user.id),
+                    "full_name": target_user.full_name,
+                    "room_id": str(room.room_id),
+                    "added_by": str(request.user.id),
+                    "added_by_name": request.user.full_name,
+                }
+            ),
         )
         serializer = ChatRoomSerializer(room)
 
@@ -311,6 +335,8 @@ class ChatRoomRemoveMemberAPIView(views.APIView):
             )
 
         room.members.filter(user_id=target_user).delete()
+        room.user_unread_counts.filter(user=target_user).delete()
+        invalidate_room_cache(room.room_id, target_user.id)
 
         # Broadcast member removed event to all room users
         channel_layer = get_channel_layer()
@@ -318,14 +344,16 @@ class ChatRoomRemoveMemberAPIView(views.APIView):
 
         async_to_sync(channel_layer.group_send)(
             room_group_name,
-            {
-                "type": "member.removed",
-                "user_id": str(target_user.id),
-                "full_name": target_user.full_name,
-                "room_id": str(room.room_id),
-                "removed_by": str(request.user.id),
-                "removed_by_name": request.user.full_name,
-            },
+            pre_encode(
+                {
+                    "type": "member.removed",
+                    "user_id": str(target_user.id),
+                    "full_name": target_user.full_name,
+                    "room_id": str(room.room_id),
+                    "removed_by": str(request.user.id),
+                    "removed_by_name": request.user.full_name,
+                }
+            ),
         )
 
         serializer = ChatRoomSerializer(room)
@@ -408,11 +436,21 @@ class RoomMemberListAPIView(generics.ListAPIView):
 class RoomMessageListAPIView(generics.ListAPIView):
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = MessageCursorPagination
     page_size = 20
     ordering = ["-sent_at"]
-    filter_backends = [SearchFilter]
-    search_fields = ["content"]
+
+    @property
+    def paginator(self):
+        # keyset (before / after cursors) by default, page numbers are kept
+        # for clients still sending ?page= or searching
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if "page" in params or "search" in params:
+                self._paginator = PageNumberPagination()
+            else:
+                self._paginator = MessageCursorPagination()
+        return self._paginator
 
     def get_queryset(self):
         room_id = self.kwargs.get("room_id")
@@ -421,7 +459,60 @@ class RoomMessageListAPIView(generics.ListAPIView):
         if not room.members.filter(user_id=self.request.user).exists():
             raise PermissionDenied("You are not a member of this room.")
 
-        return room.messages.all().order_by("-sent_at")
+        self.room = room
+        search = self.request.query_params.get("search")
+        if search:
+            # ranked full-text search (see chat/search.py)
+            return search_messages(self.request.user, search, room=room)
+
+        if isinstance(self.paginator, MessageCursorPagination):
+            # lean rows, the room and the senders are emitted once per page
+            return room.messages.values(*MESSAGE_HISTORY_FIELDS)
+
+        return room.messages.select_related("sender", "room").order_by("-sent_at")
+
+    def list(self, request, *args, **kwargs):
+        if not isinstance(self.paginator, MessageCursorPagination):
+            return super().list(request, *args, **kwargs)
+
+        rows = self.paginate_queryset(self.get_queryset())
+        serializer = CompactChatMessageSerializer(rows, many=True)
+        return self.paginator.get_paginated_response(
+            serializer.data, **build_message_history_tables(self.room, rows)
+        )
+
+
+class ChatMessageSearchAPIView(generics.ListAPIView):
+    """Ranked search across all the rooms the user belongs to"""
+
+    serializer_class = ChatMessageSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PageNumberPagination
+    page_size = 20
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["query"] = self.request.query_params.get("q", "")
+        return context
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            return ChatMessages.objects.none()
+
+        room = None
+        room_id = self.request.query_params.get("room_id")
+        if room_id:
+            try:
+                room_id = uuid.UUID(room_id)
+            except ValueError:
+                raise ValidationError({"room_id": "Invalid room id."})
+            # a room the user is not a member of is not found either
+            room = get_object_or_404(
+                ChatRooms, room_id=room_id, members__user_id=self.request.user
+            )
+
+        return search_messages(self.request.user, query, room=room)
 
 
 class RoomMembersCountAPIView(views.APIView):
@@ -464,15 +555,17 @@ class ChatMessageUpdateAPIView(generics.UpdateAPIView):
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
             room_group_name,
-            {
-                "type": "message_edited",
-                "message_id": str(updated_message.message_id),
-                "new_content": updated_message.content,
-                "edited_at": updated_message.edited_at.isoformat(),
-                "room_id": str(updated_message.room.room_id),
-                "sender_id": str(updated_message.sender.id),
-                "sender_full_name": updated_message.sender.full_name,
-            },
+            pre_encode(
+                {
+                    "type": "message_edited",
+                    "message_id": str(updated_message.message_id),
+                    "new_content": updated_message.content,
+                    "edited_at": updated_message.edited_at.isoformat(),
+                    "room_id": str(updated_message.room.room_id),
+                    "sender_id": str(updated_message.sender.id),
+                    "sender_full_name": updated_message.sender.full_name,
+                }
+            ),
         )
 
 
@@ -500,22 +593,25 @@ class ChatMessageDeleteAPIView(generics.DestroyAPIView):
         instance.content = "This message has been deleted"
         instance.edited_at = datetime.now()
         instance.save()
+        decrement_unread_counts(instance)
         # Notify channel layer that a message was deleted
         room_group_name = f"chat_{instance.room.room_id}"
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
             room_group_name,
-            {
-                "type": "message_deleted",
-                "message_id": str(instance.message_id),
-                "room_id": str(instance.room.room_id),
-                "edited_at": instance.edited_at.isoformat(),
-            },
+            pre_encode(
+                {
+                    "type": "message_deleted",
+                    "message_id": str(instance.message_id),
+                    "room_id": str(instance.room.room_id),
+                    "edited_at": instance.edited_at.isoformat(),
+                }
+            ),
         )
 
 
 class ChatFileUploadAPIView(views.APIView):
-    parser_classes = [MultiPartParser]
+    parser_classes = [MultiPartParser, JSONParser]
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
@@ -525,24 +621,25 @@ class ChatFileUploadAPIView(views.APIView):
         if not room.members.filter(user_id=request.user).exists():
             raise PermissionDenied("You are not a member of this room.")
 
-        serializer = ChatFileUploadSerializer(data=request.data)
+        serializer = ChatFileUploadSerializer(
+            data=request.data, context={"request": request}
+        )
 
         if serializer.is_valid():
             msg = serializer.save(sender=request.user, room=room, message_type="file")
-            # broadcast the file-message to WS group
-            layer = get_channel_layer()
-            async_to_sync(layer.group_send)(
-                f"chat_{room_id}",
-                {
-                    "type": "chat_message",
-                    "message_id": str(msg.message_id),
-                    "message": msg.file.url,
-                    "sender_id": str(request.user.id),
-                    "sender_full_name": request.user.full_name,
-                    "timestamp": msg.sent_at.isoformat(),
-                    "message_type": "file",
-                },
-            )
+            increment_unread_counts(msg)
+            if msg.storage_status == "pending":
+                # broadcast by the offload worker once the file is stored
+                return Response(
+                    {
+                        "message_id": str(msg.message_id),
+                        "file_url": None,
+                        "storage_status": msg.storage_status,
+                    },
+                    status=status.HTTP_202_ACCEPTED,
+                )
+
+            send_file_message(msg)
             return Response({"file_url": msg.file.url}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -559,16 +656,9 @@ class MarkRoomAsReadAPIView(views.APIView):
         if not room.members.filter(user_id=request.user).exists():
             raise PermissionDenied("You are not a member of this room.")
 
-        from django.utils import timezone
-
-        # Update or create last seen record using your related_name
-        last_seen, created = room.user_last_seen.get_or_create(
-            user=request.user, defaults={"last_seen_at": timezone.now()}
-        )
-
-        if not created:
-            last_seen.last_seen_at = timezone.now()
-            last_seen.save()
+        # buffered, written by `manage.py flush_last_seen`
+        record_last_seen(request.user.id, room.room_id)
+        reset_unread_count(request.user, room)
 
         return Response(
             {"message": "Last seen updated successfully"}, status=status.HTTP_200_OK
@@ -579,26 +669,8 @@ class UnreadMessageCountAPIView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        unread_count = 0
-
-        # Count unread messages across all rooms
-        user_rooms = ChatRooms.objects.filter(members__user_id=user)
-
-        for room in user_rooms:
-            try:
-                last_seen = room.user_last_seen.get(user=user)
-                unread_count += (
-                    room.messages.filter(
-                        sent_at__gt=last_seen.last_seen_at, is_deleted=False
-                    )
-                    .exclude(sender=user)
-                    .count()
-                )
-            except:
-                unread_count += (
-                    room.messages.filter(is_deleted=False).exclude(sender=user).count()
-                )
+        # counters are maintained on send / read / delete (see chat/unread.py)
+        unread_count = get_total_unread_count(request.user)
 
         return Response({"unread_count": unread_count})
 
@@ -1,4 +1,6 @@
 # realtime_chat_backend/auth_middleware.py
+import time
+
 import jwt
 from urllib.parse import parse_qs
 
@@ -6,34 +8,83 @@ from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS
 from rest_framework_simplejwt.tokens import AccessToken
 
+from accounts.signals import WEBSOCKET_AUTH_CACHE_FIELDS
+from realtime.cache import MISSING, auth_user_cache
+
 User = get_user_model()
 
 
+# what the auth cache keeps of a user: plain values, every lookup builds its
+# own User from them (the other fields are loaded if ever accessed). In the
+# model's field order, as from_db expects them.
+AUTH_USER_FIELDS = tuple(
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in ("id", *WEBSOCKET_AUTH_CACHE_FIELDS)
+)
+
+
 @database_sync_to_async
-def get_user_from_token(token_key):
+def fetch_user_fields(user_id):
+    return User.objects.filter(id=user_id).values_list(*AUTH_USER_FIELDS).first()
+
+
+def build_user(values):
+    return User.from_db(DEFAULT_DB_ALIAS, AUTH_USER_FIELDS, values)
+
+
+async def get_user_from_token(token_key):
     """
     Attempts to authenticate a user based on a JWT token.
-    This function must be async because it interacts with the database.
+    The signature is always verified, but the user itself is served from a
+    per-process cache (bounded by the token's exp) to skip the DB on reconnects.
     """
     try:
         # AccessToken handles expiration and signature validation internally.
         access_token = AccessToken(token_key)
-        user_id = access_token["user_id"]  # Get user_id from the token payload
-        user = User.objects.get(id=user_id)
-        return user
+        user_id = str(access_token["user_id"])  # Get user_id from the token payload
     except (jwt.ExpiredSignatureError, jwt.DecodeError, jwt.InvalidTokenError) as e:
         # Catch specific JWT errors for clearer debugging if needed
         print(f"JWT Token Error: Invalid or Expired Token: {e}")
         return AnonymousUser()
-    except User.DoesNotExist:
-        print(f"JWT Token Error: User with ID not found for token: {token_key}")
-        return AnonymousUser()
     except Exception as e:
         print(f"Unexpected error during JWT authentication: {e}")
         return AnonymousUser()
 
+    values = auth_user_cache.get(user_id)
+    if values is MISSING:
+        try:
+            values = await fetch_user_fields(user_id)
+        except Exception as e:
+            print(f"Unexpected error during JWT authentication: {e}")
+            return AnonymousUser()
+
+        if values is None:
+            print(f"JWT Token Error: User with ID not found for token: {token_key}")
+            return AnonymousUser()
+
+        # the entry is dropped on account changes (see accounts/signals.py)
+        auth_user_cache.set(user_id, values, ttl=access_token["exp"] - time.time())
+
+    user = build_user(values)
+    if not user.is_active or user.account_status == "suspended":
+        print(f"JWT Token Error: User {user_id} is inactive or suspended")
+        return AnonymousUser()
+
+    return user
+
+
+def get_authorization_header(scope):
+    """Returns the raw Authorization header without building a dict of all headers"""
+    for name, value in scope.get("headers", ()):
+        # Header names are lowercase and byte strings
+        if name == b"authorization":
+            return value
+    return None
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
@@ -51,10 +102,7 @@ class JWTAuthMiddleware(BaseMiddleware):
             token_key = None
 
             # --- 1. Try to get token from Authorization header (Preferred for production) ---
-            headers = dict(scope.get("headers", []))
-            auth_header = headers.get(
-                b"authorization"
-            )  # Header names are lowercase and byte strings
+            auth_header = get_authorization_header(scope)
 
             if auth_header:
                 try:
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "rest_framework_simplejwt",
@@ -56,6 +57,8 @@ INSTALLED_APPS = [
     "learning",
     "notifications",
     "realtime",
+    "uploads",
+    "retention",
 ]
 # Use custom adapter to populate full_name on social login
 SOCIALACCOUNT_ADAPTER = "accounts.adapters.CustomSocialAccountAdapter"
@@ -112,6 +115,25 @@ else:
     }
 
 
+# Cache (shared between processes when CACHE_URL points to redis)
+
+CACHE_URL = os.getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "my_accountant",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -153,6 +175,17 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Chunked uploads (uploads app): chunks and assembled files wait here
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(BASE_DIR, "upload_spool"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(5 * 1024 * 1024)))  # bytes
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))  # bytes
+# unfinished or unused upload sessions are purged after this delay
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+# files are written to the spool and pushed to the storage by
+# `manage.py run_storage_offload_worker` instead of inside the request
+STORAGE_OFFLOAD_ENABLED = os.getenv("STORAGE_OFFLOAD_ENABLED", "False").lower() == "true"
+STORAGE_OFFLOAD_MAX_ATTEMPTS = int(os.getenv("STORAGE_OFFLOAD_MAX_ATTEMPTS", "5"))
+
 
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -208,6 +241,69 @@ CHANNEL_LAYERS = {
     },
 }
 
+# room.list.update events are merged per (user, room) during this window (0 disables it)
+ROOM_LIST_UPDATE_WINDOW_MS = int(os.getenv("ROOM_LIST_UPDATE_WINDOW_MS", "250"))
+# pending updates are flushed early once this many (user, room) pairs are buffered
+ROOM_LIST_UPDATE_MAX_BATCH = int(os.getenv("ROOM_LIST_UPDATE_MAX_BATCH", "500"))
+
+# websocket workers publish their counters (realtime/metrics.py) every
+# REALTIME_STATS_INTERVAL seconds, a worker silent for REALTIME_STATS_MAX_AGE is left out
+REALTIME_STATS_INTERVAL = int(os.getenv("REALTIME_STATS_INTERVAL", "30"))  # seconds
+REALTIME_STATS_MAX_AGE = int(os.getenv("REALTIME_STATS_MAX_AGE", "90"))  # seconds
+
+# websocket presence (realtime/presence.py): connections expire after PRESENCE_TTL_SECONDS
+# unless refreshed by the heartbeat of their consumer
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", "60"))
+PRESENCE_HEARTBEAT_SECONDS = int(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "20"))
+# max user ids answered by one "presence_query" websocket message
+PRESENCE_QUERY_MAX_USERS = int(os.getenv("PRESENCE_QUERY_MAX_USERS", "500"))
+
+# typing indicators (realtime/typing.py): a user stops typing after TYPING_TIMEOUT_SECONDS
+# without frames, repeated frames within TYPING_REFRESH_SECONDS are dropped and every room
+# gets at most one typing_users event per TYPING_BROADCAST_INTERVAL_MS
+TYPING_TIMEOUT_SECONDS = int(os.getenv("TYPING_TIMEOUT_SECONDS", "6"))
+TYPING_REFRESH_SECONDS = int(os.getenv("TYPING_REFRESH_SECONDS", "2"))
+TYPING_BROADCAST_INTERVAL_MS = int(os.getenv("TYPING_BROADCAST_INTERVAL_MS", "500"))
+
+# seconds between two flushes of the buffered room last-seen timestamps (chat/last_seen.py)
+LAST_SEEN_FLUSH_INTERVAL = int(os.getenv("LAST_SEEN_FLUSH_INTERVAL", "5"))
+
+# per-process cache of rooms and memberships used by the websocket consumers
+ROOM_CACHE_TTL = int(os.getenv("ROOM_CACHE_TTL", "60"))  # seconds
+ROOM_CACHE_MAXSIZE = int(os.getenv("ROOM_CACHE_MAXSIZE", "10000"))
+# users resolved from websocket JWTs (entries never outlive the token's exp)
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))  # seconds
+AUTH_USER_CACHE_MAXSIZE = int(os.getenv("AUTH_USER_CACHE_MAXSIZE", "50000"))
+
+# categories table served to the service list serializers
+SERVICE_CATEGORY_CACHE_TTL = int(os.getenv("SERVICE_CATEGORY_CACHE_TTL", "3600"))  # seconds
+# public catalog responses (list / detail), also invalidated on every service change
+SERVICE_CATALOG_CACHE_TTL = int(os.getenv("SERVICE_CATALOG_CACHE_TTL", "300"))  # seconds
+
+# cached unread notification count per user (notifications/inbox.py), recounted
+# after this many seconds in case an increment was missed
+NOTIFICATION_UNREAD_CACHE_TTL = int(os.getenv("NOTIFICATION_UNREAD_CACHE_TTL", "3600"))
+
+# `manage.py apply_retention` (retention/policies.py): rows deleted per batch and
+# days kept before read / unread notifications, soft deleted chat messages, OTPs
+# and sent or dead outbox emails are deleted
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_READ_NOTIFICATION_DAYS = int(os.getenv("RETENTION_READ_NOTIFICATION_DAYS", "90"))
+RETENTION_UNREAD_NOTIFICATION_DAYS = int(
+    os.getenv("RETENTION_UNREAD_NOTIFICATION_DAYS", "365")
+)
+RETENTION_DELETED_MESSAGE_DAYS = int(os.getenv("RETENTION_DELETED_MESSAGE_DAYS", "30"))
+RETENTION_OTP_DAYS = int(os.getenv("RETENTION_OTP_DAYS", "7"))
+RETENTION_EMAIL_OUTBOX_DAYS = int(os.getenv("RETENTION_EMAIL_OUTBOX_DAYS", "30"))
+
+# OTP endpoints (accounts/otp.py): attempts allowed per email and per client IP
+# within a sliding window of OTP_RATE_LIMIT_WINDOW seconds, past them 429
+OTP_RATE_LIMIT_WINDOW = int(os.getenv("OTP_RATE_LIMIT_WINDOW", "900"))  # seconds
+OTP_SEND_LIMIT_PER_EMAIL = int(os.getenv("OTP_SEND_LIMIT_PER_EMAIL", "3"))
+OTP_SEND_LIMIT_PER_IP = int(os.getenv("OTP_SEND_LIMIT_PER_IP", "20"))
+OTP_VERIFY_LIMIT_PER_EMAIL = int(os.getenv("OTP_VERIFY_LIMIT_PER_EMAIL", "5"))
+OTP_VERIFY_LIMIT_PER_IP = int(os.getenv("OTP_VERIFY_LIMIT_PER_IP", "30"))
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
@@ -239,6 +335,13 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "noreply@myaccountant.com")
 SERVER_EMAIL = os.getenv("SERVER_EMAIL", DEFAULT_FROM_EMAIL)
 EMAIL_TIMEOUT = 30  # Email timeout in seconds
 
+# emails are queued in the outbox and sent by `manage.py process_email_outbox`:
+# emails per backend connection, attempts before an email is dead-lettered and
+# the first retry delay in seconds (doubled on each attempt)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv("EMAIL_OUTBOX_RETRY_DELAY", "10"))
+
 EMAIL_BACKEND_FAILSILENTLY = (
     os.getenv("EMAIL_BACKEND_FAILSILENTLY", "False").lower() == "true"
 )
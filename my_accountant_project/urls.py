@@ -92,7 +92,8 @@ urlpatterns = [
     path("", include("bookings.urls")),
     path("services/", include("services.urls")),
     path("chat/", include("chat.urls")),
-    path("notifications/",include("notifications.urls"))
+    path("notifications/",include("notifications.urls")),
+    path("uploads/", include("uploads.urls")),
 ]
 
 # Serve media files during development
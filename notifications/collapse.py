@@ -0,0 +1,61 @@
+# chat message notifications are collapsed per (user, room): while the user
+# has an unread message notification for a room, a new message updates that
+# row (collapsed_count, latest title / preview) instead of inserting another
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+
+
+def notify_room_message(user_ids, title, message, room_id):
+    """
+    Message notification of every recipient with one UPDATE and one INSERT,
+    returns the collapsed rows (collapsed_count > 1) and the new ones.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        unread = {}
+        for notification in (
+            Notification.objects.select_for_update()
+            .filter(
+                user_id__in=user_ids,
+                notification_type="message",
+                related_object_id=room_id,
+                is_read=False,
+            )
+            .order_by("-last_activity_at")
+        ):
+            # the latest row of each user, older duplicates are left as they are
+            unread.setdefault(str(notification.user_id), notification)
+
+        collapsed = list(unread.values())
+        # the latest message moves the row to the top of the inbox, created_at
+        # stays the time of the first one
+        Notification.objects.filter(pk__in=[n.pk for n in collapsed]).update(
+            collapsed_count=F("collapsed_count") + 1,
+            title=title,
+            message=message,
+            last_activity_at=now,
+        )
+        for notification in collapsed:
+            notification.collapsed_count += 1
+            notification.title = title
+            notification.message = message
+            notification.last_activity_at = now
+
+        created = Notification.objects.bulk_create(
+            [
+                Notification(
+                    user_id=user_id,
+                    notification_type="message",
+                    title=title,
+                    message=message,
+                    related_object_id=room_id,
+                    last_activity_at=now,
+                )
+                for user_id in user_ids
+                if str(user_id) not in unread
+            ]
+        )
+    return collapsed + created
@@ -0,0 +1,87 @@
+# notification inbox: cursor pagination of a user's notifications and the
+# unread counter cached per user. The counter is counted once from the
+# partial unread index, then kept up to date with incr / decr by the senders
+# (utils.py) and the mark-read endpoints; a lost key is simply counted again.
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination
+
+from .models import Notification
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Latest activity first, no OFFSET and no COUNT(*): pages are index range
+    scans on (user, is_read, last_activity_at, notification_id). The id makes
+    the order unique, rows with the same timestamp keep their place.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    ordering = ("-last_activity_at", "-notification_id")
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def count_unread(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user_id):
+    key = unread_count_key(user_id)
+    count = cache.get(key)
+    if count is not None and count < 0:
+        cache.delete(key)
+        count = None
+    if count is None:
+        count = count_unread(user_id)
+        # add: a counter cached (and incremented) by another request since the
+        # count wins over it
+        if not cache.add(key, count, settings.NOTIFICATION_UNREAD_CACHE_TTL):
+            cached = cache.get(key)
+            if cached is not None:
+                count = cached
+    return count
+
+
+def increment_unread_counts(user_ids):
+    """New unread notifications for these users (one per occurrence)"""
+    for user_id in user_ids:
+        try:
+            cache.incr(unread_count_key(user_id))
+        except ValueError:
+            # not cached, counted on the next read
+            pass
+
+
+def decrement_unread_count(user_id, delta=1):
+    if not delta:
+        return
+    try:
+        cache.decr(unread_count_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def mark_all_read(user_id):
+    """Marks every unread notification of the user as read, returns how many"""
+    # one UPDATE: its row count is the number of notifications marked
+    marked_count = Notification.objects.filter(user_id=user_id, is_read=False).update(
+        is_read=True
+    )
+    decrement_unread_count(user_id, marked_count)
+    return marked_count
+
+
+def mark_read(notification):
+    """Returns False when another request already marked it"""
+    marked = Notification.objects.filter(
+        pk=notification.pk, is_read=False
+    ).update(is_read=True)
+    if marked:
+        notification.is_read = True
+        decrement_unread_count(notification.user_id)
+    return bool(marked)
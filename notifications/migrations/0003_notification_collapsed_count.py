@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='collapsed_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:56
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_activity(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.update(last_activity_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_collapsed_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_user_read_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_user_unread_idx',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When this notification last changed'),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-last_activity_at', '-notification_id'], name='notif_user_read_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-last_activity_at', '-notification_id'], name='notif_user_unread_activity_idx'),
+        ),
+    ]
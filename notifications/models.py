@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 from accounts.models import User
 
@@ -33,6 +34,9 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False)
 
+    # unread message notifications of a room are merged into one row (collapse.py)
+    collapsed_count = models.PositiveIntegerField(default=1)
+
     related_object_id = models.UUIDField(
         null=True,
         blank=True,
@@ -42,18 +46,38 @@ class Notification(models.Model):
         auto_now_add=True, help_text="When this notification was created"
     )
 
+    # inbox position: creation, then the latest message collapsed into the row
+    last_activity_at = models.DateTimeField(
+        default=timezone.now, help_text="When this notification last changed"
+    )
+
     class Meta:
-        ordering = ["-created_at"] 
+        # no default ordering: the inbox orders its pages (inbox.py) and the
+        # counts / updates stay free of ORDER BY
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # inbox pages, also filtered by read state
+            models.Index(
+                fields=["user", "is_read", "-last_activity_at", "-notification_id"],
+                name="notif_user_read_activity_idx",
+            ),
+            # only the unread rows: unread counts and mark-all-read
+            models.Index(
+                fields=["user", "-last_activity_at", "-notification_id"],
+                condition=models.Q(is_read=False),
+                name="notif_user_unread_activity_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_notification_type_display()} for {self.user.email}"
 
     def mark_as_read(self):
         if not self.is_read:
-            self.is_read = True
-            self.save(update_fields=["is_read"])
+            from .inbox import mark_read
+
+            mark_read(self)
 
 
 
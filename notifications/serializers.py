@@ -14,9 +14,16 @@ class NotificationSerializer(serializers.ModelSerializer):
             "message",
             "is_read",
             "related_object_id",
+            "collapsed_count",
             "created_at",
+            "last_activity_at",
+        ]
+        read_only_fields = [
+            "notification_id",
+            "collapsed_count",
+            "created_at",
+            "last_activity_at",
         ]
-        read_only_fields = ["notification_id", "created_at"]
 
 
 class NotificationUpdateSerializer(serializers.ModelSerializer):
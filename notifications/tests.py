@@ -1,3 +1,158 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.layers import channel_layers
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .collapse import notify_room_message
+from .inbox import get_unread_count, unread_count_key
+from .models import Notification
+from .utils import send_notification_to_user
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email="client@example.com", full_name="Client", user_type="client"
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_notifications(self, count, **fields):
+        return [
+            Notification.objects.create(
+                user=self.user,
+                notification_type="booking_created",
+                title=f"Notification {i}",
+                message="",
+                **fields,
+            )
+            for i in range(count)
+        ]
+
+    def inbox(self, page_size=2, **params):
+        """Every page of the inbox, followed through the next links"""
+        pages = []
+        response = self.api.get("/notifications/", {"page_size": page_size, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([item["notification_id"] for item in data["results"]])
+            if not data["next"]:
+                return pages
+            response = self.api.get(data["next"])
+
+
+class NotificationInboxTests(NotificationTestCase):
+    def test_latest_activity_first(self):
+        old, new = self.create_notifications(2)
+        Notification.objects.filter(pk=old.pk).update(
+            last_activity_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.assertEqual(self.inbox()[0], [str(old.pk), str(new.pk)])
+
+    def test_pages_are_stable_on_equal_timestamps(self):
+        notifications = self.create_notifications(5)
+        Notification.objects.filter(user=self.user).update(
+            last_activity_at=timezone.now()
+        )
+
+        ids = [notification_id for page in self.inbox() for notification_id in page]
+
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(
+            ids, sorted((str(n.pk) for n in notifications), reverse=True)
+        )
+
+
+class CollapsedNotificationTests(NotificationTestCase):
+    def test_collapse_moves_the_row_but_keeps_its_creation_time(self):
+        room_id = uuid.uuid4()
+        (first,) = notify_room_message([self.user.id], "From A", "hello", room_id)
+        self.create_notifications(3)
+
+        (collapsed,) = notify_room_message([self.user.id], "From A", "again", room_id)
+
+        collapsed.refresh_from_db()
+        self.assertEqual(collapsed.pk, first.pk)
+        self.assertEqual(collapsed.collapsed_count, 2)
+        self.assertEqual(collapsed.message, "again")
+        self.assertEqual(collapsed.created_at, first.created_at)
+        self.assertGreater(collapsed.last_activity_at, first.last_activity_at)
+
+        pages = self.inbox()
+        ids = [notification_id for page in pages for notification_id in page]
+        self.assertEqual(ids[0], str(first.pk))
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_read_notification_is_not_collapsed(self):
+        room_id = uuid.uuid4()
+        (first,) = notify_room_message([self.user.id], "From A", "hello", room_id)
+        first.mark_as_read()
+
+        (second,) = notify_room_message([self.user.id], "From A", "again", room_id)
+
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(second.collapsed_count, 1)
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class UnreadCountTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        channel_layers.backends.clear()
+
+    def unread_count(self):
+        response = self.api.get("/notifications/unread-count/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["unread_count"]
+
+    def send(self):
+        (notification,) = self.create_notifications(1)
+        send_notification_to_user(notification)
+        return notification
+
+    def test_cached_counter_follows_new_and_read_notifications(self):
+        self.create_notifications(2)
+        self.assertEqual(self.unread_count(), 2)
+
+        notification = self.send()
+        self.assertEqual(cache.get(unread_count_key(self.user.id)), 3)
+        self.assertEqual(self.unread_count(), 3)
+
+        notification.mark_as_read()
+        notification.mark_as_read()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 2)
+
+    def test_count_after_mark_all_read(self):
+        self.create_notifications(3)
+        self.assertEqual(self.unread_count(), 3)
+
+        response = self.api.post("/notifications/mark-all-read/")
+        self.assertEqual(response.json()["marked_count"], 3)
+        self.assertEqual(response.json()["unread_count"], 0)
+        self.send()
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_a_counter_cached_meanwhile_wins(self):
+        self.create_notifications(1)
+        key = unread_count_key(self.user.id)
+
+        def count_then_increment(user_id):
+            # another request caches the counter and increments it meanwhile
+            cache.set(key, 2)
+            return 1
+
+        with mock.patch("notifications.inbox.count_unread", count_then_increment):
+            self.assertEqual(get_unread_count(self.user.id), 2)
+        self.assertEqual(cache.get(key), 2)
@@ -1,22 +1,61 @@
+import asyncio
+
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
+
+from .inbox import increment_unread_counts
+
+
+def build_notification_event(notification):
+    """Channel layer event for a notification (uses user_id to avoid fetching the user)"""
+    return {
+        # a collapsed notification replaces the one the client already has
+        "type": (
+            "notification.collapsed"
+            if notification.collapsed_count > 1
+            else "new.notification"
+        ),
+        "notification_id": str(notification.notification_id),
+        "notification_type": notification.notification_type,
+        "title": notification.title,
+        "message": notification.message,
+        "related_object_id": str(notification.related_object_id) if notification.related_object_id else None,
+        "created_at": notification.created_at.isoformat(),
+        "last_activity_at": notification.last_activity_at.isoformat(),
+        "is_read": notification.is_read,
+        "collapsed_count": notification.collapsed_count,
+    }
+
+
+def is_new_unread(notification):
+    # collapsed rows were counted as unread when they were created
+    return not notification.is_read and notification.collapsed_count == 1
 
 
 def send_notification_to_user(notification):
-    
+    if is_new_unread(notification):
+        increment_unread_counts([notification.user_id])
+
     channel_layer = get_channel_layer()
-    user_group_name = f"user_{notification.user.id}"
+    user_group_name = f"user_{notification.user_id}"
     
     async_to_sync(channel_layer.group_send)(
-        user_group_name,
-        {
-            "type": "new.notification",
-            "notification_id": str(notification.notification_id),
-            "notification_type": notification.notification_type,
-            "title": notification.title,
-            "message": notification.message,
-            "related_object_id": str(notification.related_object_id) if notification.related_object_id else None,
-            "created_at": notification.created_at.isoformat(),
-            "is_read": notification.is_read,
-        }
-    )
\ No newline at end of file
+        user_group_name, build_notification_event(notification)
+    )
+
+
+async def send_notifications_to_users(notifications):
+    """Async fan-out of many notifications from inside a consumer (no async_to_sync)"""
+    channel_layer = get_channel_layer()
+    await sync_to_async(increment_unread_counts)(
+        [notification.user_id for notification in notifications if is_new_unread(notification)]
+    )
+
+    await asyncio.gather(
+        *[
+            channel_layer.group_send(
+                f"user_{notification.user_id}", build_notification_event(notification)
+            )
+            for notification in notifications
+        ]
+    )
@@ -3,18 +3,28 @@ from .models import Notification
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from .inbox import (
+    NotificationCursorPagination,
+    get_unread_count,
+    mark_all_read,
+    mark_read,
+)
+
 
 class NotificationListAPIView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
-    page_size = 20
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        queryset = Notification.objects.filter(user=self.request.user)
+        # ?is_read=false: the unread tab
+        is_read = self.request.query_params.get("is_read")
+        if is_read in ("true", "false"):
+            queryset = queryset.filter(is_read=is_read == "true")
+        return queryset
 
 
 class NotificationDetailAPIView(generics.RetrieveAPIView):
@@ -35,14 +45,12 @@ class NotificationMarkReadAPIView(generics.UpdateAPIView):
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
-    def perform_update(self, serializer):
-        serializer.save(is_read=True)
-
     def update(self, request, *args, **kwargs):
 
         instance = self.get_object()
 
-        if instance.is_read:
+        # conditional UPDATE: concurrent requests only count it once
+        if instance.is_read or not mark_read(instance):
             return Response(
                 {
                     "notification_id": str(instance.notification_id),
@@ -51,11 +59,6 @@ class NotificationMarkReadAPIView(generics.UpdateAPIView):
                 }
             )
 
-        serializer = self.get_serializer(instance, data={"is_read": True}, partial=True)
-
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
         return Response(
             {
                 "notification_id": str(instance.notification_id),
@@ -74,7 +77,7 @@ class NotificationUnreadCountAPIView(APIView):
 
         user = self.request.user
 
-        unread_count = Notification.objects.filter(user=user, is_read=False).count()
+        unread_count = get_unread_count(user.id)
 
         return Response({"unread_count": unread_count}, status=status.HTTP_200_OK)
 
@@ -86,17 +89,9 @@ class MarkAllAsRead(APIView):
 
     def post(self, request):
 
-        unread_notification = Notification.objects.filter(
-            user=self.request.user, is_read=False
-        )
-
-        marked_count = unread_notification.count()
-
-        unread_notification.update(is_read=True)
+        marked_count = mark_all_read(self.request.user.id)
 
-        new_unread_count = Notification.objects.filter(
-            user=self.request.user, is_read=False
-        ).count()
+        new_unread_count = get_unread_count(self.request.user.id)
 
         return Response(
             {
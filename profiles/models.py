@@ -2,6 +2,7 @@ import uuid
 import os
 from django.db import models
 from accounts.models import User
+from uploads.models import STORAGE_STATUS_CHOICES
 
 
 class ProfileAttachment(models.Model):
@@ -38,6 +39,9 @@ class ProfileAttachment(models.Model):
     original_filename = models.CharField(max_length=255)
     file_size = models.BigIntegerField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    storage_status = models.CharField(
+        max_length=20, choices=STORAGE_STATUS_CHOICES, default="stored"
+    )
 
     class Meta:
         db_table = "profile_attachments"
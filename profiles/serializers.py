@@ -12,8 +12,15 @@ class ProfileAttachmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProfileAttachment
-        fields = ["attachment_id", "url", "filename", "size", "uploaded_at"]
-        read_only_fields = ["attachment_id", "uploaded_at"]
+        fields = [
+            "attachment_id",
+            "url",
+            "filename",
+            "size",
+            "storage_status",
+            "uploaded_at",
+        ]
+        read_only_fields = ["attachment_id", "storage_status", "uploaded_at"]
 
     def get_url(self, obj):
         request = self.context.get("request")
@@ -13,6 +13,7 @@ from .models import AccountantProfile, ClientProfile, AcademicProfile, ProfileAt
 from rest_framework.views import APIView
 
 from accounts.models import User
+from uploads.offload import atomic_with_files, store_file
 
 
 class MyProfileAPIView(generics.RetrieveUpdateAPIView):
@@ -63,49 +64,53 @@ class MyProfileAPIView(generics.RetrieveUpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         """Custom update method to handle form-data with files"""
-        instance = self.get_object()
-
-        # Check if this is form-data request with files
-        if (
-            hasattr(request, "content_type")
-            and "multipart/form-data" in request.content_type
-        ):
-            # Handle form-data
-            data = {}
-            for key, value in request.data.items():
-                if key != "upload_files":
-                    data[key] = value
-
-            # Handle multiple file uploads
-            upload_files = request.FILES.getlist("upload_files")
-            if upload_files:
-                # Delete existing attachments
-                instance.profile_attachments.all().delete()
-
-                # Create new attachments for the appropriate profile type
-                for file in upload_files:
-                    attachment_data = {
-                        "file": file,
-                        "original_filename": file.name,
-                        "file_size": file.size,
-                    }
+        # attachments are replaced before the profile is validated: a rejected
+        # update keeps the old ones and leaves no new file behind
+        with atomic_with_files():
+            instance = self.get_object()
+
+            # Check if this is form-data request with files
+            if (
+                hasattr(request, "content_type")
+                and "multipart/form-data" in request.content_type
+            ):
+                # Handle form-data
+                data = {}
+                for key, value in request.data.items():
+                    if key != "upload_files":
+                        data[key] = value
+
+                # Handle multiple file uploads
+                upload_files = request.FILES.getlist("upload_files")
+                if upload_files:
+                    # Delete existing attachments
+                    instance.profile_attachments.all().delete()
+
+                    # Create new attachments for the appropriate profile type
+                    for file in upload_files:
+                        attachment_data = {
+                            "original_filename": file.name,
+                        }
                     
-                    # Set the appropriate foreign key based on user type
-                    if request.user.user_type == "accountant":
-                        attachment_data["accountant_profile"] = instance
-                    elif request.user.user_type == "client":
-                        attachment_data["client_profile"] = instance
-                    elif request.user.user_type == "academic":
-                        attachment_data["academic_profile"] = instance
+                        # Set the appropriate foreign key based on user type
+                        if request.user.user_type == "accountant":
+                            attachment_data["accountant_profile"] = instance
+                        elif request.user.user_type == "client":
+                            attachment_data["client_profile"] = instance
+                        elif request.user.user_type == "academic":
+                            attachment_data["academic_profile"] = instance
                     
-                    ProfileAttachment.objects.create(**attachment_data)
-        else:
-            # Handle JSON data normally
-            data = request.data
+                        attachment = ProfileAttachment(**attachment_data)
+                        # written to the spool only with STORAGE_OFFLOAD_ENABLED
+                        attachment.file_size = store_file(attachment, "file", file)
+                        attachment.save()
+            else:
+                # Handle JSON data normally
+                data = request.data
 
-        serializer = self.get_serializer(instance, data=data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+            serializer = self.get_serializer(instance, data=data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
 
         return Response(serializer.data)
 
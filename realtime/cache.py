@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from chat.models import ChatMembers, ChatRooms
+from .metrics import register_stats
+
+# every worker process listens on this group to drop stale entries
+CACHE_INVALIDATION_GROUP = "realtime_cache_invalidation"
+# channels_redis expires group memberships, so the listener re-joins periodically
+LISTENER_REFRESH_SECONDS = 3600
+
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded per-process LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        # metrics, published by realtime/metrics.py
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return MISSING
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """`ttl` overrides the default lifetime of this entry (never longer than it)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drop every entry whose key matches the predicate"""
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+# room_id -> ChatRooms
+room_cache = TTLCache(maxsize=settings.ROOM_CACHE_MAXSIZE, ttl=settings.ROOM_CACHE_TTL)
+# (room_id, user_id) -> bool
+membership_cache = TTLCache(
+    maxsize=settings.ROOM_CACHE_MAXSIZE, ttl=settings.ROOM_CACHE_TTL
+)
+# user_id -> field values of the user resolved by the websocket JWT middleware
+auth_user_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_MAXSIZE, ttl=settings.AUTH_USER_CACHE_TTL
+)
+register_stats("room_cache", room_cache.stats)
+register_stats("membership_cache", membership_cache.stats)
+register_stats("auth_user_cache", auth_user_cache.stats)
+
+
+@database_sync_to_async
+def _fetch_room(room_id):
+    try:
+        return ChatRooms.objects.get(room_id=room_id)
+    except ChatRooms.DoesNotExist:
+        return None
+
+
+@database_sync_to_async
+def _fetch_membership(room_id, user_id):
+    return ChatMembers.objects.filter(room_id=room_id, user_id=user_id).exists()
+
+
+async def get_cached_room(room_id):
+    room = room_cache.get(str(room_id))
+    if room is MISSING:
+        room = await _fetch_room(room_id)
+        # unknown rooms are not cached, they may be created any time
+        if room is not None:
+            room_cache.set(str(room_id), room)
+    return room
+
+
+async def is_cached_member(room_id, user_id):
+    key = (str(room_id), str(user_id))
+    is_member = membership_cache.get(key)
+    if is_member is MISSING:
+        is_member = await _fetch_membership(room_id, user_id)
+        membership_cache.set(key, is_member)
+    return is_member
+
+
+def drop_room_entries(room_id, user_id=None):
+    """Drop the cached room (and one or all of its memberships) in this process"""
+    room_id = str(room_id)
+    if user_id:
+        membership_cache.delete((room_id, str(user_id)))
+        return
+
+    room_cache.delete(room_id)
+    membership_cache.delete_where(lambda key: key[0] == room_id)
+
+
+def invalidate_auth_user_cache(user_id):
+    """Called when a user changes (suspension, account_status...) so every worker re-fetches it"""
+    auth_user_cache.delete(str(user_id))
+    async_to_sync(get_channel_layer().group_send)(
+        CACHE_INVALIDATION_GROUP,
+        {"type": "cache.invalidate", "cache": "auth_user", "user_id": str(user_id)},
+    )
+
+
+def invalidate_room_cache(room_id, user_id=None):
+    """
+    Called from the (sync) views when a room or one of its memberships changes.
+    Pass user_id to only drop that membership, otherwise the room and all its memberships.
+    """
+    drop_room_entries(room_id, user_id)
+    async_to_sync(get_channel_layer().group_send)(
+        CACHE_INVALIDATION_GROUP,
+        {
+            "type": "cache.invalidate",
+            "room_id": str(room_id),
+            "user_id": str(user_id) if user_id else None,
+        },
+    )
+
+
+_listener_task = None
+
+
+def start_invalidation_listener(channel_layer):
+    """Start (once per process) the task applying invalidations from other workers"""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_for_invalidations(channel_layer))
+
+
+async def _listen_for_invalidations(channel_layer):
+    channel_name = await channel_layer.new_channel()
+    await channel_layer.group_add(CACHE_INVALIDATION_GROUP, channel_name)
+
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                channel_layer.receive(channel_name), timeout=LISTENER_REFRESH_SECONDS
+            )
+        except asyncio.TimeoutError:
+            await channel_layer.group_add(CACHE_INVALIDATION_GROUP, channel_name)
+            continue
+        except Exception as e:
+            print(f"Error receiving cache invalidation: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        if event.get("cache") == "auth_user":
+            auth_user_cache.delete(event["user_id"])
+        else:
+            drop_room_entries(event["room_id"], event.get("user_id"))
@@ -0,0 +1,79 @@
+import asyncio
+
+from django.conf import settings
+
+from .metrics import register_stats
+
+
+class RoomListUpdateCoalescer:
+    """
+    Merges 'room.list.update' events per (user, room) over a short window.
+    Only the newest latest_message and the cumulative unread delta are delivered.
+    """
+
+    def __init__(self, window_ms, max_batch):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending = {}
+        self.flush_task = None
+
+        # metrics, published by realtime/metrics.py
+        self.delivered = 0
+        self.dropped = 0
+
+    async def add(self, channel_layer, user_id, event):
+        if self.window <= 0:
+            await self.deliver(channel_layer, {(user_id, event["room_id"]): event})
+            return
+
+        key = (user_id, event["room_id"])
+        previous = self.pending.get(key)
+        if previous:
+            # the older event is superseded by the new one
+            event["unread_delta"] += previous["unread_delta"]
+            event["has_unread"] = event["has_unread"] or previous["has_unread"]
+            self.dropped += 1
+        self.pending[key] = event
+
+        if len(self.pending) >= self.max_batch:
+            await self.flush(channel_layer)
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later(channel_layer))
+
+    async def flush_later(self, channel_layer):
+        await asyncio.sleep(self.window)
+        self.flush_task = None
+        await self.flush(channel_layer)
+
+    async def flush(self, channel_layer):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+            self.flush_task = None
+
+        pending, self.pending = self.pending, {}
+        if pending:
+            await self.deliver(channel_layer, pending)
+
+    async def deliver(self, channel_layer, events):
+        await asyncio.gather(
+            *[
+                channel_layer.group_send(f"user_{user_id}", event)
+                for (user_id, _room_id), event in events.items()
+            ],
+            return_exceptions=True,
+        )
+        self.delivered += len(events)
+
+    def stats(self):
+        return {
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "pending": len(self.pending),
+        }
+
+
+room_list_update_coalescer = RoomListUpdateCoalescer(
+    window_ms=settings.ROOM_LIST_UPDATE_WINDOW_MS,
+    max_batch=settings.ROOM_LIST_UPDATE_MAX_BATCH,
+)
+register_stats("room_list_updates", room_list_update_coalescer.stats)
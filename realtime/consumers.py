@@ -6,11 +6,22 @@ from django.contrib.auth.models import AnonymousUser
 from datetime import datetime
 from chat.models import ChatMessages, ChatRooms
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 from .chat_handlers import ChatHandlers
 from .event_handlers import EventHandlers
 from .db import DatabaseOperations
+from .cache import start_invalidation_listener
+from .metrics import start_stats_publisher
+from .protocol import InvalidFrame, decode, encode, frame_for, negotiate, pre_encode
+from .presence import (
+    add_connection,
+    get_online_users,
+    remove_connection,
+    start_heartbeat,
+)
+from .typing import TypingTracker
 
 user = get_user_model()
 
@@ -18,6 +29,9 @@ user = get_user_model()
 class GlobalConsumer(AsyncWebsocketConsumer, ChatHandlers, EventHandlers, DatabaseOperations):
 
     async def connect(self):
+        # wire protocol chosen by the client, json by default
+        self.protocol, subprotocol = negotiate(self.scope)
+
         if isinstance(self.scope["user"], AnonymousUser):
             await self.close(code=4001)  # 4001 : unauthorized
             return
@@ -30,24 +44,41 @@ class GlobalConsumer(AsyncWebsocketConsumer, ChatHandlers, EventHandlers, Databa
 
         # Initialize active rooms tracking
         self.active_rooms = {}
+        self.typing = TypingTracker(self.channel_layer, self.user.id)
+        # room_id -> last typing_users list sent to this client
+        self.typing_users_sent = {}
+
+        # keep this worker's room cache in sync with membership changes
+        start_invalidation_listener(self.channel_layer)
+        # counters of this worker, read by `manage.py realtime_stats`
+        start_stats_publisher(self.channel_layer)
+
+        # register this connection, the shared rooms are only notified
+        # when it is the user's first one (other tabs may already be open)
+        if await add_connection(self.channel_layer, self.user.id, self.channel_name):
+            await self.notify_shared_rooms_of_user_status("online")
+        self.presence_heartbeat = start_heartbeat(
+            self.channel_layer, self.user.id, self.channel_name
+        )
 
-        # Set user as globally online
-        await self.set_user_global_online_status(True)
-
-        # Notify all shared rooms that user is online
-        await self.notify_shared_rooms_of_user_status("online")
-
-        await self.accept()
+        await self.accept(subprotocol=subprotocol)
         print(f"websocket connect globla consumer User : {self.user.id}")
 
     async def disconnect(self, close_code):
+        if hasattr(self, "typing"):
+            await self.typing.stop_all()
+
+        if hasattr(self, "presence_heartbeat"):
+            self.presence_heartbeat.cancel()
+
+            # offline once the user's last connection closes
+            if await remove_connection(
+                self.channel_layer, self.user.id, self.channel_name
+            ):
+                await self.notify_shared_rooms_of_user_status("offline")
+
         # Leave room group
         if not isinstance(self.scope["user"], AnonymousUser):
-            # Set user as globally offline
-            await self.set_user_global_online_status(False)
-
-            # Notify all shared rooms that user is offline
-            await self.notify_shared_rooms_of_user_status("offline")
             # if authorized
             await self.channel_layer.group_discard(
                 self.user_group_name, self.channel_name
@@ -62,16 +93,14 @@ class GlobalConsumer(AsyncWebsocketConsumer, ChatHandlers, EventHandlers, Databa
                 )
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         if isinstance(self.scope["user"], AnonymousUser):
-            await self.send(
-                text_data=json.dumps({"error": "Unauthorized to send messages."})
-            )
+            await self.send_event({"error": "Unauthorized to send messages."})
             await self.close(code=4001)
             return
 
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = decode(self.protocol, text_data, bytes_data)
             message_type = text_data_json.get("type")
 
             if message_type == "join_room":
@@ -82,62 +111,62 @@ class GlobalConsumer(AsyncWebsocketConsumer, ChatHandlers, EventHandlers, Databa
                 await self.handle_send_message(text_data_json)
             elif message_type == "typing":
                 await self.handle_typing_indicator(text_data_json)
+            elif message_type == "presence_query":
+                await self.handle_presence_query(text_data_json)
             else:
-                await self.send(
-                    text_data=json.dumps(
-                        {"error": f"Unknown message type: {message_type}"}
-                    )
+                await self.send_event(
+                    {"error": f"Unknown message type: {message_type}"}
                 )
 
         except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({"error": "Invalid JSON  format"}))
+            await self.send_event({"error": "Invalid JSON  format"})
+        except InvalidFrame as e:
+            await self.send_event({"error": str(e)})
         except Exception as e:
-            await self.send(text_data=json.dumps({"error": f"Server error: {str(e)}"}))
-
-    # --- HELPER METHODS FOR REDIS PRESENCE TRACKING  ---
-
-    def get_presence_key(self, room_id):
-        """Generates the Redis key for a room's presence set."""
-        return f"room:{room_id}:presence"
-
-    async def add_user_to_redis_presence(self, room_id, user_id):
-        """Adds a user's ID to the Redis Set for room presence."""
-        await self.channel_layer.connection(0).sadd(
-            self.get_presence_key(room_id), user_id
-        )
-
-    async def remove_user_from_redis_presence(self, room_id, user_id):
-        """Removes a user's ID from the Redis Set for room presence."""
-        await self.channel_layer.connection(0).srem(
-            self.get_presence_key(room_id), user_id
-        )
-
-    async def get_users_from_redis_presence(self, room_id):
-        """Retrieves all user IDs from the Redis Set for room presence."""
-        user_ids_bytes = await self.channel_layer.connection(0).smembers(
-            self.get_presence_key(room_id)
-        )
-        return [uid.decode("utf-8") for uid in user_ids_bytes]
+            await self.send_event({"error": f"Server error: {str(e)}"})
+
+    async def send_event(self, payload, frames=None, patch=None):
+        """
+        Send an event to the client in its protocol. `frames` are pre-encoded by
+        the sender (protocol.pre_encode), completed with this recipient's `patch`.
+        Without a frame in the client's protocol the full `payload` is encoded,
+        or for slim events (payload None) the JSON frame is decoded.
+        """
+        if frames and (self.protocol in frames or payload is None):
+            frame = frame_for(self.protocol, frames, patch)
+        else:
+            frame = encode(self.protocol, payload)
+
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def handle_presence_query(self, data):
+        """Which of the given users are online, answered with one Redis round trip"""
+        user_ids = data.get("user_ids")
+        if not isinstance(user_ids, list):
+            await self.send_event({"error": "user_ids is required"})
+            return
 
-    async def set_user_global_online_status(self, is_online):
-        """Set user's global online status in Redis"""
-        status = "online" if is_online else "offline"
-        await self.channel_layer.connection(0).hset(
-            "global_user_status", str(self.user.id), status
+        online = await get_online_users(
+            self.channel_layer, user_ids[: settings.PRESENCE_QUERY_MAX_USERS]
         )
+        await self.send_event({"type": "presence", "online": sorted(online)})
 
     async def notify_shared_rooms_of_user_status(self, status):
         """Notify all rooms this user is a member of about their status"""
         # Get all rooms this user is a member of
         user_rooms = await self.get_user_all_rooms()
+        # the same event for every room, encoded once
+        event = pre_encode(
+            {
+                "type": "user.status.changed",
+                "user_id": str(self.user.id),
+                "full_name": self.user.full_name,
+                "status": status,  # "online" or "offline"
+            }
+        )
         for room_id in user_rooms:
             room_group_name = f"chat_{room_id}"
-            await self.channel_layer.group_send(
-                room_group_name,
-                {
-                    "type": "user.status.changed",
-                    "user_id": str(self.user.id),
-                    "full_name": self.user.full_name,
-                    "status": status,  # "online" or "offline"
-                },
-            )
\ No newline at end of file
+            await self.channel_layer.group_send(room_group_name, event)
\ No newline at end of file
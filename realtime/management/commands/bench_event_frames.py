@@ -0,0 +1,127 @@
+import time
+import uuid
+
+import msgpack
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from realtime.protocol import PROTOCOLS, encode, frame_for, pre_encode
+
+
+def sample_message():
+    now = timezone.now().isoformat()
+    return {
+        "message_id": str(uuid.uuid4()),
+        "content": "Bonjour, le bilan de fin d'année est prêt à être signé. " * 2,
+        "sender": {"id": str(uuid.uuid4()), "full_name": "Amina Benali"},
+        "sent_at": now,
+        "edited_at": None,
+        "is_deleted": False,
+        "is_edited": False,
+        "message_type": "text",
+        "file": None,
+        "room_id": str(uuid.uuid4()),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cost of a room list update delivered to every member of a room "
+        "(one group_send per user, as the coalescer sends them) when each consumer "
+        "encodes the event and when the sender pre-encodes it once"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fanout",
+            type=int,
+            nargs="+",
+            default=[1, 10, 50, 100, 300, 1000],
+            help="Numbers of room members",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="Messages sent per fan-out size",
+        )
+        parser.add_argument(
+            "--protocol",
+            choices=PROTOCOLS,
+            default="json",
+            help="Protocol of the receiving clients",
+        )
+
+    def handle(self, *args, **options):
+        protocol = options["protocol"]
+        message = sample_message()
+        room = {
+            "type": "room.list.update",
+            "room_id": message["room_id"],
+            "room_name": "Cabinet Benali",
+            "is_dm": False,
+            "latest_message": message,
+        }
+
+        def unread(user_index):
+            return {"has_unread": user_index > 0, "unread_delta": int(user_index > 0)}
+
+        # every recipient gets its own group_send: the channel layer packs the
+        # event for Redis and the recipient's consumer unpacks it
+        def per_consumer(fanout):
+            sent = 0
+            for user_index in range(fanout):
+                packed = msgpack.packb({**room, **unread(user_index)})
+                sent += len(packed)
+                event = msgpack.unpackb(packed)
+                encode(
+                    protocol,
+                    {
+                        "type": "room_list_update",
+                        "room_id": event["room_id"],
+                        "room_name": event["room_name"],
+                        "is_dm": event["is_dm"],
+                        "has_unread": event["has_unread"],
+                        "unread_delta": event["unread_delta"],
+                        "latest_message": event["latest_message"],
+                    },
+                )
+            return sent
+
+        def pre_encoded(fanout):
+            sent = 0
+            shared = pre_encode(room, keep=("room_id",))
+            for user_index in range(fanout):
+                packed = msgpack.packb({**shared, **unread(user_index)})
+                sent += len(packed)
+                event = msgpack.unpackb(packed)
+                frame_for(
+                    protocol,
+                    event["frames"],
+                    {
+                        "has_unread": event["has_unread"],
+                        "unread_delta": event["unread_delta"],
+                    },
+                )
+            return sent
+
+        self.stdout.write(
+            f"{'fan-out':>8} {'per consumer':>14} {'pre-encoded':>14} {'speedup':>8} "
+            f"{'bytes/event':>12} {'pre-encoded':>12}"
+        )
+        for fanout in options["fanout"]:
+            timings = []
+            sizes = []
+            for send in (per_consumer, pre_encoded):
+                started = time.process_time()
+                for _ in range(options["repeat"]):
+                    sent = send(fanout)
+                timings.append((time.process_time() - started) / options["repeat"])
+                sizes.append(sent // fanout)
+
+            baseline, optimized = timings
+            self.stdout.write(
+                f"{fanout:>8} {baseline * 1000:>11.3f} ms {optimized * 1000:>11.3f} ms "
+                f"{baseline / optimized if optimized else 0:>7.1f}x "
+                f"{sizes[0]:>12} {sizes[1]:>12}"
+            )
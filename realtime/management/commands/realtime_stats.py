@@ -0,0 +1,48 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from realtime.metrics import read_stats, total_stats
+
+
+def format_counters(counters):
+    line = ", ".join(f"{value} {counter}" for counter, value in counters.items())
+    if "hits" in counters:
+        total = counters["hits"] + counters["misses"]
+        rate = counters["hits"] / total if total else 0.0
+        line += f" ({rate:.1%} hit rate)"
+    elif "dropped" in counters:
+        total = counters["delivered"] + counters["dropped"]
+        rate = counters["dropped"] / total if total else 0.0
+        line += f" ({rate:.1%} coalesced)"
+    return line
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the counters published by the websocket workers (room list "
+        "coalescer, per-process caches), per worker and in total"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            action="store_true",
+            help="Also show the counters of every worker",
+        )
+
+    def handle(self, *args, **options):
+        workers = async_to_sync(read_stats)(get_channel_layer())
+        if not workers:
+            self.stdout.write("No websocket worker published its counters")
+            return
+
+        if options["workers"]:
+            for worker, snapshot in sorted(workers.items()):
+                self.stdout.write(worker)
+                for name, counters in snapshot["sources"].items():
+                    self.stdout.write(f"  {name}: {format_counters(counters)}")
+
+        self.stdout.write(f"total of {len(workers)} workers")
+        for name, counters in total_stats(workers).items():
+            self.stdout.write(f"  {name}: {format_counters(counters)}")
@@ -0,0 +1,87 @@
+"""
+Runtime counters of the websocket workers.
+
+The counters (room list coalescer, per-process caches) live in the memory of
+each worker process. Every worker publishes a snapshot of them to the channel
+layer's Redis, `manage.py realtime_stats` adds the workers up:
+
+    realtime:stats    hash "<host>:<pid>" -> JSON snapshot of that worker
+
+Snapshots of workers that stopped publishing expire after
+REALTIME_STATS_MAX_AGE seconds.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+
+from django.conf import settings
+
+STATS_KEY = "realtime:stats"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# name -> callable returning a dict of counters
+SOURCES = {}
+
+
+def register_stats(name, stats):
+    SOURCES[name] = stats
+
+
+def collect_stats():
+    snapshot = {name: stats() for name, stats in SOURCES.items()}
+    return {"published_at": time.time(), "sources": snapshot}
+
+
+async def publish_stats(channel_layer):
+    redis = channel_layer.connection(0)
+    await redis.hset(STATS_KEY, WORKER_ID, json.dumps(collect_stats()))
+
+
+_publisher_task = None
+
+
+def start_stats_publisher(channel_layer):
+    """Start (once per process) the task publishing this worker's counters"""
+    global _publisher_task
+    if _publisher_task is None or _publisher_task.done():
+        _publisher_task = asyncio.create_task(_publish_periodically(channel_layer))
+
+
+async def _publish_periodically(channel_layer):
+    while True:
+        try:
+            await publish_stats(channel_layer)
+        except Exception as e:
+            print(f"Error publishing realtime stats: {e}")
+        await asyncio.sleep(settings.REALTIME_STATS_INTERVAL)
+
+
+async def read_stats(channel_layer):
+    """{worker: snapshot} of the live workers, the stale snapshots are dropped"""
+    redis = channel_layer.connection(0)
+    now = time.time()
+    workers = {}
+    stale = []
+    for worker, snapshot in (await redis.hgetall(STATS_KEY)).items():
+        worker = worker.decode() if isinstance(worker, bytes) else worker
+        snapshot = json.loads(snapshot)
+        if now - snapshot["published_at"] > settings.REALTIME_STATS_MAX_AGE:
+            stale.append(worker)
+        else:
+            workers[worker] = snapshot
+    if stale:
+        await redis.hdel(STATS_KEY, *stale)
+    return workers
+
+
+def total_stats(workers):
+    """Counters of every source added up over the workers"""
+    totals = {}
+    for snapshot in workers.values():
+        for name, counters in snapshot["sources"].items():
+            source = totals.setdefault(name, {})
+            for counter, value in counters.items():
+                source[counter] = source.get(counter, 0) + value
+    return totals
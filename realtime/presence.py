@@ -0,0 +1,216 @@
+"""
+Presence registry kept in the channel layer's Redis.
+
+Every websocket connection is an entry scored by its expiry time and kept
+alive by a heartbeat, so the connections of a crashed worker simply expire:
+
+    presence:user:<user_id>   zset of the user's connections (channel names)
+    presence:room:<room_id>   zset of "<user_id>:<channel name>" in a room chat
+    presence:names            hash user_id -> full_name, kept up to date by the
+                              User post_save signal (accounts/signals.py)
+
+A user is online while one of its entries has not expired, the online /
+offline (and room join / leave) events are only sent on the first and last
+connection.
+"""
+import asyncio
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+NAMES_KEY = "presence:names"
+
+# prunes the expired entries of a room, optionally adds a connection, and returns
+# the live members with the display names of their users: a join is one round trip
+# KEYS: room zset, names hash
+# ARGV: now [, member, expires_at, key_ttl, user_id, full_name]
+ROOM_PRESENCE_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1])
+if ARGV[2] then
+    redis.call("ZADD", KEYS[1], ARGV[3], ARGV[2])
+    redis.call("EXPIRE", KEYS[1], ARGV[4])
+    redis.call("HSET", KEYS[2], ARGV[5], ARGV[6])
+end
+local members = redis.call("ZRANGE", KEYS[1], 0, -1)
+local user_ids, seen = {}, {}
+for _, member in ipairs(members) do
+    local user_id = string.match(member, "^([^:]+):")
+    if user_id and not seen[user_id] then
+        seen[user_id] = true
+        table.insert(user_ids, user_id)
+    end
+end
+if #user_ids == 0 then
+    return {members, user_ids, {}}
+end
+return {members, user_ids, redis.call("HMGET", KEYS[2], unpack(user_ids))}
+"""
+
+
+def user_key(user_id):
+    return f"presence:user:{user_id}"
+
+
+def room_key(room_id):
+    return f"presence:room:{room_id}"
+
+
+def _redis(channel_layer):
+    return channel_layer.connection(0)
+
+
+def _key_ttl():
+    # the keys outlive their entries, abandoned keys are dropped by Redis
+    return settings.PRESENCE_TTL_SECONDS * 2
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _room_user_ids(members):
+    return {_decode(member).split(":", 1)[0] for member in members}
+
+
+async def add_connection(channel_layer, user_id, connection):
+    """Register a connection of the user, returns True when the user came online"""
+    key = user_key(user_id)
+    now = time.time()
+    pipe = _redis(channel_layer).pipeline(transaction=True)
+    pipe.zremrangebyscore(key, "-inf", now)
+    pipe.zadd(key, {connection: now + settings.PRESENCE_TTL_SECONDS})
+    pipe.expire(key, _key_ttl())
+    pipe.zcard(key)
+    *_, connections = await pipe.execute()
+    return connections == 1
+
+
+async def remove_connection(channel_layer, user_id, connection):
+    """Drop a connection of the user, returns True when the user went offline"""
+    key = user_key(user_id)
+    pipe = _redis(channel_layer).pipeline(transaction=True)
+    pipe.zrem(key, connection)
+    pipe.zremrangebyscore(key, "-inf", time.time())
+    pipe.zcard(key)
+    *_, connections = await pipe.execute()
+    return connections == 0
+
+
+async def join_room(channel_layer, room_id, user_id, full_name, connection):
+    """
+    Register a connection in a room chat, returns (first connection of the user,
+    users connected to the room as [{"id", "full_name"}]).
+    """
+    user_id = str(user_id)
+    now = time.time()
+    members, users = await _room_presence(
+        channel_layer,
+        room_id,
+        now,
+        f"{user_id}:{connection}",
+        now + settings.PRESENCE_TTL_SECONDS,
+        _key_ttl(),
+        user_id,
+        full_name,
+    )
+    first_connection = (
+        sum(1 for m in members if _decode(m).startswith(f"{user_id}:")) == 1
+    )
+    return first_connection, users
+
+
+async def leave_room(channel_layer, room_id, user_id, connection):
+    """Drop a connection from a room chat, returns True if it was the user's last one"""
+    user_id = str(user_id)
+    key = room_key(room_id)
+    pipe = _redis(channel_layer).pipeline(transaction=True)
+    pipe.zrem(key, f"{user_id}:{connection}")
+    pipe.zremrangebyscore(key, "-inf", time.time())
+    pipe.zrange(key, 0, -1)
+    *_, members = await pipe.execute()
+    return user_id not in _room_user_ids(members)
+
+
+async def refresh(channel_layer, user_id, connection, room_id=None):
+    """Push back the expiry of a connection (and of its room entry)"""
+    expires_at = time.time() + settings.PRESENCE_TTL_SECONDS
+    pipe = _redis(channel_layer).pipeline(transaction=False)
+    if room_id is None:
+        pipe.zadd(user_key(user_id), {connection: expires_at})
+        pipe.expire(user_key(user_id), _key_ttl())
+    else:
+        pipe.zadd(room_key(room_id), {f"{user_id}:{connection}": expires_at})
+        pipe.expire(room_key(room_id), _key_ttl())
+    await pipe.execute()
+
+
+async def _heartbeat(channel_layer, user_id, connection, room_id):
+    while True:
+        await asyncio.sleep(settings.PRESENCE_HEARTBEAT_SECONDS)
+        try:
+            await refresh(channel_layer, user_id, connection, room_id)
+        except Exception as e:
+            print(f"Error refreshing presence of {user_id}: {e}")
+
+
+def start_heartbeat(channel_layer, user_id, connection, room_id=None):
+    """Task refreshing the connection until cancelled by the consumer's disconnect"""
+    return asyncio.create_task(_heartbeat(channel_layer, user_id, connection, room_id))
+
+
+async def get_online_users(channel_layer, user_ids):
+    """Batch query: the subset of `user_ids` having a live connection"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return set()
+
+    pipe = _redis(channel_layer).pipeline(transaction=False)
+    now = time.time()
+    for user_id in user_ids:
+        pipe.zcount(user_key(user_id), now, "+inf")
+    counts = await pipe.execute()
+    return {user_id for user_id, count in zip(user_ids, counts) if count}
+
+
+async def get_room_users(channel_layer, room_id):
+    """Users connected to a room chat as [{"id", "full_name"}], in one round trip"""
+    _members, users = await _room_presence(channel_layer, room_id, time.time())
+    return users
+
+
+async def _room_presence(channel_layer, room_id, *args):
+    redis = _redis(channel_layer)
+    # sent with EVALSHA, the script body only goes over the wire once per server
+    script = redis.register_script(ROOM_PRESENCE_SCRIPT)
+    members, user_ids, names = await script(
+        keys=[room_key(room_id), NAMES_KEY], args=args
+    )
+
+    names = dict(zip(map(_decode, user_ids), names))
+    missing = [user_id for user_id, name in names.items() if name is None]
+    if missing:
+        # only when the hash lost entries (e.g. a Redis restart)
+        found = await _fetch_display_names(missing)
+        if found:
+            await redis.hset(NAMES_KEY, mapping=found)
+        names.update(found)
+
+    return members, [
+        {"id": user_id, "full_name": _decode(names[user_id] or "")}
+        for user_id in sorted(names)
+    ]
+
+
+@database_sync_to_async
+def _fetch_display_names(user_ids):
+    users = get_user_model().objects.filter(id__in=user_ids).values_list(
+        "id", "full_name"
+    )
+    return {str(user_id): full_name for user_id, full_name in users}
+
+
+async def set_display_name(channel_layer, user_id, full_name):
+    """Called when a user changes so the room lists show the new name"""
+    await _redis(channel_layer).hset(NAMES_KEY, str(user_id), full_name)
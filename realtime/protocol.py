@@ -0,0 +1,225 @@
+"""
+Wire protocols of the global websocket.
+
+    json      default, the events as documented
+    compact   JSON with short keys and epoch-millisecond timestamps
+    msgpack   the compact form as MessagePack binary frames
+
+The client picks one with the websocket subprotocol (Sec-WebSocket-Protocol)
+or the ?protocol= query param.
+
+Channel layer events carry their JSON frame pre-encoded by the sender
+(pre_encode) so the consumers of a group forward it instead of each encoding
+the event again. Values that differ per recipient (e.g. has_unread) are left
+out of the frame and spliced in by the receiving consumer (splice). Only the
+default protocol is pre-encoded, every frame travels through Redis once per
+group_send: the opt-in compact / msgpack clients are encoded by their consumer
+(frame_for).
+"""
+import json
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import msgpack
+
+PROTOCOLS = ("json", "compact", "msgpack")
+DEFAULT_PROTOCOL = "json"
+
+COMPACT_KEYS = {
+    "type": "t",
+    "message": "m",
+    "message_id": "mid",
+    "content": "c",
+    "sender": "s",
+    "full_name": "n",
+    "sent_at": "ts",
+    "edited_at": "ea",
+    "is_deleted": "del",
+    "is_edited": "ed",
+    "message_type": "mt",
+    "file": "f",
+    "room_id": "r",
+    "room_name": "rn",
+    "is_dm": "dm",
+    "has_unread": "hu",
+    "unread_delta": "ud",
+    "latest_message": "lm",
+    "user_id": "u",
+    "user_ids": "us",
+    "status": "st",
+    "new_content": "nc",
+    "sender_id": "sid",
+    "sender_full_name": "sn",
+    "added_by": "ab",
+    "added_by_name": "abn",
+    "removed_by": "rb",
+    "removed_by_name": "rbn",
+    "notification_id": "nid",
+    "notification_type": "nt",
+    "title": "ti",
+    "related_object_id": "ro",
+    "created_at": "ca",
+    "is_read": "rd",
+    "collapsed_count": "cc",
+    "last_activity_at": "la",
+    "users": "ul",
+    "online": "on",
+    "error": "e",
+}
+FULL_KEYS = {short: key for key, short in COMPACT_KEYS.items()}
+
+# ISO 8601 strings sent as epoch milliseconds in the compact forms
+TIMESTAMP_KEYS = {"sent_at", "edited_at", "created_at", "last_activity_at"}
+
+# json.dumps builds a new encoder per call when given options
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class InvalidFrame(ValueError):
+    pass
+
+
+def _epoch_ms(value):
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return value
+
+
+def compact(value):
+    """Short keys and numeric timestamps, recursively"""
+    if isinstance(value, dict):
+        return {
+            COMPACT_KEYS.get(key, key): (
+                _epoch_ms(item) if key in TIMESTAMP_KEYS else compact(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def expand(value):
+    """Client messages may use the short keys too"""
+    if isinstance(value, dict):
+        return {FULL_KEYS.get(key, key): expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item) for item in value]
+    return value
+
+
+def encode(protocol, payload):
+    """The frame of an event: str for the JSON protocols, bytes for msgpack"""
+    if protocol == "compact":
+        return COMPACT_ENCODER.encode(compact(payload))
+    if protocol == "msgpack":
+        return msgpack.packb(compact(payload))
+    return JSON_ENCODER.encode(payload)
+
+
+def encode_frames(payload, protocols=PROTOCOLS):
+    """The event in these protocols, to pass along a group_send"""
+    return {protocol: encode(protocol, payload) for protocol in protocols}
+
+
+def pre_encode(event, patch_keys=(), keep=None, protocols=(DEFAULT_PROTOCOL,)):
+    """
+    Adds the frames of a channel layer event, the client event being the same
+    fields with the handler name as type. `patch_keys` are not encoded, each
+    recipient splices its own values. With `keep`, the event only carries these
+    fields besides the frames and patch keys (less for every consumer to unpack).
+    `protocols` must include the default one, the others can be encoded from it.
+    """
+    payload = {key: value for key, value in event.items() if key not in patch_keys}
+    payload["type"] = event["type"].replace(".", "_")
+    frames = encode_frames(payload, protocols)
+    if keep is not None:
+        event = {
+            key: event[key] for key in ("type", *keep, *patch_keys) if key in event
+        }
+    return {**event, "frames": frames}
+
+
+def _map_header(size):
+    if size < 16:
+        return bytes([0x80 | size])
+    if size < 2**16:
+        return b"\xde" + size.to_bytes(2, "big")
+    return b"\xdf" + size.to_bytes(4, "big")
+
+
+def _map_size(frame):
+    """(entries, header length) of a MessagePack map"""
+    if 0x80 <= frame[0] <= 0x8F:
+        return frame[0] & 0x0F, 1
+    if frame[0] == 0xDE:
+        return int.from_bytes(frame[1:3], "big"), 3
+    if frame[0] == 0xDF:
+        return int.from_bytes(frame[1:5], "big"), 5
+    raise InvalidFrame("Not a MessagePack map")
+
+
+def splice(protocol, frame, patch):
+    """Adds the `patch` fields to a pre-encoded frame without decoding it"""
+    if not patch:
+        return frame
+
+    encoded = encode(protocol, patch)
+    if protocol == "msgpack":
+        size, header = _map_size(frame)
+        patch_size, patch_header = _map_size(encoded)
+        return _map_header(size + patch_size) + frame[header:] + encoded[patch_header:]
+
+    # both are JSON objects: drop the closing brace of the frame and the
+    # opening one of the patch
+    separator = "," if protocol == "compact" else ", "
+    return frame[:-1] + separator + encoded[1:]
+
+
+def frame_for(protocol, frames, patch=None):
+    """
+    The frame of a pre-encoded event in `protocol`: the sender's frame with the
+    `patch` spliced in, else encoded again from the default (JSON) frame.
+    """
+    frame = frames.get(protocol)
+    if frame is not None:
+        return splice(protocol, frame, patch)
+
+    payload = json.loads(frames[DEFAULT_PROTOCOL])
+    if patch:
+        payload.update(patch)
+    return encode(protocol, payload)
+
+
+def decode(protocol, text_data=None, bytes_data=None):
+    """A client message; text frames are JSON and binary frames MessagePack"""
+    if bytes_data is not None:
+        try:
+            data = msgpack.unpackb(bytes_data)
+        except Exception:
+            raise InvalidFrame("Invalid MessagePack frame")
+    else:
+        # json.JSONDecodeError is left to the caller
+        data = json.loads(text_data)
+
+    if protocol != DEFAULT_PROTOCOL:
+        data = expand(data)
+    return data
+
+
+def negotiate(scope):
+    """
+    Returns (protocol, subprotocol to accept): the first supported subprotocol
+    offered by the client, else the ?protocol= query param, else json.
+    """
+    for subprotocol in scope.get("subprotocols") or []:
+        if subprotocol in PROTOCOLS:
+            return subprotocol, subprotocol
+
+    query_params = parse_qs(scope.get("query_string", b"").decode())
+    protocol = query_params.get("protocol", [DEFAULT_PROTOCOL])[0]
+    if protocol not in PROTOCOLS:
+        protocol = DEFAULT_PROTOCOL
+    return protocol, None
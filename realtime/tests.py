@@ -1,3 +1,46 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from channels.layers import channel_layers
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from accounts.models import User
+from my_accountant_project.auth_middleware import get_user_from_token
+from .cache import auth_user_cache
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class WebsocketAuthCacheTests(TestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        auth_user_cache.clear()
+        self.addCleanup(auth_user_cache.clear)
+        self.user = User.objects.create(
+            email="client@example.com", full_name="Client", user_type="client"
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self):
+        return async_to_sync(get_user_from_token)(self.token)
+
+    def test_each_connection_gets_its_own_user(self):
+        first = self.authenticate()
+        with self.assertNumQueries(0):
+            second = self.authenticate()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.pk, self.user.pk)
+        self.assertEqual(second.full_name, "Client")
+
+    def test_a_suspended_user_is_rejected(self):
+        self.authenticate()
+        self.user.account_status = "suspended"
+        self.user.save()
+        self.assertIsInstance(self.authenticate(), AnonymousUser)
+
+    def test_a_deleted_user_is_rejected(self):
+        self.authenticate()
+        self.user.delete()
+        self.assertIsInstance(self.authenticate(), AnonymousUser)
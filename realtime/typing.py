@@ -0,0 +1,173 @@
+"""
+Typing indicators with server-side state.
+
+The users typing in a room are a Redis zset (typing:room:<room_id>) scored
+by expiry time: a user stops typing with an is_typing=false frame or when
+no frame refreshed it for TYPING_TIMEOUT_SECONDS. Only the start and stop
+edges reach the channel layer, as one aggregated "typing.users" event per
+room sent at most every TYPING_BROADCAST_INTERVAL_MS (across all workers).
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+from .protocol import pre_encode
+
+
+def typing_key(room_id):
+    return f"typing:room:{room_id}"
+
+
+def typing_lock_key(room_id):
+    return f"typing:room:{room_id}:sent"
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+async def start_typing(channel_layer, room_id, user_id):
+    """Mark the user as typing, returns True on the start edge"""
+    key = typing_key(room_id)
+    now = time.time()
+    pipe = channel_layer.connection(0).pipeline(transaction=True)
+    pipe.zremrangebyscore(key, "-inf", now)
+    pipe.zadd(key, {str(user_id): now + settings.TYPING_TIMEOUT_SECONDS})
+    pipe.expire(key, settings.TYPING_TIMEOUT_SECONDS * 2)
+    _, added, _ = await pipe.execute()
+    return added == 1
+
+
+async def stop_typing(channel_layer, room_id, user_id):
+    """Returns True on the stop edge (the user was typing)"""
+    removed = await channel_layer.connection(0).zrem(typing_key(room_id), str(user_id))
+    return removed == 1
+
+
+class TypingTracker:
+    """
+    Typing state of one websocket connection: repeated is_typing=true frames
+    within TYPING_REFRESH_SECONDS are dropped without touching Redis.
+    """
+
+    def __init__(self, channel_layer, user_id):
+        self.channel_layer = channel_layer
+        self.user_id = user_id
+        # room_id -> time of the last refresh
+        self.rooms = {}
+
+    async def update(self, room_id, is_typing):
+        room_id = str(room_id)
+        if is_typing:
+            refreshed_at = self.rooms.get(room_id)
+            now = time.monotonic()
+            if refreshed_at and now - refreshed_at < settings.TYPING_REFRESH_SECONDS:
+                return
+            self.rooms[room_id] = now
+            edge = await start_typing(self.channel_layer, room_id, self.user_id)
+        else:
+            if self.rooms.pop(room_id, None) is None:
+                return
+            edge = await stop_typing(self.channel_layer, room_id, self.user_id)
+
+        if edge:
+            typing_broadcaster.schedule(self.channel_layer, room_id)
+
+    async def stop_all(self):
+        """On leave / disconnect"""
+        for room_id in list(self.rooms):
+            await self.update(room_id, False)
+
+
+class TypingBroadcaster:
+    """
+    Sends the aggregated "typing.users" event of a room after an edge, at most
+    once per interval per room (a Redis lock shared by the workers), and again
+    when a typing user times out.
+    """
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        # room_id -> (flush task, due time)
+        self.tasks = {}
+        # room_id -> user ids of the last event sent by this process
+        self.last_sent = {}
+
+        # metrics
+        self.sent = 0
+        self.deferred = 0
+
+    def schedule(self, channel_layer, room_id, delay=0.0, only_if_changed=False):
+        due = time.monotonic() + delay
+        scheduled = self.tasks.get(room_id)
+        if scheduled is not None:
+            if scheduled[1] <= due:
+                # an earlier flush will read the latest state
+                return
+            scheduled[0].cancel()
+
+        task = asyncio.create_task(
+            self.flush_later(channel_layer, room_id, delay, only_if_changed)
+        )
+        self.tasks[room_id] = (task, due)
+
+    async def flush_later(self, channel_layer, room_id, delay, only_if_changed):
+        await asyncio.sleep(delay)
+        # not cancellable from here on, a new edge schedules another flush
+        del self.tasks[room_id]
+        try:
+            await self.flush(channel_layer, room_id, only_if_changed)
+        except Exception as e:
+            print(f"Error sending typing users of room {room_id}: {e}")
+
+    async def flush(self, channel_layer, room_id, only_if_changed=False):
+        redis = channel_layer.connection(0)
+        key = typing_key(room_id)
+        now = time.time()
+        pipe = redis.pipeline(transaction=True)
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zrange(key, 0, -1, withscores=True)
+        _, typing = await pipe.execute()
+        user_ids = sorted(_decode(user_id) for user_id, _expires_at in typing)
+
+        if not only_if_changed or user_ids != self.last_sent.get(room_id, []):
+            lock_key = typing_lock_key(room_id)
+            if not await redis.set(lock_key, 1, nx=True, px=int(self.interval * 1000)):
+                # another event of this room was sent less than an interval ago
+                self.deferred += 1
+                lock_ttl = await redis.pttl(lock_key)
+                self.schedule(channel_layer, room_id, max(lock_ttl, 1) / 1000)
+                return
+
+            # each recipient removes itself from user_ids
+            await channel_layer.group_send(
+                f"chat_{room_id}",
+                pre_encode(
+                    {"type": "typing.users", "room_id": room_id, "user_ids": user_ids},
+                    patch_keys=("user_ids",),
+                ),
+            )
+            self.last_sent[room_id] = user_ids
+            self.sent += 1
+
+        if not user_ids:
+            self.last_sent.pop(room_id, None)
+            return
+
+        # announce the users whose typing times out
+        next_expiry = min(expires_at for _user_id, expires_at in typing)
+        self.schedule(
+            channel_layer,
+            room_id,
+            max(next_expiry - now, self.interval),
+            only_if_changed=True,
+        )
+
+    def stats(self):
+        return {"sent": self.sent, "deferred": self.deferred, "rooms": len(self.tasks)}
+
+
+typing_broadcaster = TypingBroadcaster(
+    interval_ms=settings.TYPING_BROADCAST_INTERVAL_MS
+)
@@ -0,0 +1,113 @@
+# runs a retention policy: the matching rows are walked by primary key
+# (keyset, no OFFSET) and deleted in bounded batches, each in its own short
+# transaction, after being appended to a gzip JSONL archive when asked.
+import gzip
+import json
+import os
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+def row_bytes(model, pks, rows):
+    """Size of the rows: pg_column_size on PostgreSQL, their JSON elsewhere"""
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(model._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {table} t "
+                f"WHERE t.{column} = ANY(%s)",
+                [pks],
+            )
+            return int(cursor.fetchone()[0])
+    return sum(len(json.dumps(row, cls=DjangoJSONEncoder).encode()) for row in rows)
+
+
+def open_archive(policy, archive_dir):
+    """Path and gzip JSONL file of the archive of a run"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(
+        archive_dir, f"{policy.name}-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+    )
+    return path, gzip.open(path, "wt", encoding="utf-8")
+
+
+def apply_policy(policy, batch_size=1000, archive_dir=None, dry_run=False, sleep=0):
+    """
+    Returns the report of the run: {"policy", "rows", "bytes", "archive",
+    "archive_bytes"}, "archive" stays None when no row was archived. With
+    dry_run the rows are only counted.
+    """
+    queryset = policy.queryset()
+    model = queryset.model
+    report = {
+        "policy": policy.name,
+        "rows": 0,
+        "bytes": 0,
+        "archive": None,
+        "archive_bytes": 0,
+    }
+    if dry_run:
+        report["rows"] = queryset.count()
+        return report
+
+    pk_name = model._meta.pk.attname
+    fields = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.name not in policy.exclude
+    ]
+
+    archive = None
+    last_pk = None
+    try:
+        while True:
+            batch = queryset.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.values(*fields)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][pk_name]
+            pks = [row[pk_name] for row in rows]
+
+            if archive_dir and policy.archive:
+                if archive is None:
+                    # opened with the first batch: a run matching no rows
+                    # leaves no empty archive behind
+                    report["archive"], archive = open_archive(policy, archive_dir)
+                # written before the delete: a failed batch may be archived twice
+                for row in rows:
+                    archive.write(
+                        json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+                        + "\n"
+                    )
+            size = row_bytes(model, pks, rows)
+
+            with transaction.atomic():
+                # the policy filter is applied again: rows changed since they
+                # were read (e.g. marked unread) are kept
+                _total, deleted = queryset.filter(pk__in=pks).delete()
+            report["rows"] += deleted.get(model._meta.label, 0)
+            report["bytes"] += size
+
+            if policy.after_delete is not None:
+                policy.after_delete(rows)
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        if archive is not None:
+            archive.close()
+            report["archive_bytes"] = os.path.getsize(report["archive"])
+
+    return report
+
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from retention.engine import apply_policy, format_bytes
+from retention.policies import POLICIES, POLICIES_BY_NAME
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete (and optionally archive) old notifications, soft deleted chat "
+        "messages, OTPs, sent emails and expired JWTs in bounded batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy",
+            nargs="+",
+            choices=list(POLICIES_BY_NAME),
+            help="Policies to apply (all by default)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RETENTION_BATCH_SIZE,
+            help="Rows deleted per transaction",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between two batches",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            help="Export the archivable rows to <dir>/<policy>-<time>.jsonl.gz first",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["policy"]:
+            policies = [POLICIES_BY_NAME[name] for name in options["policy"]]
+        else:
+            policies = POLICIES
+
+        total_rows = total_bytes = 0
+        for policy in policies:
+            report = apply_policy(
+                policy,
+                batch_size=options["batch_size"],
+                archive_dir=options["archive_dir"],
+                dry_run=options["dry_run"],
+                sleep=options["sleep"],
+            )
+            total_rows += report["rows"]
+            total_bytes += report["bytes"]
+
+            if options["dry_run"]:
+                self.stdout.write(f"{policy.name}: {report['rows']} rows to delete")
+                continue
+            line = f"{policy.name}: {report['rows']} rows, {format_bytes(report['bytes'])}"
+            if report["archive"]:
+                line += (
+                    f" (archived to {report['archive']}, "
+                    f"{format_bytes(report['archive_bytes'])})"
+                )
+            self.stdout.write(line)
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"{total_rows} rows to delete"))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Deleted {total_rows} rows, reclaimed {format_bytes(total_bytes)}"
+                )
+            )
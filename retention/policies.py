@@ -0,0 +1,106 @@
+# what `manage.py apply_retention` removes, one policy per kind of row. The
+# querysets are built when a policy runs so the cutoffs follow the settings.
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from accounts.models import EmailOutbox, EmailVerificationOTP, PasswordResetOTP
+from chat.models import ChatMessages
+from notifications.inbox import unread_count_key
+from notifications.models import Notification
+
+
+class RetentionPolicy:
+    """
+    `queryset`: callable returning the rows to remove
+    `archive`: rows can be exported before deletion (never for secrets)
+    `exclude`: fields left out of the archive
+    `after_delete`: called with the deleted rows (dicts) once a batch is committed
+    """
+
+    def __init__(self, name, queryset, archive=False, exclude=(), after_delete=None):
+        self.name = name
+        self.queryset = queryset
+        self.archive = archive
+        self.exclude = exclude
+        self.after_delete = after_delete
+
+
+def days_ago(days):
+    return timezone.now() - timedelta(days=days)
+
+
+def forget_unread_counts(rows):
+    # recounted on the next read (notifications/inbox.py)
+    cache.delete_many({unread_count_key(row["user_id"]) for row in rows})
+
+
+def delete_message_files(rows):
+    storage = ChatMessages._meta.get_field("file").storage
+    for row in rows:
+        if row["file"]:
+            try:
+                storage.delete(row["file"])
+            except Exception as e:
+                print(f"[ERROR] Failed to delete file {row['file']}: {e}")
+
+
+POLICIES = [
+    RetentionPolicy(
+        "read_notifications",
+        lambda: Notification.objects.filter(
+            is_read=True,
+            last_activity_at__lt=days_ago(settings.RETENTION_READ_NOTIFICATION_DAYS),
+        ),
+        archive=True,
+    ),
+    RetentionPolicy(
+        "unread_notifications",
+        lambda: Notification.objects.filter(
+            is_read=False,
+            last_activity_at__lt=days_ago(settings.RETENTION_UNREAD_NOTIFICATION_DAYS),
+        ),
+        archive=True,
+        after_delete=forget_unread_counts,
+    ),
+    RetentionPolicy(
+        # soft deleted: content already replaced, edited_at is the deletion time
+        "deleted_chat_messages",
+        lambda: ChatMessages.objects.filter(
+            is_deleted=True,
+            edited_at__lt=days_ago(settings.RETENTION_DELETED_MESSAGE_DAYS),
+        ),
+        archive=True,
+        exclude=("search_vector",),
+        after_delete=delete_message_files,
+    ),
+    RetentionPolicy(
+        "email_verification_otps",
+        lambda: EmailVerificationOTP.objects.filter(
+            created_at__lt=days_ago(settings.RETENTION_OTP_DAYS)
+        ),
+    ),
+    RetentionPolicy(
+        "password_reset_otps",
+        lambda: PasswordResetOTP.objects.filter(
+            created_at__lt=days_ago(settings.RETENTION_OTP_DAYS)
+        ),
+    ),
+    RetentionPolicy(
+        "email_outbox",
+        lambda: EmailOutbox.objects.filter(
+            status__in=["sent", "dead"],
+            updated_at__lt=days_ago(settings.RETENTION_EMAIL_OUTBOX_DAYS),
+        ),
+    ),
+    RetentionPolicy(
+        # their blacklist entries are deleted with them (cascade)
+        "expired_jwt_tokens",
+        lambda: OutstandingToken.objects.filter(expires_at__lt=timezone.now()),
+    ),
+]
+
+POLICIES_BY_NAME = {policy.name: policy for policy in POLICIES}
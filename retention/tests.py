@@ -0,0 +1,55 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from accounts.models import User
+from notifications.models import Notification
+from .engine import apply_policy
+from .policies import RetentionPolicy
+
+
+class RetentionArchiveTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.user = User.objects.create(
+            email="client@example.com", full_name="Client", user_type="client"
+        )
+        self.policy = RetentionPolicy(
+            "read_notifications",
+            lambda: Notification.objects.filter(is_read=True),
+            archive=True,
+        )
+
+    def create_notifications(self, count, **fields):
+        for i in range(count):
+            Notification.objects.create(
+                user=self.user,
+                notification_type="booking_created",
+                title=f"Notification {i}",
+                message="",
+                **fields,
+            )
+
+    def test_no_archive_without_matching_rows(self):
+        self.create_notifications(2, is_read=False)
+        report = apply_policy(self.policy, archive_dir=self.archive_dir)
+
+        self.assertEqual(report["rows"], 0)
+        self.assertIsNone(report["archive"])
+        self.assertEqual(os.listdir(self.archive_dir), [])
+
+    def test_matching_rows_are_archived_then_deleted(self):
+        self.create_notifications(3, is_read=True)
+        self.create_notifications(1, is_read=False)
+        report = apply_policy(self.policy, batch_size=2, archive_dir=self.archive_dir)
+
+        self.assertEqual(report["rows"], 3)
+        with gzip.open(report["archive"], "rt", encoding="utf-8") as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(Notification.objects.count(), 1)
@@ -0,0 +1,178 @@
+# shared (django cache) data of the service browse pipeline
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .category_serializers import ServiceCategorySerializer
+from .models import ServiceCategory
+
+CATEGORY_TABLE_KEY = "services:category_table"
+
+
+def get_category_table(refresh=False):
+    """Serialized categories keyed by id, rebuilt with one query on a miss"""
+    table = None if refresh else cache.get(CATEGORY_TABLE_KEY)
+    if table is None:
+        categories = ServiceCategory.objects.select_related("created_by")
+        table = {
+            str(category.id): dict(ServiceCategorySerializer(category).data)
+            for category in categories
+        }
+        cache.set(CATEGORY_TABLE_KEY, table, settings.SERVICE_CATEGORY_CACHE_TTL)
+    return table
+
+
+def invalidate_category_table():
+    cache.delete(CATEGORY_TABLE_KEY)
+
+
+# ---- public catalog response cache ----
+# Responses are cached per (role, query params) under a catalog version that
+# is bumped on every change of a service (see signals.py), old entries are
+# never read again and simply expire.
+
+CATALOG_VERSION_KEY = "services:catalog_version"
+CATALOG_METRICS_KEY = "services:catalog_cache:{endpoint}:{result}"
+CATALOG_ROLES = ("client", "accountant", "academic")
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = bump_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    # a timestamp rather than incr(): a version lost by the cache can never
+    # come back to a value that older entries were stored under
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def catalog_cache_key(endpoint, role, params):
+    query = urlencode(sorted(params.lists()), doseq=True)
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f"services:catalog:{get_catalog_version()}:{endpoint}:{role}:{digest}"
+
+
+def record_catalog_cache(endpoint, result):
+    key = CATALOG_METRICS_KEY.format(endpoint=endpoint, result=result)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first hit / miss since the counters were reset or evicted
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_catalog_cache_stats():
+    """Hits, misses and hit rate of each cached endpoint"""
+    stats = {}
+    for endpoint in ("list", "detail"):
+        hits = cache.get(
+            CATALOG_METRICS_KEY.format(endpoint=endpoint, result="hit"), 0
+        )
+        misses = cache.get(
+            CATALOG_METRICS_KEY.format(endpoint=endpoint, result="miss"), 0
+        )
+        total = hits + misses
+        stats[endpoint] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+    return stats
+
+
+def reset_catalog_cache_stats():
+    cache.delete_many(
+        [
+            CATALOG_METRICS_KEY.format(endpoint=endpoint, result=result)
+            for endpoint in ("list", "detail")
+            for result in ("hit", "miss")
+        ]
+    )
+
+
+def is_own_service(data, user):
+    return str(data["user"]["pk"]) == str(user.pk)
+
+
+class CatalogCacheMixin:
+    """
+    Serves the role-scoped catalog from the cache. Cached responses are shared
+    by every user of a role, so they are built without excluding the current
+    user (the view checks `shared_catalog`). A user with services of their own
+    in the role's scope gets pages built for them, a detail of their own
+    service is not found.
+    """
+
+    shared_catalog = False
+
+    def get_catalog_role(self):
+        role = (getattr(self.request.user, "user_type", "") or "").lower()
+        return role if role in CATALOG_ROLES else None
+
+    def get_cached_response(self, endpoint, build_response):
+        role = self.get_catalog_role()
+        if role is None:
+            return None
+
+        key = catalog_cache_key(endpoint, role, self.request.query_params)
+        if endpoint == "detail":
+            key = f"{key}:{self.kwargs[self.lookup_field]}"
+
+        data = cache.get(key)
+        if data is not None:
+            record_catalog_cache(endpoint, "hit")
+            return data
+
+        record_catalog_cache(endpoint, "miss")
+        self.shared_catalog = True
+        response = build_response()
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.SERVICE_CATALOG_CACHE_TTL)
+        return response.data
+
+    def has_own_services_in_scope(self, role):
+        """Cached under the catalog version like the pages themselves"""
+        key = f"services:catalog:{get_catalog_version()}:own:{role}:{self.request.user.pk}"
+        has_own = cache.get(key)
+        if has_own is None:
+            self.shared_catalog = True
+            has_own = self.get_queryset().filter(user=self.request.user).exists()
+            self.shared_catalog = False
+            cache.set(key, has_own, settings.SERVICE_CATALOG_CACHE_TTL)
+        return has_own
+
+    def list(self, request, *args, **kwargs):
+        # removing the user's services from a shared page would leave it short
+        # and its count wrong: such users (rare) skip the shared pages
+        role = self.get_catalog_role()
+        if role is None or self.has_own_services_in_scope(role):
+            return super().list(request, *args, **kwargs)
+
+        data = self.get_cached_response(
+            "list",
+            lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs),
+        )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = self.get_cached_response(
+            "detail",
+            lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs),
+        )
+        if data is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        if is_own_service(data, request.user):
+            raise NotFound()
+        return Response(data)
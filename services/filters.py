@@ -1,7 +1,8 @@
 import django_filters
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 from .models import Service, ServiceCategory
-from django.db.models import Q
+from .search import search_services
 
 
 class ServiceFilter(django_filters.FilterSet):
@@ -66,12 +67,16 @@ class ServiceFilter(django_filters.FilterSet):
     # add profile search
 
     def filter_search(self, queryset, name, value):
-        """Search across multiple fields in services"""
+        """Ranked search across title, categories, description and provider"""
         if value:
-            return queryset.filter(
-                Q(title__icontains=value)
-                | Q(description__icontains=value)
-                | Q(user__full_name__icontains=value)
-                | Q(location__icontains=value)
-                | Q(categories__name__icontains=value)
-            ).distinct()
+            return search_services(queryset, value)
+        return queryset
+
+
+class RelevanceOrderingFilter(OrderingFilter):
+    """Orders search results by relevance unless an explicit ?ordering= is given"""
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get("search"):
+            return ["-search_rank", *super().get_default_ordering(view)]
+        return super().get_default_ordering(view)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from services.cache import get_catalog_cache_stats, reset_catalog_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show the hit rate of the public service catalog response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        for endpoint, stats in get_catalog_cache_stats().items():
+            self.stdout.write(
+                f"{endpoint}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)"
+            )
+        if options["reset"]:
+            reset_catalog_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
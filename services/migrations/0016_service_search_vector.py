@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:09
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes and the backfill only exist on PostgreSQL, other databases
+# (SQLite for local tests) use the icontains fallback of services/search.py.
+CREATE_SEARCH_SQL = """
+CREATE INDEX services_search_idx ON services USING gin (search_vector);
+CREATE INDEX services_title_trgm_idx ON services USING gin (title gin_trgm_ops);
+
+UPDATE services s SET search_vector =
+    setweight(to_tsvector('simple', coalesce(s.title, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(c.name, ' ')
+        FROM service_categories c
+        JOIN services_categories sc ON sc.servicecategory_id = c.id
+        WHERE sc.service_id = s.id
+    ), '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(s.description, '')), 'C')
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT u.full_name FROM users u WHERE u.id = s.user_id
+    ), '')), 'D');
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS services_title_trgm_idx;
+DROP INDEX IF EXISTS services_search_idx;
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0015_service_is_course'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='service',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,8 @@
 import uuid
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from accounts.models import User
+from uploads.models import STORAGE_STATUS_CHOICES
 
 
 class ServiceCategory(models.Model):
@@ -38,6 +40,9 @@ class ServiceAttachment(models.Model):
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField(help_text="File size in bytes")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    storage_status = models.CharField(
+        max_length=20, choices=STORAGE_STATUS_CHOICES, default="stored"
+    )
 
     class Meta:
         db_table = "service_attachments"
@@ -205,6 +210,9 @@ class Service(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # weighted full-text document, maintained by services/signals.py (see services/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         db_table = "services"
         verbose_name = "Service"
@@ -0,0 +1,84 @@
+# ranked full-text + fuzzy search over the service marketplace
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import Exists, F, FloatField, OuterRef, Q, TextField, Value
+
+from .models import Service, ServiceCategory
+
+# no stemming: titles mix French, Arabic and transliterations
+SEARCH_CONFIG = "simple"
+
+
+def build_search_vector(service):
+    """
+    Weighted document of a service:
+    title (A) > categories (B) > description (C) > provider name (D)
+    Keep in sync with the backfill in migrations/0016_service_search_vector.py
+    """
+    categories = " ".join(service.categories.values_list("name", flat=True))
+    parts = [
+        (service.title, "A"),
+        (categories, "B"),
+        (service.description, "C"),
+        (service.user.full_name, "D"),
+    ]
+    vector = None
+    for text, weight in parts:
+        part = SearchVector(
+            Value(text or "", output_field=TextField()),
+            weight=weight,
+            config=SEARCH_CONFIG,
+        )
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vectors(services):
+    """Recompute the stored search vector of the given services (PostgreSQL only)"""
+    if connection.vendor != "postgresql":
+        return
+    for service in services:
+        Service.objects.filter(pk=service.pk).update(
+            search_vector=build_search_vector(service)
+        )
+
+
+def search_services(queryset, query):
+    """
+    Filter `queryset` on `query` and annotate it with `search_rank`.
+    Matches the weighted document, or the title with a typo / another spelling.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if connection.vendor != "postgresql":
+        # local fallback (SQLite): plain substring match, no ranking
+        category_match = ServiceCategory.objects.filter(
+            services=OuterRef("pk"), name__icontains=query
+        )
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(user__full_name__icontains=query)
+            | Q(location__icontains=query)
+            | Exists(category_match)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    # title__trigram_word_similar uses the trigram index, its threshold is
+    # pg_trgm.word_similarity_threshold (0.6 by default)
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    matches = Q(search_vector=search_query) | Q(title__trigram_word_similar=query)
+    # same location match as the fallback; it is a wilaya code, a longer query
+    # cannot match it (and would cost a scan of the table)
+    if len(query) <= Service._meta.get_field("location").max_length:
+        matches |= Q(location__icontains=query)
+    return queryset.filter(matches).annotate(
+        search_rank=SearchRank(F("search_vector"), search_query)
+        + TrigramWordSimilarity(query, "title")
+    )
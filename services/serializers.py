@@ -3,6 +3,10 @@ from .models import Service, ServiceCategory, ServiceAttachment
 from accounts.serializers import CustomUserDetailsSerializer
 from django.utils import timezone
 from .category_serializers import ServiceCategorySerializer
+from .cache import get_category_table
+from uploads.serializers import CompletedUploadListField
+from uploads.offload import atomic_with_files, store_file
+from uploads.spool import UploadUsedError
 
 
 class ServiceAttachmentSerializer(serializers.ModelSerializer):
@@ -14,8 +18,8 @@ class ServiceAttachmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ServiceAttachment
-        fields = ["id", "url", "filename", "size", "uploaded_at"]
-        read_only_fields = ["id", "uploaded_at"]
+        fields = ["id", "url", "filename", "size", "storage_status", "uploaded_at"]
+        read_only_fields = ["id", "storage_status", "uploaded_at"]
 
     def get_url(self, obj):
         request = self.context.get("request")
@@ -24,8 +28,26 @@ class ServiceAttachmentSerializer(serializers.ModelSerializer):
         return obj.file.url if obj.file else None
 
 
+class CachedCategoriesField(serializers.Field):
+    """
+    Categories of a service served from the cached category table,
+    the queryset only has to prefetch the category ids
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, categories):
+        table = get_category_table()
+        ids = [str(category.pk) for category in categories.all()]
+        if any(category_id not in table for category_id in ids):
+            table = get_category_table(refresh=True)
+        return [table[category_id] for category_id in ids if category_id in table]
+
+
 class ServiceListSerializer(serializers.ModelSerializer):
-    categories = ServiceCategorySerializer(many=True, read_only=True)
+    categories = CachedCategoriesField()
     user = CustomUserDetailsSerializer(read_only=True)
     attachments_count = serializers.SerializerMethodField()
 
@@ -52,7 +74,9 @@ class ServiceListSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_at", "user", "updated_at", "service_type")
 
     def get_attachments_count(self, obj):
-        """Return total number of attachments"""
+        """Return total number of attachments (annotated by the list views)"""
+        if hasattr(obj, "attachments_count"):
+            return obj.attachments_count
         return obj.service_attachments.count()
 
 
@@ -63,7 +87,7 @@ class ServiceDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Service
-        fields = "__all__"
+        exclude = ("search_vector",)
         read_only_fields = ("id", "user", "created_at", "updated_at", "service_type")
 
     def get_all_attachments(self, obj):
@@ -186,6 +210,22 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     
 
 
+def create_attachments(service, files):
+    """
+    Attachments from uploaded files and / or completed chunked uploads,
+    the caller runs it in the atomic_with_files() block saving the service
+    """
+    for file in files:
+        attachment = ServiceAttachment(service=service)
+        # sizes come from the request / spool, never from the storage
+        try:
+            attachment.file_size = store_file(attachment, "file", file)
+        except UploadUsedError as e:
+            raise serializers.ValidationError({"upload_ids": str(e)})
+        attachment.original_filename = getattr(file, "filename", None) or file.name
+        attachment.save()
+
+
 class ServiceCreateSerializer(serializers.ModelSerializer):
     categories = serializers.ListField(
         child=serializers.UUIDField(), write_only=True, required=True
@@ -194,6 +234,8 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
     upload_files = serializers.ListField(
         child=serializers.FileField(), write_only=True, required=False
     )
+    # or ids of completed chunked uploads (see the uploads app)
+    upload_ids = CompletedUploadListField(write_only=True, required=False)
 
     class Meta:
         model = Service
@@ -215,6 +257,7 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
             "location_description",
             "delivery_method",
             "upload_files",
+            "upload_ids",
             "created_at",
             "is_course",
         ]
@@ -261,21 +304,19 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         categories = validated_data.pop("categories", [])
         upload_files = validated_data.pop("upload_files", [])
+        uploads = validated_data.pop("upload_ids", [])
 
-        # Create the service first
-        service = super().create(validated_data)
+        with atomic_with_files():
+            # Create the service first
+            service = super().create(validated_data)
 
-        # Add the categories
-        if categories:
-            existing_categories = ServiceCategory.objects.filter(id__in=categories)
-            service.categories.add(*existing_categories)
+            # Add the categories
+            if categories:
+                existing_categories = ServiceCategory.objects.filter(id__in=categories)
+                service.categories.add(*existing_categories)
 
-        # Handle multiple file uploads
-        if upload_files:
-            for file in upload_files:
-                ServiceAttachment.objects.create(
-                    service=service, file=file, original_filename=file.name
-                )
+            # Handle multiple file uploads
+            create_attachments(service, [*upload_files, *uploads])
 
         return service
 
@@ -307,6 +348,8 @@ class ServiceUpdateSerializer(serializers.ModelSerializer):
     upload_files = serializers.ListField(
         child=serializers.FileField(), write_only=True, required=False
     )
+    # or ids of completed chunked uploads (see the uploads app)
+    upload_ids = CompletedUploadListField(write_only=True, required=False)
 
     class Meta:
         model = Service
@@ -328,6 +371,7 @@ class ServiceUpdateSerializer(serializers.ModelSerializer):
             "location_description",
             "delivery_method",
             "upload_files",
+            "upload_ids",
             "is_course"
 
         ]
@@ -373,28 +417,27 @@ class ServiceUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         categories = validated_data.pop("categories", None)
         upload_files = validated_data.pop("upload_files", [])
-
-        # Update the service first
-        service = super().update(instance, validated_data)
-
-        # Handle categories update if provided
-        if categories is not None:
-            # Clear existing categories and add new ones
-            service.categories.clear()
-            if categories:
-                existing_categories = ServiceCategory.objects.filter(id__in=categories)
-                service.categories.add(*existing_categories)
-
-        # Handle multiple file uploads - replace all existing attachments
-        if upload_files:
-            # Delete all existing attachments
-            service.service_attachments.all().delete()
-
-            # Add new files
-            for file in upload_files:
-                ServiceAttachment.objects.create(
-                    service=service, file=file, original_filename=file.name
-                )
+        uploads = validated_data.pop("upload_ids", [])
+
+        with atomic_with_files():
+            # Update the service first
+            service = super().update(instance, validated_data)
+
+            # Handle categories update if provided
+            if categories is not None:
+                # Clear existing categories and add new ones
+                service.categories.clear()
+                if categories:
+                    existing_categories = ServiceCategory.objects.filter(id__in=categories)
+                    service.categories.add(*existing_categories)
+
+            # Handle multiple file uploads - replace all existing attachments
+            if upload_files or uploads:
+                # Delete all existing attachments
+                service.service_attachments.all().delete()
+
+                # Add new files
+                create_attachments(service, [*upload_files, *uploads])
 
         return service
 
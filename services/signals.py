@@ -0,0 +1,69 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from accounts.signals import websocket_auth_fields_changed
+from .models import Service, ServiceAttachment, ServiceCategory
+from .cache import bump_catalog_version, invalidate_category_table
+from .search import update_search_vectors
+
+
+@receiver(post_save, sender=Service)
+def update_service_search_vector(sender, instance, **kwargs):
+    update_search_vectors([instance])
+
+
+@receiver(m2m_changed, sender=Service.categories.through)
+def update_search_vector_on_categories_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_search_vectors([instance])
+    elif pk_set:
+        # categories side: pk_set holds the affected services
+        update_search_vectors(
+            Service.objects.filter(pk__in=pk_set).select_related("user")
+        )
+
+
+@receiver(post_save, sender=ServiceCategory)
+def update_search_vector_on_category_rename(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(instance.services.select_related("user"))
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_category_table_on_change(sender, instance, **kwargs):
+    invalidate_category_table()
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=ServiceAttachment)
+@receiver(post_delete, sender=ServiceAttachment)
+def invalidate_catalog_on_change(sender, **kwargs):
+    # create / update / soft delete (is_active=False) of a service or its files
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Service.categories.through)
+def invalidate_catalog_on_categories_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def refresh_provider_services(sender, instance, created, **kwargs):
+    # the provider name is part of the search document and of the cached
+    # catalog responses, other saves (login, OTP verification...) change neither.
+    # The saved name comes from the pre_save snapshot of accounts/signals.py.
+    if created or not websocket_auth_fields_changed(instance, "full_name"):
+        return
+    services = list(instance.services.select_related("user"))
+    if services:
+        update_search_vectors(services)
+        bump_catalog_version()
@@ -1,3 +1,270 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from bookings.serializers import BookingDetailSerializer
+from .cache import bump_catalog_version, get_catalog_cache_stats, get_catalog_version
+from .models import Service, ServiceAttachment, ServiceCategory
+from .serializers import ServiceDetailSerializer
+
+
+class ServiceCatalogTestCase(TestCase):
+    # own services in scope, count, page, category ids prefetch (the
+    # category table is cached)
+    BROWSE_QUERIES = 4
+
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create(
+            email="client@example.com", full_name="Client", user_type="client"
+        )
+        self.accountant = User.objects.create(
+            email="accountant@example.com",
+            full_name="Accountant",
+            user_type="accountant",
+        )
+        self.categories = [
+            ServiceCategory.objects.create(name=f"Category {i}") for i in range(3)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def create_services(self, count):
+        for i in range(count):
+            service = Service.objects.create(
+                user=self.accountant,
+                service_type="offered",
+                title=f"Service {i}",
+                description="Bookkeeping",
+            )
+            service.categories.set(self.categories)
+            for n in range(2):
+                ServiceAttachment.objects.create(
+                    service=service,
+                    file=f"service_attachments/{i}-{n}.pdf",
+                    original_filename=f"{i}-{n}.pdf",
+                    file_size=10,
+                )
+
+    def browse(self, queries=BROWSE_QUERIES, **params):
+        # warm the category table so only the page itself is measured,
+        # the response cache is bypassed by starting a new catalog version
+        self.api.get("/services/browse/", params)
+        bump_catalog_version()
+        with self.assertNumQueries(queries):
+            response = self.api.get("/services/browse/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+
+class ServiceBrowseQueryCountTests(ServiceCatalogTestCase):
+    """The browse page must cost the same number of queries whatever its size"""
+
+    def test_query_budget_does_not_depend_on_page_size(self):
+        for total in (1, 5, 20):
+            with self.subTest(services=total):
+                Service.objects.all().delete()
+                self.create_services(total)
+                data = self.browse()
+                self.assertEqual(len(data["results"]), total)
+
+    def test_query_budget_with_filters_and_search(self):
+        self.create_services(20)
+        # + the categories filter validating the requested ids
+        data = self.browse(
+            queries=self.BROWSE_QUERIES + 1,
+            categories=str(self.categories[0].id),
+            search="Service",
+        )
+        self.assertEqual(len(data["results"]), 20)
+
+    def test_search_matches_the_location(self):
+        self.create_services(2)
+        Service.objects.filter(title="Service 1").update(location="16")
+        data = self.browse(search="16")
+        self.assertEqual([s["title"] for s in data["results"]], ["Service 1"])
+
+    def test_counts_and_categories(self):
+        self.create_services(2)
+        data = self.browse()
+        service = data["results"][0]
+        self.assertEqual(service["attachments_count"], 2)
+        self.assertEqual(
+            sorted(category["name"] for category in service["categories"]),
+            [category.name for category in self.categories],
+        )
+        self.assertEqual(service["user"]["full_name"], "Accountant")
+
+    def test_category_table_is_refreshed_on_rename(self):
+        self.create_services(1)
+        self.browse()
+        category = self.categories[0]
+        category.name = "Renamed"
+        category.save()
+        names = [c["name"] for c in self.browse()["results"][0]["categories"]]
+        self.assertIn("Renamed", names)
+
+
+class CatalogCacheTests(ServiceCatalogTestCase):
+    """Public catalog responses are shared by every user of a role"""
+
+    def test_cached_page_costs_no_query(self):
+        self.create_services(5)
+        self.api.get("/services/browse/")
+        with self.assertNumQueries(0):
+            response = self.api.get("/services/browse/")
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.assertEqual(get_catalog_cache_stats()["list"]["hits"], 1)
+
+    def test_own_services_are_left_out_of_every_page(self):
+        self.create_services(22)
+        other = User.objects.create(
+            email="other@example.com", full_name="Other", user_type="client"
+        )
+        # a client's own services in the client catalog, newer than the rest
+        own = [
+            Service.objects.create(
+                user=other, service_type="offered", title=f"Own {i}", description="x"
+            )
+            for i in range(3)
+        ]
+        self.api.get("/services/browse/")
+        self.api.get(f"/services/browse/{own[0].id}/")
+
+        api = APIClient()
+        api.force_authenticate(other)
+        first = api.get("/services/browse/").json()
+        second = api.get("/services/browse/", {"page": 2}).json()
+        self.assertEqual((first["count"], second["count"]), (22, 22))
+        ids = [item["id"] for item in first["results"] + second["results"]]
+        self.assertEqual((len(first["results"]), len(ids)), (20, 22))
+        self.assertFalse({str(service.id) for service in own} & set(ids))
+
+        # the other clients still share their pages
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get("/services/browse/").json()["count"], 25)
+        with self.assertNumQueries(0):
+            response = api.get(f"/services/browse/{own[0].id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_service_changes_bump_the_catalog(self):
+        self.create_services(2)
+        self.api.get("/services/browse/")
+        service = Service.objects.first()
+        service.is_active = False
+        service.save()
+        self.assertEqual(len(self.api.get("/services/browse/").json()["results"]), 1)
+
+        ServiceAttachment.objects.create(
+            service=Service.objects.filter(is_active=True).first(),
+            file="service_attachments/new.pdf",
+            original_filename="new.pdf",
+            file_size=10,
+        )
+        results = self.api.get("/services/browse/").json()["results"]
+        self.assertEqual(results[0]["attachments_count"], 3)
+
+    def test_only_a_provider_rename_bumps_the_catalog(self):
+        self.create_services(2)
+        version = get_catalog_version()
+
+        # login, OTP verification, profile edits...
+        self.accountant.last_login = timezone.now()
+        self.accountant.save()
+        self.accountant.phone = "0550000000"
+        self.accountant.save()
+        self.assertEqual(get_catalog_version(), version)
+
+        self.accountant.full_name = "Renamed Accountant"
+        self.accountant.save()
+        self.assertNotEqual(get_catalog_version(), version)
+        results = self.api.get("/services/browse/").json()["results"]
+        self.assertEqual(results[0]["user"]["full_name"], "Renamed Accountant")
+
+    def test_a_user_save_snapshots_the_user_once(self):
+        self.accountant.last_login = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            self.accountant.save()
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1, selects)
+
+
+class ServiceDetailQueryCountTests(ServiceCatalogTestCase):
+    """A detail request resolves its service once, whatever the serializer"""
+
+    # service + user, categories (with their creator), attachments
+    DETAIL_QUERIES = 3
+
+    def setUp(self):
+        super().setUp()
+        for category in self.categories:
+            category.created_by = self.accountant
+            category.save()
+
+    def create_service(self, user, **fields):
+        service = Service.objects.create(
+            user=user, title="Service", description="Bookkeeping", **fields
+        )
+        service.categories.set(self.categories)
+        for n in range(3):
+            ServiceAttachment.objects.create(
+                service=service,
+                file=f"service_attachments/{service.id}-{n}.pdf",
+                original_filename=f"{n}.pdf",
+                file_size=10,
+            )
+        return service
+
+    def assertDetailQueries(self, user, url):
+        api = APIClient()
+        api.force_authenticate(user)
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_course(self):
+        academic = User.objects.create(
+            email="academic@example.com", user_type="academic"
+        )
+        service = self.create_service(
+            self.accountant, service_type="offered", is_course=True
+        )
+        data = self.assertDetailQueries(academic, f"/services/browse/{service.id}/")
+        self.assertNotIn("all_attachments", data)
+
+    def test_offered(self):
+        service = self.create_service(self.accountant, service_type="offered")
+        data = self.assertDetailQueries(
+            self.client_user, f"/services/browse/{service.id}/"
+        )
+        self.assertEqual(len(data["all_attachments"]), 3)
+        self.assertEqual(len(data["categories"]), 3)
+
+    def test_needed(self):
+        service = self.create_service(self.client_user, service_type="needed")
+        data = self.assertDetailQueries(
+            self.accountant, f"/services/browse/{service.id}/"
+        )
+        self.assertEqual(len(data["all_attachments"]), 3)
+
+    def test_generic(self):
+        # any other service type falls back to ServiceDetailSerializer
+        service = self.create_service(self.accountant, service_type="other")
+        data = self.assertDetailQueries(self.accountant, f"/services/my/{service.id}/")
+        self.assertEqual(len(data["all_attachments"]), 3)
+        self.assertNotIn("search_vector", data)
+
+
+class SearchVectorExposureTests(TestCase):
+    """The search index column is never part of an API response"""
+
+    def test_serializers_leave_out_the_search_vector(self):
+        self.assertNotIn("search_vector", ServiceDetailSerializer().fields)
+        self.assertNotIn(
+            "search_vector", BookingDetailSerializer().fields["service"].fields
+        )
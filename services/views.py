@@ -20,9 +20,50 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
+from django.db.models import Count, Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from .filters import ServiceFilter
+from .filters import ServiceFilter, RelevanceOrderingFilter
+from .cache import CatalogCacheMixin
+
+
+def with_list_data(queryset):
+    """
+    Everything ServiceListSerializer reads, in a fixed number of queries:
+    joined users, annotated attachment counts and prefetched category ids
+    (the categories themselves come from the cached category table)
+    """
+    return (
+        queryset.select_related("user")
+        .defer("search_vector")
+        .prefetch_related(
+            Prefetch("categories", queryset=ServiceCategory.objects.only("id"))
+        )
+        .annotate(attachments_count=Count("service_attachments", distinct=True))
+    )
+
+
+def with_detail_data(queryset):
+    """Everything the detail serializers read: user, categories and attachments"""
+    categories = ServiceCategory.objects.select_related("created_by")
+    return (
+        queryset.select_related("user")
+        .defer("search_vector")
+        .prefetch_related(
+            Prefetch("categories", queryset=categories), "service_attachments"
+        )
+    )
+
+
+class MemoizedObjectMixin:
+    """
+    get_serializer_class() needs the instance to pick the serializer and
+    retrieve() needs it again: resolve it once per request
+    """
+
+    def get_object(self):
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
 
 
 class ServiceCreateAPIView(generics.CreateAPIView):
@@ -35,7 +76,7 @@ class ServiceCreateAPIView(generics.CreateAPIView):
             data = {}
 
             for key, value in request.data.items():
-                if key not in ["upload_files"]:
+                if key not in ["upload_files", "upload_ids"]:
                     data[key] = value
 
             if "categories" in data and isinstance(data["categories"], str):
@@ -50,6 +91,11 @@ class ServiceCreateAPIView(generics.CreateAPIView):
             if upload_files:
                 data["upload_files"] = upload_files
 
+            # Ids of completed chunked uploads
+            upload_ids = request.data.getlist("upload_ids")
+            if upload_ids:
+                data["upload_ids"] = upload_ids
+
         else:
             data = request.data
 
@@ -81,7 +127,7 @@ class ServiceUpdateAPIView(generics.UpdateAPIView):
 
             # Copy all text fields
             for key, value in request.data.items():
-                if key not in ["upload_files"]:
+                if key not in ["upload_files", "upload_ids"]:
                     data[key] = value
 
             # Handle categories JSON parsing
@@ -98,6 +144,11 @@ class ServiceUpdateAPIView(generics.UpdateAPIView):
             if upload_files:
                 data["upload_files"] = upload_files
 
+            # Ids of completed chunked uploads
+            upload_ids = request.data.getlist("upload_ids")
+            if upload_ids:
+                data["upload_ids"] = upload_ids
+
         else:
             # For JSON requests, use data as-is
             data = request.data
@@ -121,17 +172,11 @@ class ServiceUpdateAPIView(generics.UpdateAPIView):
         serializer.save(user=user)
 
 
-class PublicServiceListAPIView(generics.ListAPIView):
+class PublicServiceListAPIView(CatalogCacheMixin, generics.ListAPIView):
     serializer_class = ServiceListSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RelevanceOrderingFilter]
     filterset_class = ServiceFilter
-    search_fields = [
-        "title",
-        "description",
-        "user__full_name",
-        "categories__name",
-    ]
     ordering_fields = ["created_at", "price", "estimated_duration"]
     ordering = ["-created_at"]
 
@@ -139,29 +184,33 @@ class PublicServiceListAPIView(generics.ListAPIView):
         user = self.request.user
         role = (getattr(user, "user_type", "") or "").lower()
         if role == "client":
-            return Service.objects.filter(
+            services = Service.objects.filter(
                 is_active=True, 
                 service_type="offered",
                 is_course=False
-            ).exclude(user=user)
-
-        if role == "accountant":
-            return Service.objects.filter(
+            )
+        elif role == "accountant":
+            services = Service.objects.filter(
                 is_active=True,
                 service_type="needed"
-            ).exclude(user=user)
-            
-        if role =="academic":
-            return Service.objects.filter(
+            )
+        elif role =="academic":
+            services = Service.objects.filter(
                 is_active = True ,
                 service_type="offered",
                 is_course=True
-            ).exclude(user=user)
-            
-        return Service.objects.none()
+            )
+        else:
+            return Service.objects.none()
+
+        if not self.shared_catalog:
+            services = services.exclude(user=user)
+        return with_list_data(services)
 
 
-class PublicServiceDetailAPIView(generics.RetrieveAPIView):
+class PublicServiceDetailAPIView(
+    CatalogCacheMixin, MemoizedObjectMixin, generics.RetrieveAPIView
+):
     permission_classes = [IsAuthenticated]
     lookup_field = "pk"
 
@@ -186,37 +235,26 @@ class PublicServiceDetailAPIView(generics.RetrieveAPIView):
         role = (getattr(user, "user_type", "") or "").lower()
 
         if role == "client":
-            return (
-                Service.objects.filter(
-                    is_active=True, 
-                    service_type="offered",
-                    is_course = False
-                    )
-                .select_related("user")
-                .prefetch_related("categories")
-                .exclude(user=user)
+            services = Service.objects.filter(
+                is_active=True, 
+                service_type="offered",
+                is_course = False
             )
-        if role == "accountant":
-            return (
-                Service.objects.filter(is_active=True,
-                                       service_type="needed")
-                .select_related("user")
-                .prefetch_related("categories")
-                .exclude(user=user)
+        elif role == "accountant":
+            services = Service.objects.filter(is_active=True,
+                                              service_type="needed")
+        elif role == "academic":
+            services = Service.objects.filter(
+                is_active=True,
+                service_type="offered",  
+                is_course=True,
             )
-            
-        if role == "academic":
-            return(
-                Service.objects.filter(
-                    is_active=True,
-                    service_type="offered",  
-                    is_course=True,
-                  )  .select_related("user")
-                .prefetch_related("categories")
-                .exclude(user=user)
-                                       )
-            
-        return None
+        else:
+            return None
+
+        if not self.shared_catalog:
+            services = services.exclude(user=user)
+        return with_detail_data(services)
 
 
 class UserServiceListAPIView(generics.ListAPIView):
@@ -224,15 +262,12 @@ class UserServiceListAPIView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return (
+        return with_list_data(
             Service.objects.filter(user=self.request.user, is_active=True)
-            .select_related("user")
-            .prefetch_related("categories")
-            .order_by("-created_at")
-        )
+        ).order_by("-created_at")
 
 
-class ServiceDetailAPIView(generics.RetrieveAPIView):
+class ServiceDetailAPIView(MemoizedObjectMixin, generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     lookup_field = "pk"
 
@@ -250,10 +285,8 @@ class ServiceDetailAPIView(generics.RetrieveAPIView):
         return ServiceDetailSerializer
 
     def get_queryset(self):
-        return (
+        return with_detail_data(
             Service.objects.filter(user=self.request.user, is_active=True)
-            .select_related("user")
-            .prefetch_related("categories")
         )
 
 
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from uploads.models import UploadSession
+from uploads.spool import discard
+
+
+class Command(BaseCommand):
+    help = "Delete upload sessions (and their spooled chunks) left unused past UPLOAD_SESSION_TTL_HOURS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=settings.UPLOAD_SESSION_TTL_HOURS,
+            help="Age (since the last chunk or commit) after which a session is purged",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        sessions = UploadSession.objects.filter(updated_at__lt=cutoff)
+
+        purged = 0
+        for session in sessions.iterator():
+            discard(session)
+            purged += 1
+        sessions.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} upload sessions"))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from uploads.offload import claim_jobs, process_job
+
+
+class Command(BaseCommand):
+    help = "Push the spooled upload files to the configured storage (STORAGE_OFFLOAD_ENABLED)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Number of jobs claimed at a time",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the available jobs and exit",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = claim_jobs(options["batch_size"])
+            stored = sum(1 for job in jobs if process_job(job))
+            if jobs:
+                self.stdout.write(f"Stored {stored}/{len(jobs)} files")
+
+            if options["once"] and not jobs:
+                break
+            if not jobs:
+                time.sleep(options["sleep"])
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:18
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageOffloadJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('object_id', models.CharField(max_length=64)),
+                ('field_name', models.CharField(max_length=100)),
+                ('status_field', models.CharField(max_length=100)),
+                ('filename', models.CharField(max_length=255)),
+                ('spool_path', models.CharField(max_length=1024)),
+                ('size', models.PositiveBigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Storage Offload Job',
+                'verbose_name_plural': 'Storage Offload Jobs',
+                'db_table': 'storage_offload_jobs',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='storage_off_status_0614d0_idx')],
+            },
+        ),
+    ]
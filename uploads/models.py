@@ -0,0 +1,127 @@
+import math
+import uuid
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils import timezone
+from accounts.models import User
+
+
+# where the file of an attachment row is (see uploads/offload.py)
+STORAGE_STATUS_CHOICES = [
+    ("pending", "Pending"),  # in the local spool, waiting for the offload worker
+    ("stored", "Stored"),  # in the configured storage
+    ("failed", "Failed"),  # the worker gave up, the file is lost
+]
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload: the client sends the file in numbered chunks that are
+    spooled to disk (see uploads/spool.py), then commits the session.
+    Completed uploads are referenced by id from the service, booking and chat
+    endpoints instead of sending the file in their own request.
+    """
+
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),  # chunks are being received
+        ("completed", "Completed"),  # assembled, waiting to be attached
+        ("consumed", "Consumed"),  # copied to its final storage
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(help_text="Total file size in bytes")
+    chunk_size = models.PositiveIntegerField()
+    # optional checksum of the whole file, verified on commit
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="uploading"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "upload_sessions"
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status}) by {self.user.email}"
+
+    @property
+    def total_chunks(self):
+        return max(1, math.ceil(self.size / self.chunk_size))
+
+    def expected_chunk_size(self, index):
+        """Every chunk is `chunk_size` bytes except the last one"""
+        if index == self.total_chunks - 1:
+            return self.size - self.chunk_size * index
+        return self.chunk_size
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(
+        UploadSession, on_delete=models.CASCADE, related_name="chunks"
+    )
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "upload_chunks"
+        verbose_name = "Upload Chunk"
+        verbose_name_plural = "Upload Chunks"
+        unique_together = ("session", "index")
+        ordering = ["index"]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.session_id}"
+
+
+class StorageOffloadJob(models.Model):
+    """A spooled file the worker has to push to the storage of a model FileField"""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # the row owning the file (attachment, booking, chat message)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=64)
+    field_name = models.CharField(max_length=100)
+    status_field = models.CharField(max_length=100)
+
+    filename = models.CharField(max_length=255)
+    spool_path = models.CharField(max_length=1024)
+    size = models.PositiveBigIntegerField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "storage_offload_jobs"
+        verbose_name = "Storage Offload Job"
+        verbose_name_plural = "Storage Offload Jobs"
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} -> {self.field_name} ({self.status})"
@@ -0,0 +1,200 @@
+# storage offload: requests only write files to the local spool, the
+# run_storage_offload_worker command pushes them to the configured storage
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import StorageOffloadJob, UploadSession
+from .spool import COPY_BUFFER_SIZE, attach_upload, consume, data_path, discard
+
+# sent by the worker once a spooled file is in the storage (sender: the model)
+file_stored = Signal()
+
+# a running job whose worker did not report back for this long is retried
+STALE_JOB_SECONDS = 600
+
+
+def offload_dir():
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, "offload")
+
+
+# cleanups of the files written by store_file in the running atomic_with_files
+# blocks of this thread
+_written_files = threading.local()
+
+
+@contextmanager
+def atomic_with_files():
+    """
+    transaction.atomic() for saving rows with their files: the files that
+    store_file writes inside the block (storage or local spool) are deleted
+    when it rolls back. Those of a nested block that succeeded are kept
+    until the outermost one ends.
+    """
+    if not hasattr(_written_files, "cleanups"):
+        _written_files.cleanups = []
+        _written_files.depth = 0
+    cleanups = _written_files.cleanups
+    start = len(cleanups)
+    _written_files.depth += 1
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        rolled_back = cleanups[start:]
+        del cleanups[start:]
+        for cleanup in reversed(rolled_back):
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"[ERROR] Failed to delete a file of a rolled back transaction: {e}")
+        raise
+    finally:
+        _written_files.depth -= 1
+    if not _written_files.depth:
+        cleanups.clear()
+
+
+def delete_on_rollback(cleanup):
+    """Registers `cleanup` with the running atomic_with_files block, if any"""
+    cleanups = getattr(_written_files, "cleanups", None)
+    if cleanups is not None and _written_files.depth:
+        cleanups.append(cleanup)
+
+
+def store_file(instance, field_name, source, status_field="storage_status"):
+    """
+    Put `source` (an uploaded file or a completed UploadSession) into the
+    `field_name` FileField of `instance` and return its size in bytes.
+
+    With STORAGE_OFFLOAD_ENABLED the file is only written to the local spool,
+    the field stays empty with a "pending" status until the worker stores it.
+    The caller saves the instance inside atomic_with_files(), which deletes
+    the written file if the transaction rolls back.
+    """
+    is_upload = isinstance(source, UploadSession)
+    filename = source.filename if is_upload else os.path.basename(source.name)
+    field_file = getattr(instance, field_name)
+
+    if not settings.STORAGE_OFFLOAD_ENABLED:
+        if is_upload:
+            attach_upload(source, field_file)
+        else:
+            field_file.save(filename, source, save=False)
+        delete_on_rollback(partial(field_file.storage.delete, field_file.name))
+        setattr(instance, status_field, "stored")
+        return source.size
+
+    os.makedirs(offload_dir(), exist_ok=True)
+    spool_path = os.path.join(offload_dir(), uuid.uuid4().hex)
+    if is_upload:
+        # already on the spool disk, just move it once the row is committed
+        # (a worker claiming the job before the move retries it)
+        consume(source)
+        transaction.on_commit(lambda: move_upload(source, spool_path))
+    else:
+        with open(spool_path, "wb") as out:
+            for chunk in source.chunks(COPY_BUFFER_SIZE):
+                out.write(chunk)
+        delete_on_rollback(partial(os.remove, spool_path))
+
+    setattr(instance, field_name, "")
+    setattr(instance, status_field, "pending")
+    # pks are client side uuids: the job can point to the row before it is saved
+    StorageOffloadJob.objects.create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=str(instance.pk),
+        field_name=field_name,
+        status_field=status_field,
+        filename=filename,
+        spool_path=spool_path,
+        size=source.size,
+    )
+    return source.size
+
+
+def move_upload(session, spool_path):
+    os.replace(data_path(session), spool_path)
+    discard(session)
+
+
+def claim_jobs(batch_size):
+    """Lock and mark as running the next jobs to process"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_JOB_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            StorageOffloadJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status="pending", available_at__lte=now)
+                | Q(status="running", updated_at__lt=stale)
+            )
+            .order_by("available_at")[:batch_size]
+        )
+        StorageOffloadJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status="running", updated_at=now
+        )
+    return jobs
+
+
+def process_job(job):
+    """Push one spooled file to the storage, returns True once it is stored"""
+    model = job.content_type.model_class()
+    try:
+        instance = model.objects.filter(pk=job.object_id).first()
+        if instance is None:
+            # the row is not committed yet (or was deleted since)
+            raise LookupError(f"{model.__name__} {job.object_id} not found")
+
+        field_file = getattr(instance, job.field_name)
+        with open(job.spool_path, "rb") as data:
+            field_file.save(job.filename, File(data), save=False)
+        setattr(instance, job.status_field, "stored")
+        instance.save(update_fields=[job.field_name, job.status_field])
+    except Exception as e:
+        retry_or_fail(job, model, e)
+        return False
+
+    os.remove(job.spool_path)
+    job.status = "done"
+    job.last_error = ""
+    job.save(update_fields=["status", "last_error", "updated_at"])
+    file_stored.send(sender=model, instance=instance, field_name=job.field_name)
+    return True
+
+
+def retry_or_fail(job, model, error):
+    job.attempts += 1
+    job.last_error = str(error)
+    if job.attempts < settings.STORAGE_OFFLOAD_MAX_ATTEMPTS:
+        # exponential backoff: 2, 4, 8, ... seconds
+        job.status = "pending"
+        job.available_at = timezone.now() + timedelta(seconds=2**job.attempts)
+        job.save(
+            update_fields=[
+                "attempts",
+                "last_error",
+                "status",
+                "available_at",
+                "updated_at",
+            ]
+        )
+        return
+
+    print(f"[ERROR] Storage offload of {job.filename} failed: {error}")
+    job.status = "failed"
+    job.save(update_fields=["attempts", "last_error", "status", "updated_at"])
+    model.objects.filter(pk=job.object_id).update(**{job.status_field: "failed"})
+    if os.path.exists(job.spool_path):
+        os.remove(job.spool_path)
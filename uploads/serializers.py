@@ -0,0 +1,79 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import UploadSession
+
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["filename", "content_type", "size", "sha256"]
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("File size must be greater than zero.")
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (
+            len(value) != 64 or any(c not in "0123456789abcdef" for c in value)
+        ):
+            raise serializers.ValidationError("Invalid SHA-256 checksum.")
+        return value
+
+    def create(self, validated_data):
+        validated_data["user"] = self.context["request"].user
+        validated_data["chunk_size"] = settings.UPLOAD_CHUNK_SIZE
+        return super().create(validated_data)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    upload_id = serializers.UUIDField(source="id", read_only=True)
+    total_chunks = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "upload_id",
+            "filename",
+            "content_type",
+            "size",
+            "chunk_size",
+            "total_chunks",
+            "received_chunks",
+            "sha256",
+            "status",
+            "created_at",
+            "completed_at",
+        ]
+        read_only_fields = fields
+
+    def get_received_chunks(self, obj):
+        return [chunk.index for chunk in obj.chunks.all()]
+
+
+class CompletedUploadField(serializers.PrimaryKeyRelatedField):
+    """Id of a completed upload session of the requesting user"""
+
+    default_error_messages = {
+        "does_not_exist": "Upload {pk_value} does not exist or is not completed.",
+    }
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        return UploadSession.objects.filter(user=request.user, status="completed")
+
+
+class CompletedUploadListField(serializers.ListField):
+    """Ids of completed upload sessions, an id sent twice is used once"""
+
+    child = CompletedUploadField()
+
+    def to_internal_value(self, data):
+        return list(dict.fromkeys(super().to_internal_value(data)))
@@ -0,0 +1,147 @@
+# on-disk spool of the chunked uploads, files are only ever handled as streams
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+
+# bytes read / written at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+class UploadUsedError(Exception):
+    pass
+
+
+def session_dir(session):
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, str(session.id))
+
+
+def chunk_path(session, index):
+    return os.path.join(session_dir(session), f"{index}.part")
+
+
+def data_path(session):
+    """The assembled file of a completed session"""
+    return os.path.join(session_dir(session), "data")
+
+
+def write_chunk(session, index, stream, sha256):
+    """
+    Stream one chunk from `stream` to the spool, checking its size and checksum.
+    Re-sending a chunk replaces it, which is what makes uploads resumable.
+    """
+    expected_size = session.expected_chunk_size(index)
+    os.makedirs(session_dir(session), exist_ok=True)
+    final_path = chunk_path(session, index)
+    tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                data = stream.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                size += len(data)
+                if size > expected_size:
+                    raise ChunkError(
+                        f"Chunk {index} is larger than {expected_size} bytes."
+                    )
+                digest.update(data)
+                out.write(data)
+
+        if size != expected_size:
+            raise ChunkError(
+                f"Chunk {index} has {size} bytes, {expected_size} expected."
+            )
+        if digest.hexdigest() != sha256.lower():
+            raise ChunkError(f"Checksum mismatch for chunk {index}.")
+
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    chunk, _ = UploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={"size": size, "sha256": sha256.lower()}
+    )
+    return chunk
+
+
+def missing_chunks(session):
+    received = set(session.chunks.values_list("index", flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def assemble(session):
+    """Concatenate the chunks into the session file and mark the session completed"""
+    missing = missing_chunks(session)
+    if missing:
+        raise ChunkError(f"Missing chunks: {missing}.")
+
+    digest = hashlib.sha256()
+    with open(data_path(session), "wb") as out:
+        for index in range(session.total_chunks):
+            with open(chunk_path(session, index), "rb") as part:
+                while True:
+                    data = part.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    out.write(data)
+
+    if session.sha256 and digest.hexdigest() != session.sha256.lower():
+        os.remove(data_path(session))
+        raise ChunkError("Checksum mismatch for the assembled file.")
+
+    for index in range(session.total_chunks):
+        os.remove(chunk_path(session, index))
+    session.chunks.all().delete()
+
+    session.sha256 = digest.hexdigest()
+    session.status = "completed"
+    session.completed_at = timezone.now()
+    session.save(update_fields=["sha256", "status", "completed_at", "updated_at"])
+
+
+def consume(session):
+    """
+    Mark a completed session consumed in the caller's transaction, of the
+    requests using the same upload only one gets it. A rollback leaves the
+    session completed, its spool copy must only be removed on commit.
+    """
+    consumed = UploadSession.objects.filter(pk=session.pk, status="completed").update(
+        status="consumed", updated_at=timezone.now()
+    )
+    if not consumed:
+        raise UploadUsedError(f"Upload {session.pk} was already used.")
+    session.status = "consumed"
+
+
+def attach_upload(session, field_file):
+    """
+    Stream a completed upload into a FileField (its own storage and upload_to),
+    the caller saves the model instance in the same transaction. The spool
+    copy is removed once it commits, store_file deletes the stored copy if it
+    rolls back.
+    """
+    consume(session)
+    with open(data_path(session), "rb") as data:
+        field_file.save(session.filename, File(data), save=False)
+    transaction.on_commit(lambda: discard(session))
+
+
+def discard(session):
+    shutil.rmtree(session_dir(session), ignore_errors=True)
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import User
+from services.models import Service, ServiceAttachment, ServiceCategory
+from services.serializers import ServiceCreateSerializer
+from .models import StorageOffloadJob, UploadSession
+from .offload import atomic_with_files, process_job, store_file
+from .spool import data_path
+
+
+class UploadTestCase(TestCase):
+    def setUp(self):
+        self.spool = tempfile.mkdtemp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(
+            UPLOAD_SPOOL_DIR=self.spool,
+            MEDIA_ROOT=self.media,
+            STORAGE_OFFLOAD_ENABLED=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create(
+            email="accountant@example.com",
+            full_name="Accountant",
+            user_type="accountant",
+        )
+        self.category = ServiceCategory.objects.create(name="Upload tests")
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def upload(self, content=b"hello"):
+        """A completed upload, sent through the chunk endpoints"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        response = self.api.post(
+            "/uploads/",
+            {"filename": "file.txt", "size": len(content), "sha256": sha256},
+            format="json",
+        )
+        upload_id = response.json()["upload_id"]
+        self.api.put(
+            f"/uploads/{upload_id}/chunks/0/",
+            content,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=sha256,
+        )
+        response = self.api.post(f"/uploads/{upload_id}/commit/")
+        self.assertEqual(response.json()["status"], "completed")
+        return UploadSession.objects.get(pk=upload_id)
+
+    def service_data(self, *uploads):
+        return {
+            "title": "Bilan",
+            "description": "Bilan annuel",
+            "categories": [str(self.category.pk)],
+            "upload_ids": [str(upload.pk) for upload in uploads],
+        }
+
+    def create_service(self, *uploads):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.post(
+                "/services/create/", self.service_data(*uploads), format="json"
+            )
+
+
+class UploadIdTests(UploadTestCase):
+    def test_an_upload_sent_twice_is_attached_once(self):
+        upload = self.upload()
+        response = self.create_service(upload, upload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["all_attachments"]), 1)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, "consumed")
+        self.assertFalse(os.path.exists(data_path(upload)))
+
+    def test_a_used_upload_is_rejected(self):
+        upload = self.upload()
+        self.assertEqual(self.create_service(upload).status_code, 201)
+
+        response = self.create_service(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("upload_ids", response.json())
+        self.assertEqual(Service.objects.count(), 1)
+
+    def test_an_unknown_upload_is_rejected(self):
+        upload = self.upload()
+        upload.delete()
+        response = self.create_service(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Service.objects.exists())
+
+    def test_a_failed_request_keeps_the_upload(self):
+        first, second = self.upload(b"first"), self.upload(b"second")
+        request = APIRequestFactory().post("/services/create/")
+        request.user = self.user
+        serializer = ServiceCreateSerializer(
+            data=self.service_data(first, second), context={"request": request}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # another request uses the second upload after the validation
+        UploadSession.objects.filter(pk=second.pk).update(status="consumed")
+        with self.assertRaises(serializers.ValidationError):
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save(user=self.user)
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, "completed")
+        self.assertTrue(os.path.exists(data_path(first)))
+        self.assertFalse(Service.objects.exists())
+        # the first upload was stored before the failure, nothing is left
+        stored = [name for _, _, names in os.walk(self.media) for name in names]
+        self.assertEqual(stored, [])
+
+    @override_settings(STORAGE_OFFLOAD_ENABLED=True)
+    def test_the_offloaded_upload_is_moved_on_commit(self):
+        upload = self.upload()
+        self.assertEqual(self.create_service(upload).status_code, 201)
+
+        job = StorageOffloadJob.objects.get()
+        self.assertTrue(os.path.exists(job.spool_path))
+        self.assertFalse(os.path.exists(data_path(upload)))
+
+
+class StorageOffloadTests(UploadTestCase):
+    def setUp(self):
+        super().setUp()
+        settings = override_settings(
+            STORAGE_OFFLOAD_ENABLED=True, STORAGE_OFFLOAD_MAX_ATTEMPTS=3
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.service = Service.objects.create(
+            user=self.user, service_type="offered", title="Bilan", description="x"
+        )
+
+    def spool_attachment(self, content=b"hello"):
+        """An attachment saved with its file on the spool, and its job"""
+        with atomic_with_files():
+            attachment = ServiceAttachment(service=self.service)
+            attachment.file_size = store_file(
+                attachment, "file", SimpleUploadedFile("file.txt", content)
+            )
+            attachment.original_filename = "file.txt"
+            attachment.save()
+        return attachment, StorageOffloadJob.objects.get(object_id=str(attachment.pk))
+
+    def test_a_rolled_back_file_leaves_the_spool(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_with_files():
+                attachment = ServiceAttachment(service=self.service)
+                store_file(attachment, "file", SimpleUploadedFile("file.txt", b"x"))
+                spool_path = StorageOffloadJob.objects.get().spool_path
+                self.assertTrue(os.path.exists(spool_path))
+                raise RuntimeError
+
+        self.assertFalse(os.path.exists(spool_path))
+        self.assertFalse(StorageOffloadJob.objects.exists())
+
+    def test_a_job_stores_the_file(self):
+        attachment, job = self.spool_attachment()
+        self.assertEqual(attachment.storage_status, "pending")
+
+        self.assertTrue(process_job(job))
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.storage_status, "stored")
+        with attachment.file.open("rb") as stored:
+            self.assertEqual(stored.read(), b"hello")
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertFalse(os.path.exists(job.spool_path))
+
+    def test_a_failed_job_is_retried_with_backoff(self):
+        attachment, job = self.spool_attachment()
+        ServiceAttachment.objects.filter(pk=attachment.pk).delete()
+
+        self.assertFalse(process_job(job))
+        self.assertFalse(process_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 2))
+        self.assertIn("not found", job.last_error)
+        self.assertAlmostEqual(
+            job.available_at,
+            timezone.now() + timedelta(seconds=4),
+            delta=timedelta(seconds=1),
+        )
+        self.assertTrue(os.path.exists(job.spool_path))
+
+    def test_a_job_fails_after_the_last_attempt(self):
+        attachment, job = self.spool_attachment()
+        job.attempts = 2
+        job.save()
+
+        with mock.patch.object(FileSystemStorage, "save", side_effect=OSError("disk")):
+            self.assertFalse(process_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        self.assertFalse(os.path.exists(job.spool_path))
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.storage_status, "failed")
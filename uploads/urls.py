@@ -0,0 +1,22 @@
+from django.urls import path
+from .views import (
+    UploadSessionCreateAPIView,
+    UploadSessionDetailAPIView,
+    UploadChunkAPIView,
+    UploadCommitAPIView,
+)
+
+urlpatterns = [
+    path("", UploadSessionCreateAPIView.as_view(), name="upload_create"),
+    path(
+        "<uuid:upload_id>/", UploadSessionDetailAPIView.as_view(), name="upload_detail"
+    ),
+    path(
+        "<uuid:upload_id>/chunks/<int:index>/",
+        UploadChunkAPIView.as_view(),
+        name="upload_chunk",
+    ),
+    path(
+        "<uuid:upload_id>/commit/", UploadCommitAPIView.as_view(), name="upload_commit"
+    ),
+]
@@ -0,0 +1,100 @@
+import io
+
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status, views
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import UploadSession
+from .serializers import UploadSessionCreateSerializer, UploadSessionSerializer
+from .spool import ChunkError, assemble, discard, write_chunk
+
+
+class UploadSessionCreateAPIView(generics.CreateAPIView):
+    """Start a chunked upload, the response tells how to split the file"""
+
+    serializer_class = UploadSessionCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
+        return Response(
+            UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED
+        )
+
+
+class UploadSessionDetailAPIView(generics.RetrieveDestroyAPIView):
+    """Upload progress (received chunks, to resume) or abort the upload"""
+
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = "id"
+    lookup_url_kwarg = "upload_id"
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user).prefetch_related(
+            "chunks"
+        )
+
+    def perform_destroy(self, instance):
+        discard(instance)
+        instance.delete()
+
+
+class UploadChunkAPIView(views.APIView):
+    """
+    PUT the raw bytes of one chunk (application/octet-stream) with its
+    SHA-256 in the X-Chunk-SHA256 header. The body is streamed to disk.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id, index):
+        session = get_object_or_404(
+            UploadSession, id=upload_id, user=request.user, status="uploading"
+        )
+        if index >= session.total_chunks:
+            raise ValidationError(
+                {"index": f"This upload has {session.total_chunks} chunks."}
+            )
+
+        sha256 = request.headers.get("X-Chunk-SHA256", "")
+        if not sha256:
+            raise ValidationError({"sha256": "The X-Chunk-SHA256 header is required."})
+
+        stream = request.stream or io.BytesIO()
+        try:
+            chunk = write_chunk(session, index, stream, sha256)
+        except ChunkError as e:
+            raise ValidationError({"chunk": str(e)})
+
+        return Response(
+            {"index": chunk.index, "size": chunk.size, "sha256": chunk.sha256},
+            status=status.HTTP_200_OK,
+        )
+
+
+class UploadCommitAPIView(views.APIView):
+    """Assemble the received chunks, the upload id can then be used by other endpoints"""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        with transaction.atomic():
+            # concurrent commits of the same upload assemble it only once
+            session = get_object_or_404(
+                UploadSession.objects.select_for_update(),
+                id=upload_id,
+                user=request.user,
+            )
+            if session.status == "uploading":
+                try:
+                    assemble(session)
+                except ChunkError as e:
+                    raise ValidationError({"upload": str(e)})
+
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)